@@ -170,13 +170,17 @@ async def set_club(idclub: int, c: Club, user: str, bt: BackgroundTasks = None)
     logger.debug(f"update props {props}")
     clb = await update_club(idclub, props, {"_username": user})
     logger.info(f"updated clb {clb}")
+    # imported here, kbsb.interclubs depends on kbsb.club
+    from kbsb.interclubs.cache import invalidate_clubs
+
+    invalidate_clubs()
     if bt:
         bt.add_task(sendnotification, clb)
     logger.debug(f"club {clb.idclub} updated")
     return clb
 
 
-from kbsb.member import anon_getmember
+from kbsb.member import anon_getmembers
 
 
 def club_locale(club: Club):
@@ -223,9 +227,15 @@ async def sendnotification(clb: Club):
         }
         for f, b in clb.boardmembers.items()
     ]
+    rolemembers = {
+        m.idnumber: m
+        for m in await anon_getmembers(
+            [idm for cr in clb.clubroles for idm in cr.memberlist]
+        )
+    }
     for cr in clb.clubroles:
         if cr.nature == ClubRoleNature.ClubAdmin:
-            members = [(await anon_getmember(idmember)) for idmember in cr.memberlist]
+            members = [rolemembers[idm] for idm in cr.memberlist if idm in rolemembers]
             ctx["clubadmin"] = [
                 {
                     "first_name": p.first_name,
@@ -234,7 +244,7 @@ async def sendnotification(clb: Club):
                 for p in members
             ]
         if cr.nature == ClubRoleNature.InterclubAdmin:
-            members = [(await anon_getmember(idmember)) for idmember in cr.memberlist]
+            members = [rolemembers[idm] for idm in cr.memberlist if idm in rolemembers]
             ctx["interclubadmin"] = [
                 {
                     "first_name": p.first_name,
@@ -243,7 +253,7 @@ async def sendnotification(clb: Club):
                 for p in members
             ]
         if cr.nature == ClubRoleNature.InterclubCaptain:
-            members = [(await anon_getmember(idmember)) for idmember in cr.memberlist]
+            members = [rolemembers[idm] for idm in cr.memberlist if idm in rolemembers]
             ctx["interclubcaptain"] = [
                 {
                     "first_name": p.first_name,
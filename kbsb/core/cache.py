@@ -0,0 +1,115 @@
+# copyright Ruben Decrop 2012 - 2024
+
+# an in-process response cache
+# entries are evicted least recently used first and expire after a ttl
+# keys are tuples starting with the name of the cached function, so the
+# mutating functions can invalidate exactly the entries they affect
+# values are copied when stored and when returned, so a caller modifying
+# its result does not change the cached value
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+import copy
+import functools
+import inspect
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+
+
+class ResponseCache:
+    """
+    a bounded LRU cache with a time to live per entry
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: OrderedDict[Tuple, Tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple) -> Tuple[bool, Any]:
+        """
+        returns (found, value)
+        """
+        entry = self.entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return False, None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return True, copy.deepcopy(entry[1])
+
+    def set(self, key: Tuple, value: Any, ttl: float | None = None) -> None:
+        """
+        store a value, ttl overrides the time to live of the cache
+        """
+        ttl = self.ttl if ttl is None else ttl
+        self.entries[key] = (time.monotonic() + ttl, copy.deepcopy(value))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, *prefix, match: Callable[[Tuple], bool] | None = None) -> int:
+        """
+        remove all entries whose key starts with prefix
+        and for which match(key) is true if match is given
+        returns the number of removed entries
+        """
+        n = len(prefix)
+        keys = [
+            k for k in self.entries if k[:n] == prefix and (match is None or match(k))
+        ]
+        for k in keys:
+            del self.entries[k]
+        return len(keys)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitratio": self.hits / total if total else 0.0,
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+        }
+
+
+def cached(cache: ResponseCache, *keyargs: str):
+    """
+    decorator caching the result of an async function in cache
+    the key is the function name followed by the keyargs (default all arguments)
+    calls with a non default value for any other argument are not cached
+    """
+
+    def decorator(fn):
+        sig = inspect.signature(fn)
+        names = keyargs or tuple(sig.parameters)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            bound = sig.bind(*args, **kwargs)
+            bound.apply_defaults()
+            for name, value in bound.arguments.items():
+                if name not in names and value != sig.parameters[name].default:
+                    return await fn(*args, **kwargs)
+            key = (fn.__name__, *(bound.arguments[n] for n in names))
+            found, value = cache.get(key)
+            if found:
+                return value
+            value = await fn(*args, **kwargs)
+            cache.set(key, value)
+            return value
+
+        return wrapper
+
+    return decorator
@@ -4,10 +4,19 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date
-from reddevil.core import get_secret, RdInternalServerError
+from typing import Any, Callable, TypeVar
+from reddevil.core import get_secret, get_settings, RdInternalServerError
 import mysql.connector
 
+T = TypeVar("T")
+
+MYSQL_POOL_SIZE = 5
+MYSQL_QUERY_TIMEOUT = 10.0  # seconds
+
 
 def date2datetime(d: dict, f: str):
     """
@@ -27,7 +36,7 @@ def get_mysql():
     try:
         cnx = mysql.connector.connect(
             pool_name="kbsbpool",
-            pool_size=5,
+            pool_size=mysql_pool_size(),
             user=get_mysql.params["dbuser"],
             password=get_mysql.params["dbpassword"],
             host=get_mysql.params["dbhost"],
@@ -45,3 +54,44 @@ def get_mysql():
             logger.exception(err)
             raise RdInternalServerError(description="Unknown DB error")
     return cnx
+
+
+def mysql_pool_size() -> int:
+    return getattr(get_settings(), "MYSQL_POOL_SIZE", MYSQL_POOL_SIZE)
+
+
+def get_mysql_executor() -> ThreadPoolExecutor:
+    """
+    the executor running the blocking mysql calls
+    it has a worker per pooled connection, so a query never waits for the pool
+    """
+    if not hasattr(get_mysql_executor, "executor"):
+        setattr(
+            get_mysql_executor,
+            "executor",
+            ThreadPoolExecutor(
+                max_workers=mysql_pool_size(), thread_name_prefix="mysql"
+            ),
+        )
+    return get_mysql_executor.executor
+
+
+async def run_mysql(
+    fn: Callable[..., T], *args: Any, timeout: float = None, **kwargs: Any
+) -> T:
+    """
+    run a blocking mysql function in the mysql executor
+    the caller gets an RdInternalServerError after timeout seconds, the
+    query itself runs to completion and returns its connection to the pool
+    """
+    if timeout is None:
+        timeout = getattr(get_settings(), "MYSQL_QUERY_TIMEOUT", MYSQL_QUERY_TIMEOUT)
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(
+        get_mysql_executor(), functools.partial(fn, *args, **kwargs)
+    )
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        logger.error(f"mysql call {fn.__name__} timed out after {timeout}s")
+        raise RdInternalServerError(description="MySQLTimeout")
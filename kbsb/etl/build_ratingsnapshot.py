@@ -0,0 +1,78 @@
+# copyright Ruben Decrop 2012 - 2024
+
+# build the player rating snapshot used by the ELO exports
+# from an eloprocessing csv file:
+#   python -m kbsb.etl.build_ratingsnapshot --csv data/eloprocessing.csv
+# or directly from the rating tables of the MySQL database:
+#   python -m kbsb.etl.build_ratingsnapshot --period 202401 data/eloprocessing.npy
+
+import argparse
+import time
+
+from reddevil.core import register_app
+
+from kbsb.interclubs.ratingsnapshot import (
+    build_rating_snapshot,
+    read_rating_csv,
+    snapshot_path,
+    write_rating_snapshot,
+)
+
+QUERY = """
+    SELECT
+        signaletique.Matricule as idnumber,
+        signaletique.Nom as last_name,
+        signaletique.Prenom as first_name,
+        {elotable}.Fide as idfide,
+        signaletique.NatFIDE as natfide,
+        DATE_FORMAT(signaletique.Dnaiss, '%Y-%m-%d') as birthday,
+        fide.NAME as fullname,
+        fide.TITLE as title,
+        fide.Elo as fiderating,
+        fide.SEX as gender,
+        signaletique.Sexe as gender2,
+        signaletique.Club as idclub,
+        {elotable}.Elo as belrating
+    FROM signaletique
+    INNER JOIN {elotable} ON signaletique.Matricule = {elotable}.Matricule
+    LEFT JOIN fide ON {elotable}.Fide = fide.ID_NUMBER
+"""
+
+
+def read_rating_mysql(period: str):
+    from kbsb.core.db import get_mysql
+
+    cnx = get_mysql()
+    try:
+        cursor = cnx.cursor(dictionary=True)
+        cursor.execute(QUERY.format(elotable=f"p_player{period}"))
+        return build_rating_snapshot(cursor)
+    finally:
+        cnx.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="build a rating snapshot")
+    parser.add_argument("--csv", help="eloprocessing csv file")
+    parser.add_argument("--period", help="rating period YYYYMM of the MySQL tables")
+    parser.add_argument("output", nargs="?", help="snapshot file (.npy)")
+    args = parser.parse_args()
+    if bool(args.csv) == bool(args.period):
+        parser.error("give either --csv or --period")
+    start = time.perf_counter()
+    if args.csv:
+        ratings = read_rating_csv(args.csv)
+        output = args.output or snapshot_path(args.csv)
+    else:
+        if not args.output:
+            parser.error("an output file is required with --period")
+        register_app(settingsmodule="kbsb.settings")
+        ratings = read_rating_mysql(args.period)
+        output = args.output
+    write_rating_snapshot(ratings, output)
+    elapsed = time.perf_counter() - start
+    print(f"{len(ratings)} players written to {output} in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
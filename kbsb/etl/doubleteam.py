@@ -12,9 +12,10 @@ from kbsb.interclubs.md_interclubs import (
     ICTeam,
     ICROUNDS,
 )
+from kbsb.interclubs.playedplayers import doubleteams
 
 allseries = {}
-doubleteams = []
+doubleteams_found = []
 
 
 def getround(series: ICSeries, rnd: int) -> ICRound:
@@ -40,19 +41,15 @@ async def read_interclubseries():
 def check_doubleteams():
     print("checking double teams")
     for k, s in allseries.items():
-        teams = set()
-        doublefound = []
-        for t in s.teams:
-            if t.idclub in teams:
-                doublefound.append(t.idclub)
-            else:
-                teams.add(t.idclub)
-        for d in doublefound:
-            double = {"idclub": d, "teams": [], "k": k}
-            for t in s.teams:
-                if t.idclub == d:
-                    double["teams"].append(t)
-            doubleteams.append(double)
+        done = set()
+        for pnr, others in doubleteams(s).items():
+            if pnr in done:
+                continue
+            done.update(others)
+            teams = [t for t in s.teams if t.pairingnumber in [pnr, *others]]
+            doubleteams_found.append(
+                {"idclub": teams[0].idclub, "teams": teams, "k": k}
+            )
     print("done")
 
 
@@ -66,7 +63,7 @@ async def main():
             f, fieldnames=["idclub", "division", "index", "team1", "team2"]
         )
         writer.writeheader()
-        for d in doubleteams:
+        for d in doubleteams_found:
             t1 = d["teams"][0:1]
             t2 = d["teams"][1:2]
             if t2:
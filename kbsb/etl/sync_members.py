@@ -0,0 +1,30 @@
+# copyright Ruben Decrop 2012 - 2024
+
+# replicate the mysql member tables to the mongodb member collections
+# and load the new rating quarters into the rating history
+# run it periodically, a run only writes the rows that changed:
+#   python -m kbsb.etl.sync_members
+
+import asyncio
+
+from reddevil.core import connect_mongodb, register_app
+
+from kbsb.member.ratinghistory import mgmt_sync_ratinghistory
+from kbsb.member.sync import mgmt_sync_members
+
+
+async def main():
+    register_app(settingsmodule="kbsb.settings")
+    connect_mongodb()
+    runs = await mgmt_sync_members()
+    runs += await mgmt_sync_ratinghistory()
+    for run in runs:
+        print(
+            f"{run.table}: {run.read} read, {run.upserted} upserted, "
+            f"{run.deleted} deleted in {run.duration:.1f}s "
+            f"({run.rowspersecond:.0f} rows/s)"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
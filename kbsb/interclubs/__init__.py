@@ -5,20 +5,30 @@ from .md_interclubs import (
     DbICClub,
     DbICClub,
     DbICEnrollment,
+    DbICPlayedPlayers,
     DbICSeries,
+    DbICSeriesSnapshot,
     DbICStandings,
     DbICVenue,
+    DbICViolation,
+    ICBoardEligibility,
     ICClubDB,
+    ICCacheStats,
     ICClubItem,
     ICEncounter,
+    ICEncounterDetails,
     ICEnrollment,
     ICEnrollmentDB,
     ICEnrollmentIn,
     ICGame,
     ICGameDetails,
+    ICLineupEligibility,
     ICPlanning,
+    ICPlayedPlayersDB,
     ICPlayer,
     ICPlanningItem,
+    ICPenaltyReportFile,
+    ICPenaltyRun,
     ICPlayerUpdateItem,
     ICPlayerUpdate,
     ICPlayerValidationError,
@@ -27,19 +37,25 @@ from .md_interclubs import (
     ICRound,
     ICSeries,
     ICSeriesDB,
+    ICSeriesSnapshotDB,
     ICStandingsDB,
+    ICStandingsWorkerStats,
     ICTeam,
     ICTeamGame,
     ICTeamStanding,
     ICVenueDB,
     ICVenueIn,
+    ICViolation,
     PlayerlistNature,
 )
 
 from .md_elo import (
+    EloBatchReport,
     EloGame,
     EloPlayer,
+    EloRatingChange,
 )
+from .cache import get_iccache_stats, iccache
 from .icclubs import (
     anon_getICteams,
     anon_getICclub,
@@ -50,14 +66,29 @@ from .icclubs import (
     clb_validateICPlayers,
     mgmt_getXlsAllplayerlist,
 )
+from .publication import (
+    anon_getICseries_snapshot,
+    mgmt_publish_series,
+    publish_series,
+)
+from .scoring import calc_points_bulk
+from .standings import (
+    calc_standings,
+    enqueue_standings,
+    get_standingsworker_stats,
+    standings_worker,
+    update_standings,
+)
 from .series import (
     anon_getICseries,
     anon_getICencounterdetails,
+    anon_getICrounddetails,
     anon_getICstandings,
     clb_getICseries,
     clb_saveICplanning,
     clb_saveICresults,
     mgmt_saveICresults,
+    mgmt_recalc_standings,
     mgmt_register_teamforfeit,
 )
 from .enrollments import (
@@ -70,5 +101,33 @@ from .venues import (
     getICvenues,
     set_interclubvenues,
 )
-from .penalties import mgmt_generate_penalties
-from .elo import calc_belg_elo, calc_fide_elo
+from .eligibility import (
+    EligibilityIndex,
+    clb_validateICplanning,
+    read_club_eligibility,
+)
+from .playedplayers import (
+    doubleteams,
+    mgmt_rebuild_played_players,
+    update_played_players,
+)
+from .penalties import (
+    mgmt_download_penalties,
+    mgmt_generate_penalties,
+    mgmt_list_penalty_reports,
+)
+from .violations import (
+    mgmt_getICviolations,
+    mgmt_rebuild_violations,
+    save_violations,
+    update_violations,
+)
+from .elo import (
+    calc_belg_elo,
+    calc_fide_elo,
+    mgmt_download_belg_elo,
+    mgmt_download_elo_batch,
+    mgmt_download_fide_elo,
+    mgmt_elo_batch,
+)
+from .ratingchange import anon_getICratingchange, mgmt_getICratingchanges
@@ -2,7 +2,8 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-from fastapi import HTTPException, Depends, APIRouter
+from fastapi import HTTPException, Depends, APIRouter, Request
+from fastapi.responses import Response
 
 from fastapi.security import HTTPAuthorizationCredentials
 from reddevil.core import (
@@ -17,42 +18,69 @@ from io import BytesIO
 from kbsb.member import validate_membertoken
 
 from . import (
+    EloBatchReport,
+    EloRatingChange,
     ICEnrollmentDB,
     ICEnrollmentIn,
     ICVenueIn,
     ICVenueDB,
     ICClubDB,
+    ICCacheStats,
     ICClubItem,
+    ICEncounterDetails,
     ICGameDetails,
+    ICLineupEligibility,
+    ICPenaltyReportFile,
+    ICPenaltyRun,
     ICPlanning,
     ICPlayerUpdate,
     ICPlayerValidationError,
     ICResult,
     ICSeries,
     ICStandingsDB,
+    ICStandingsWorkerStats,
     ICTeam,
+    ICViolation,
     anon_getICteams,
     anon_getICclub,
     anon_getICclubs,
     anon_getICseries,
+    anon_getICseries_snapshot,
     anon_getICencounterdetails,
+    anon_getICratingchange,
+    anon_getICrounddetails,
     anon_getICstandings,
     anon_getXlsplayerlist,
     calc_belg_elo,
     calc_fide_elo,
+    mgmt_download_belg_elo,
+    mgmt_download_penalties,
+    mgmt_download_elo_batch,
+    mgmt_download_fide_elo,
+    mgmt_elo_batch,
     clb_getICclub,
     clb_getICseries,
     clb_saveICplanning,
     clb_saveICresults,
     clb_updateICplayers,
+    clb_validateICplanning,
     clb_validateICPlayers,
+    get_iccache_stats,
+    get_standingsworker_stats,
     csv_ICenrollments,
     csv_ICvenues,
     find_interclubenrollment,
     getICvenues,
+    mgmt_getICratingchanges,
+    mgmt_getICviolations,
     mgmt_getXlsAllplayerlist,
+    mgmt_list_penalty_reports,
     mgmt_saveICresults,
     mgmt_generate_penalties,
+    mgmt_publish_series,
+    mgmt_rebuild_played_players,
+    mgmt_rebuild_violations,
+    mgmt_recalc_standings,
     mgmt_register_teamforfeit,
     set_interclubenrollment,
     set_interclubvenues,
@@ -365,9 +393,17 @@ async def api_anon_getXlsplayerlist(idclub: int):
 
 
 @router.get("/anon/icseries", response_model=List[ICSeries])
-async def api_anon_getICseries(idclub: int | None = 0, round: int | None = 0):
+async def api_anon_getICseries(
+    request: Request, idclub: int | None = 0, round: int | None = 0
+):
     try:
-        return await anon_getICseries(idclub, round)
+        if not round:
+            return await anon_getICseries(idclub, round)
+        content, etag = await anon_getICseries_snapshot(idclub, round)
+        headers = {"ETag": etag}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        return Response(content=content, media_type="application/json", headers=headers)
     except RdException as e:
         raise HTTPException(status_code=e.status_code, detail=e.description)
     except:
@@ -407,14 +443,16 @@ async def api_mgmt_getICseries(
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
-@router.put("/clb/icplanning", status_code=201)
+@router.put(
+    "/clb/icplanning", status_code=201, response_model=List[ICLineupEligibility]
+)
 async def api_clb_saveICplanning(
     icpi: ICPlanning,
     auth: HTTPAuthorizationCredentials = Depends(bearer_schema),
 ):
     try:
         validate_membertoken(auth)
-        await clb_saveICplanning(icpi.plannings)
+        return await clb_saveICplanning(icpi.plannings)
     except RdException as e:
         raise HTTPException(status_code=e.status_code, detail=e.description)
     except:
@@ -422,6 +460,24 @@ async def api_clb_saveICplanning(
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+@router.post("/clb/icplanning/validate", response_model=List[ICLineupEligibility])
+async def api_clb_validateICplanning(
+    icpi: ICPlanning,
+    auth: HTTPAuthorizationCredentials = Depends(bearer_schema),
+):
+    """
+    the eligibility per board of a planning before it is submitted
+    """
+    try:
+        validate_membertoken(auth)
+        return await clb_validateICplanning(icpi.plannings)
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api call clb_validateICplanning")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
 @router.put("/mgmt/icresults", status_code=201)
 async def api_mgmt_saveICresults(
     icri: ICResult,
@@ -480,6 +536,33 @@ async def api_anon_getICencounterdetails(
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+@router.get("/anon/icrounddetails", response_model=List[ICEncounterDetails])
+async def api_anon_getICrounddetails(
+    round: int, division: int | None = 0, index: str | None = ""
+):
+    try:
+        return await anon_getICrounddetails(round, division or 0, index or "")
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api call anon_getICrounddetails")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.get("/anon/icratingchange/{idbel}", response_model=List[EloRatingChange])
+async def api_anon_getICratingchange(idbel: int, last: int | None = 0):
+    """
+    the projected rating changes of a player per published round
+    """
+    try:
+        return await anon_getICratingchange(idbel, last or 0)
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api call anon_getICratingchange")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
 @router.get("/anon/icstandings", response_model=List[ICStandingsDB] | None)
 async def api_anon_getICstandings(idclub: int | None = 0):
     try:
@@ -491,6 +574,62 @@ async def api_anon_getICstandings(idclub: int | None = 0):
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+@router.get("/mgmt/standingsworker", response_model=ICStandingsWorkerStats)
+async def api_mgmt_get_standingsworker_stats(
+    auth: HTTPAuthorizationCredentials = Depends(bearer_schema),
+):
+    try:
+        await validate_token(auth)
+        return get_standingsworker_stats()
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api call get_standingsworker_stats")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.post("/mgmt/command/standings", status_code=201)
+async def api_mgmt_recalc_standings(
+    auth: HTTPAuthorizationCredentials = Depends(bearer_schema),
+):
+    await validate_token(auth)
+    try:
+        await mgmt_recalc_standings()
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api recalc standings")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.get("/mgmt/iccache", response_model=ICCacheStats)
+async def api_mgmt_get_iccache_stats(
+    auth: HTTPAuthorizationCredentials = Depends(bearer_schema),
+):
+    await validate_token(auth)
+    try:
+        return get_iccache_stats()
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api call get_iccache_stats")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.post("/mgmt/command/publishseries", status_code=201)
+async def api_mgmt_publish_series(
+    auth: HTTPAuthorizationCredentials = Depends(bearer_schema),
+):
+    await validate_token(auth)
+    try:
+        await mgmt_publish_series()
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api publish series")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
 @router.post("/mgmt/command/belg_elo", status_code=201)
 async def api_calc_belg_elo(
     round: int,
@@ -521,14 +660,101 @@ async def api_calc_fide_elo(
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
-@router.post("/mgmt/command/penalties/{round}", status_code=201)
+@router.get("/mgmt/elo/belg/{round}/{label}")
+async def api_mgmt_download_belg_elo(
+    round: int,
+    label: str,
+    auth: HTTPAuthorizationCredentials = Depends(bearer_schema),
+):
+    await validate_token(auth)
+    try:
+        return await mgmt_download_belg_elo(round, label)
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api call mgmt_download_belg_elo")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.get("/mgmt/elo/fide/{round}")
+async def api_mgmt_download_fide_elo(
+    round: int,
+    auth: HTTPAuthorizationCredentials = Depends(bearer_schema),
+):
+    await validate_token(auth)
+    try:
+        return await mgmt_download_fide_elo(round)
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api call mgmt_download_fide_elo")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.post("/mgmt/command/elo_batch", status_code=201, response_model=EloBatchReport)
+async def api_mgmt_elo_batch(
+    first: int = 1,
+    last: int = 0,
+    auth: HTTPAuthorizationCredentials = Depends(bearer_schema),
+):
+    """
+    export the ELO files of rounds first to last (0: last round) as a zip
+    """
+    await validate_token(auth)
+    try:
+        return await mgmt_elo_batch(first, last)
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api call mgmt_elo_batch")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.get("/mgmt/elo/batch")
+async def api_mgmt_download_elo_batch(
+    first: int = 1,
+    last: int = 0,
+    auth: HTTPAuthorizationCredentials = Depends(bearer_schema),
+):
+    await validate_token(auth)
+    try:
+        return await mgmt_download_elo_batch(first, last)
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api call mgmt_download_elo_batch")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.get("/mgmt/elo/ratingchanges", response_model=List[EloRatingChange])
+async def api_mgmt_getICratingchanges(
+    first: int = 1,
+    last: int = 0,
+    auth: HTTPAuthorizationCredentials = Depends(bearer_schema),
+):
+    """
+    the projected rating changes of all players over rounds first to last
+    """
+    await validate_token(auth)
+    try:
+        return await mgmt_getICratingchanges(first, last)
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api call mgmt_getICratingchanges")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.post(
+    "/mgmt/command/penalties/{round}", status_code=201, response_model=ICPenaltyRun
+)
 async def api_mgmt_generate_penalties(
     round: int,
     auth: HTTPAuthorizationCredentials = Depends(bearer_schema),
 ):
     # await validate_token(auth)
     try:
-        await mgmt_generate_penalties(round)
+        return await mgmt_generate_penalties(round)
     except RdException as e:
         raise HTTPException(status_code=e.status_code, detail=e.description)
     except:
@@ -536,6 +762,99 @@ async def api_mgmt_generate_penalties(
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+@router.get("/mgmt/penalties", response_model=List[ICPenaltyReportFile])
+async def api_mgmt_list_penalty_reports(
+    auth: HTTPAuthorizationCredentials = Depends(bearer_schema),
+):
+    """
+    the penalties reports stored in the filestore
+    """
+    await validate_token(auth)
+    try:
+        return await mgmt_list_penalty_reports()
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api call mgmt_list_penalty_reports")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.get("/mgmt/penalties/{round}")
+async def api_mgmt_download_penalties(
+    round: int,
+    format: str = "csv",
+    refresh: bool = False,
+    auth: HTTPAuthorizationCredentials = Depends(bearer_schema),
+):
+    """
+    download the penalties report of a round as csv or xlsx
+    """
+    await validate_token(auth)
+    try:
+        return await mgmt_download_penalties(round, format, refresh)
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api call mgmt_download_penalties")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.get("/mgmt/icviolations", response_model=List[ICViolation])
+async def api_mgmt_getICviolations(
+    round: int = 0,
+    idclub: int = 0,
+    division: int = 0,
+    index: str = "",
+    auth: HTTPAuthorizationCredentials = Depends(bearer_schema),
+):
+    """
+    the stored violations per round, guilty club or series
+    """
+    await validate_token(auth)
+    try:
+        return await mgmt_getICviolations(round, idclub, division, index)
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api call mgmt_getICviolations")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.post("/mgmt/command/violations/{round}", status_code=201)
+async def api_mgmt_rebuild_violations(
+    round: int,
+    auth: HTTPAuthorizationCredentials = Depends(bearer_schema),
+) -> int:
+    """
+    rebuild the stored violations of a round from all its encounters
+    """
+    await validate_token(auth)
+    try:
+        return await mgmt_rebuild_violations(round)
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api call mgmt_rebuild_violations")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.post("/mgmt/command/playedplayers", status_code=201)
+async def api_mgmt_rebuild_played_players(
+    auth: HTTPAuthorizationCredentials = Depends(bearer_schema),
+) -> int:
+    """
+    rebuild the played players index from the series
+    """
+    await validate_token(auth)
+    try:
+        return await mgmt_rebuild_played_players()
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api call mgmt_rebuild_played_players")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
 @router.post("/mgmt/command/teamforfeit/{division}/{index}/{name}", status_code=201)
 async def api_mgmt_register_teamforfeit(
     division: int,
@@ -0,0 +1,64 @@
+# copyright Ruben Decrop 2012 - 2024
+
+# the response cache of the anonymous interclub endpoints
+# the mutating service functions invalidate the entries they affect
+# the cache lives in each process, an invalidation only reaches the instance
+# that handled the write, the other instances serve their entries until
+# the ttl expires
+
+from typing import Iterable
+
+from kbsb.core.cache import ResponseCache
+from kbsb.interclubs.md_interclubs import ICCacheStats, ICSeries
+
+ICCACHE_MAXSIZE = 2048
+ICCACHE_TTL = 600  # seconds
+
+iccache = ResponseCache(maxsize=ICCACHE_MAXSIZE, ttl=ICCACHE_TTL)
+
+
+def invalidate_series(s: ICSeries, rounds: Iterable[int] | None = None) -> None:
+    """
+    invalidate the cached reads of a series, for some rounds (default all)
+    """
+    iccache.invalidate("read_ICseries")
+    iccache.invalidate("read_ICratingchange")
+    if rounds is None:
+        iccache.invalidate("get_ICrounddetails")
+    else:
+        for r in rounds:
+            iccache.invalidate("get_ICrounddetails", r)
+    for idclub in {t.idclub for t in s.teams}:
+        iccache.invalidate("anon_getICteams", idclub)
+
+
+def invalidate_standings(s: ICSeries) -> None:
+    """
+    invalidate the cached standings of the clubs of a series
+    """
+    iccache.invalidate("anon_getICstandings", 0)
+    for idclub in {t.idclub for t in s.teams}:
+        iccache.invalidate("anon_getICstandings", idclub)
+
+
+def invalidate_club(idclub: int) -> None:
+    """
+    invalidate the cached reads depending on the playerlist of a club
+    """
+    iccache.invalidate("anon_getICclub", idclub)
+    iccache.invalidate("read_club_eligibility", idclub)
+    iccache.invalidate("get_ICrounddetails")
+
+
+def invalidate_clubs() -> None:
+    """
+    invalidate the cached list of enrolled clubs
+    """
+    iccache.invalidate("anon_getICclubs")
+
+
+def get_iccache_stats() -> ICCacheStats:
+    """
+    monitoring data of the interclub response cache
+    """
+    return ICCacheStats(**iccache.stats())
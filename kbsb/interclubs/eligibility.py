@@ -0,0 +1,183 @@
+# copyright Ruben Decrop 2012 - 2024
+
+# the lineup eligibility engine
+# the active players of the clubs are indexed once into tuples holding the
+# assigned rating and the team the player is titular of
+# a lineup check is a dict lookup per board, so it can run on the request
+# path of the planning and is shared with the penalty rules
+# the index of a club is cached and invalidated with the playerlist
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+from typing import Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+from kbsb.core.cache import cached
+from kbsb.interclubs.cache import iccache
+from kbsb.interclubs.md_interclubs import (
+    DbICClub,
+    ICBoardEligibility,
+    ICClubDB,
+    ICLineupEligibility,
+    ICPlanningItem,
+)
+
+NOT_IN_PLAYERLIST = "player not in playerlist"
+TITULAR_DIVISION = "Titular played in a division too low"
+TITULAR_SERIES = "Titular played in wrong series"
+TITULAR_TEAM = "Titular played in wrong team in the series"
+RATING_ORDER = "rating order not correct"
+
+
+class PlayerEligibility(NamedTuple):
+    """
+    the eligibility data of an active player
+    division 0 if the player is not titular
+    """
+
+    idclub: int
+    rating: int
+    division: int = 0
+    index: str = ""
+    pairingnumber: int = 0
+
+
+class EligibilityIndex:
+    """
+    the eligibility data of the active players of some clubs
+    """
+
+    def __init__(self, players: Dict[int, PlayerEligibility] | None = None):
+        self.players = players or {}
+
+    @classmethod
+    def from_clubs(cls, clubs: Iterable[ICClubDB]) -> "EligibilityIndex":
+        players = {}
+        for clb in clubs:
+            teams = {t.name: t for t in clb.teams}
+            for p in clb.players:
+                if p.nature not in ["assigned", "requestedin"]:
+                    continue
+                team = teams.get(p.titular) if p.titular else None
+                if p.titular and not team:
+                    logger.info(f"titular team {p.titular} of {clb.idclub} not found")
+                players[p.idnumber] = (
+                    PlayerEligibility(
+                        clb.idclub,
+                        p.assignedrating,
+                        team.division,
+                        team.index,
+                        team.pairingnumber,
+                    )
+                    if team
+                    else PlayerEligibility(clb.idclub, p.assignedrating)
+                )
+        return cls(players)
+
+    def rating(self, idnumber: int) -> int:
+        p = self.players.get(idnumber)
+        return p.rating if p else 0
+
+    def titular_reason(
+        self, idnumber: int, division: int, index: str, pairingnumber: int
+    ) -> str | None:
+        """
+        the reason a titular may not play for a team, None if allowed
+        """
+        p = self.players.get(idnumber)
+        if not p or not p.division:
+            return None
+        if division > p.division:
+            return TITULAR_DIVISION
+        if division == p.division:
+            if index != p.index:
+                return TITULAR_SERIES
+            if pairingnumber != p.pairingnumber:
+                return TITULAR_TEAM
+        return None
+
+    def order_violations(self, boards: Iterable[Tuple[int, int]]) -> List[int]:
+        """
+        the boards (board index, idnumber) with a higher rating than
+        the previous board
+        """
+        violations = []
+        previous = 3000
+        for ix, idnumber in boards:
+            rating = self.rating(idnumber)
+            if rating > previous:
+                violations.append(ix)
+            previous = rating
+        return violations
+
+    def check_lineup(
+        self,
+        idclub: int,
+        division: int,
+        index: str,
+        pairingnumber: int,
+        idnumbers: Sequence[int],
+    ) -> List[ICBoardEligibility]:
+        """
+        the eligibility per board of the lineup of a team, 0 is an empty board
+        """
+        boards = [
+            ICBoardEligibility(boardnumber=ix + 1, idnumber=idnumber)
+            for ix, idnumber in enumerate(idnumbers)
+        ]
+        filled = [(ix, idnumber) for ix, idnumber in enumerate(idnumbers) if idnumber]
+        for ix, idnumber in filled:
+            p = self.players.get(idnumber)
+            if not p or p.idclub != idclub:
+                boards[ix].reasons.append(NOT_IN_PLAYERLIST)
+            reason = self.titular_reason(idnumber, division, index, pairingnumber)
+            if reason:
+                boards[ix].reasons.append(reason)
+        for ix in self.order_violations(filled):
+            boards[ix].reasons.append(RATING_ORDER)
+        for b in boards:
+            b.eligible = not b.reasons
+        return boards
+
+
+@cached(iccache)
+async def read_club_eligibility(idclub: int) -> EligibilityIndex:
+    """
+    the eligibility index of a club
+    """
+    club = await DbICClub.find_single({"_model": ICClubDB, "idclub": idclub})
+    return EligibilityIndex.from_clubs([club])
+
+
+def planning_lineup(plan: ICPlanningItem) -> List[int]:
+    side = "home" if plan.playinghome else "visit"
+    return [getattr(g, f"idnumber_{side}") or 0 for g in plan.games]
+
+
+async def clb_validateICplanning(
+    plannings: List[ICPlanningItem],
+) -> List[ICLineupEligibility]:
+    """
+    the eligibility per board of the planning of teams
+    """
+    checks = []
+    for plan in plannings:
+        index = await read_club_eligibility(plan.idclub)
+        checks.append(
+            ICLineupEligibility(
+                division=plan.division,
+                idclub=plan.idclub,
+                index=plan.index,
+                pairingnumber=plan.pairingnumber,
+                round=plan.round,
+                boards=index.check_lineup(
+                    plan.idclub,
+                    plan.division,
+                    plan.index,
+                    plan.pairingnumber,
+                    planning_lineup(plan),
+                ),
+            )
+        )
+    return checks
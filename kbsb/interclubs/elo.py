@@ -1,35 +1,41 @@
+import asyncio
 import logging
+import time
+import zipfile
 
 from pydantic import BaseModel
-from csv import DictReader
+from contextlib import contextmanager
 from datetime import date
-from typing import Literal, List
+from tempfile import SpooledTemporaryFile
+from typing import (
+    IO,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    Literal,
+    List,
+    Tuple,
+)
 from unidecode import unidecode
-from .md_elo import EloGame, EloPlayer
-from .md_interclubs import DbICSeries, ICROUNDS
+from fastapi.responses import StreamingResponse
+from reddevil.core import RdBadRequest, get_mongodb
+from kbsb.report.report import writeFilestream
+from .eloformat import render_belgian_elo, render_fide_elo
+from .md_elo import EloBatchReport, EloGame, EloPlayer
+from .md_interclubs import DbICSeries, ICROUNDS, ICSeries
+from .ratingsnapshot import load_rating_snapshot
 
 logger = logging.getLogger(__name__)
 
 
 # TODO eloprocessing.csv needs to be automated !!!
 
-# data model
-elodata = {}  # elo data indexed by idbel
-belgames1 = []  # divison 1 to 4
-belgames2 = []  # division 5
-fidegames = []
-tlines = {}  # team lines index by team name, list gnr
-elopl = {}  # all players index by idbel
-cnt = {
-    "won": 0,
-    "drawn": 0,
-    "lost": 0,
-    "npart": 0,
-    "ngames": 0,
-    "nrated": 0,
-    "mteams": 0.0,
-}
-sortedplayers = []  # sorted idbel by elo and name
+ELOFILE = "data/eloprocessing.csv"
+ELOPATH = "interclubs/elo"  # filestore path of the ELO files
+ZIPSPOOLSIZE = 16 * 1024 * 1024  # batch archives up to this size stay in memory
+ZIPCHUNK = 64 * 1024
+
 switch_result = {
     "1-0": "0-1",
     "½-½": "½-½",
@@ -38,30 +44,44 @@ switch_result = {
     "0-1 FF": "1-0 FF",
     "0-0 FF": "0-0 FF",
 }
-linefeed = "\x0D\x0A"
 
 
-def replaceAt(source, index, replace):
+class EloExport:
     """
-    creates a copy of source where replace is filled in at index
+    the state of a single Belgian or FIDE ELO export of a round
+    every export creates its own instance, so exports can run concurrently
+    the methods are synchronous and run in a worker thread
     """
-    return source[:index] + replace + source[index + len(replace) :]
 
+    def __init__(self, round: int, elofile: str = ELOFILE):
+        self.round = round
+        self.elofile = elofile
+        self.elodata = None  # rating snapshot indexed by idbel
+        self.fidegames = []
+        self.tlines = {}  # team lines index by team name, list gnr
+        self.elopl = {}  # all players index by idbel
+        self.cnt = {
+            "won": 0,
+            "drawn": 0,
+            "lost": 0,
+            "npart": 0,
+            "ngames": 0,
+            "nrated": 0,
+            "mteams": 0.0,
+        }
+        self.sortedplayers = []  # sorted idbel by elo and name
 
-def read_elo_data():
-    with open("data/eloprocessing.csv") as ff:
-        csvfide = DictReader(ff)
-        for fd in csvfide:
-            elodata[int(fd["idnumber"])] = fd
-
+    def read_elo_data(self):
+        self.elodata = load_rating_snapshot(self.elofile)
 
-async def belgames_round(round):
-    games1 = []
-    games2 = []
-    for series in await DbICSeries.find_multiple({"_model": DbICSeries.DOCUMENTTYPE}):
-        print(f"processing {series.division} {series.index}")
+    def belgames_series(self, series: ICSeries) -> Iterator[EloGame]:
+        """
+        the Belgian ELO games of a series in the round
+        """
+        encounters = []
+        logger.info(f"processing {series.division} {series.index}")
         for r in series.rounds:
-            if r.round == round:
+            if r.round == self.round:
                 encounters = r.encounters
                 break
         for enc in encounters:
@@ -74,8 +94,8 @@ async def belgames_round(round):
                 idnv = g.idnumber_visit
                 if not idnh or not idnv:
                     continue
-                elodatah = elodata[idnh]
-                elodatav = elodata[idnv]
+                elodatah = self.elodata[idnh]
+                elodatav = self.elodata[idnv]
                 if ix % 2:
                     idbel_white, idbel_black = idnv, idnh
                     belrating_white, belrating_black = (
@@ -118,7 +138,7 @@ async def belgames_round(round):
                         elodatav["gender"] or elodatav["gender2"],
                     )
                     result = g.result
-                game = EloGame(
+                yield EloGame(
                     belrating_white=belrating_white,
                     fullname_white=fullname_white,
                     gender_white=gender_white,
@@ -131,17 +151,24 @@ async def belgames_round(round):
                     natfide_black=natfide_black,
                     result=result,
                 )
-                if series.division == 5:
-                    games2.append(game)
-                else:
-                    games1.append(game)
-    return games1, games2
 
+    def belgames_round(
+        self, allseries: Iterable[ICSeries]
+    ) -> Tuple[List[EloGame], List[EloGame]]:
+        games1 = []
+        games2 = []
+        for series in allseries:
+            games = games2 if series.division == 5 else games1
+            games.extend(self.belgames_series(series))
+        return games1, games2
 
-async def fidegames_round(round):
-    for series in await DbICSeries.find_multiple({"_model": DbICSeries.DOCUMENTTYPE}):
+    def fidegames_series(self, series: ICSeries) -> Iterator[EloGame]:
+        """
+        the FIDE ELO games of a series in the round
+        """
+        encounters = []
         for r in series.rounds:
-            if r.round == round:
+            if r.round == self.round:
                 encounters = r.encounters
                 break
         teams = {t.pairingnumber: t for t in series.teams}
@@ -155,8 +182,8 @@ async def fidegames_round(round):
                 idnv = g.idnumber_visit
                 if not idnh or not idnv:
                     continue
-                fideh = elodata.get(idnh, None)
-                fidev = elodata.get(idnv, None)
+                fideh = self.elodata.get(idnh, None)
+                fidev = self.elodata.get(idnv, None)
                 if not fideh or not fidev:
                     logger.info(
                         f"failed fidev or fideh, updateing eloprocessin.csv might help"
@@ -164,8 +191,8 @@ async def fidegames_round(round):
                 if ix % 2:
                     idbel_white, idbel_black = idnv, idnh
                     idfide_white, idfide_black = (
-                        fidev["idfide"] or "",
-                        fideh["idfide"] or "",
+                        fidev["idfide"],
+                        fideh["idfide"],
                     )
                     fullname_white = fidev["fullname"]
                     if not fullname_white:
@@ -200,8 +227,8 @@ async def fidegames_round(round):
                 else:
                     idbel_white, idbel_black = idnh, idnv
                     idfide_white, idfide_black = (
-                        fideh.get("idfide", "") or "",
-                        fidev.get("idfide", "") or "",
+                        fideh["idfide"],
+                        fidev["idfide"],
                     )
                     fullname_white = fideh["fullname"]
                     if not fullname_white:
@@ -217,7 +244,10 @@ async def fidegames_round(round):
                         fideh["fiderating"] or 0,
                         fidev["fiderating"] or 0,
                     )
-                    natfide_white, natfide_black = fideh["natfide"], fidev["natfide"]
+                    natfide_white, natfide_black = (
+                        fideh["natfide"],
+                        fidev["natfide"],
+                    )
                     birthday_white, birthday_black = (
                         fideh["birthday"],
                         fidev["birthday"],
@@ -230,296 +260,530 @@ async def fidegames_round(round):
                     team_white = teams[enc.pairingnr_home].name
                     team_black = teams[enc.pairingnr_visit].name
                     result = g.result
-                fidegames.append(
-                    EloGame(
-                        idbel_white=idbel_white,
-                        idfide_white=idfide_white,
-                        fullname_white=fullname_white,
-                        fiderating_white=fiderating_white or 0,
-                        natfide_white=natfide_white,
-                        birthday_white=birthday_white,
-                        title_white=title_white,
-                        gender_white=gender_white,
-                        team_white=team_white,
-                        idbel_black=idbel_black,
-                        idfide_black=idfide_black,
-                        fullname_black=fullname_black,
-                        fiderating_black=fiderating_black,
-                        natfide_black=natfide_black,
-                        birthday_black=birthday_black,
-                        title_black=title_black,
-                        gender_black=gender_black,
-                        team_black=team_black,
-                        result=result,
-                    )
+                yield EloGame(
+                    idbel_white=idbel_white,
+                    idfide_white=idfide_white,
+                    fullname_white=fullname_white,
+                    fiderating_white=fiderating_white or 0,
+                    natfide_white=natfide_white,
+                    birthday_white=birthday_white,
+                    title_white=title_white,
+                    gender_white=gender_white,
+                    team_white=team_white,
+                    idbel_black=idbel_black,
+                    idfide_black=idfide_black,
+                    fullname_black=fullname_black,
+                    fiderating_black=fiderating_black,
+                    natfide_black=natfide_black,
+                    birthday_black=birthday_black,
+                    title_black=title_black,
+                    gender_black=gender_black,
+                    team_black=team_black,
+                    result=result,
                 )
 
+    def fidegames_round(self, allseries: Iterable[ICSeries]):
+        for series in allseries:
+            self.fidegames.extend(self.fidegames_series(series))
 
-def to_elo_players():
-    global sortedplayers
-    for g in fidegames:
-        wt = tlines.setdefault(unidecode(g.team_white), [])
-        bt = tlines.setdefault(unidecode(g.team_black), [])
-        wopp = ""
-        bopp = ""
-        if g.result == "1-0":
-            wsc1 = 1.0
-            bsc1 = 0.0
-            wsc2 = "1"
-            bsc2 = "0"
-        if g.result == "½-½":
-            wsc1 = 0.5
-            bsc1 = 0.5
-            wsc2 = "="
-            bsc2 = "="
-        if g.result == "0-1":
-            wsc1 = 0.0
-            bsc1 = 1.0
-            wsc2 = "0"
-            bsc2 = "1"
-        if g.result == "1-0 FF":
-            wsc1 = 1.0
-            wsc2 = "+"
-            wopp = "0000"
-            bsc1 = 0.0
-            bsc2 = "-"
-            bopp = "0000"
-        if g.result == "0-1 FF":
-            wsc1 = 0.0
-            wsc2 = "-"
-            wopp = "0000"
-            bsc1 = 1.0
-            bsc2 = "+"
-            bopp = "0000"
-        white = EloPlayer(
-            idbel=g.idbel_white,
-            idfide=g.idfide_white,
-            fullname=g.fullname_white,
-            fiderating=g.fiderating_white,
-            natfide=g.natfide_white,
-            birthday=g.birthday_white,
-            title=g.title_white,
-            gender=g.gender_white,
-            sc1=wsc1,
-            sc2=wsc2,
-            idopp=g.idbel_black,
-            team=unidecode(g.team_white),
-            color="w",
+    def to_elo_players(self):
+        for g in self.fidegames:
+            wt = self.tlines.setdefault(unidecode(g.team_white), [])
+            bt = self.tlines.setdefault(unidecode(g.team_black), [])
+            wopp = ""
+            bopp = ""
+            if g.result == "1-0":
+                wsc1 = 1.0
+                bsc1 = 0.0
+                wsc2 = "1"
+                bsc2 = "0"
+            if g.result == "½-½":
+                wsc1 = 0.5
+                bsc1 = 0.5
+                wsc2 = "="
+                bsc2 = "="
+            if g.result == "0-1":
+                wsc1 = 0.0
+                bsc1 = 1.0
+                wsc2 = "0"
+                bsc2 = "1"
+            if g.result == "1-0 FF":
+                wsc1 = 1.0
+                wsc2 = "+"
+                wopp = "0000"
+                bsc1 = 0.0
+                bsc2 = "-"
+                bopp = "0000"
+            if g.result == "0-1 FF":
+                wsc1 = 0.0
+                wsc2 = "-"
+                wopp = "0000"
+                bsc1 = 1.0
+                bsc2 = "+"
+                bopp = "0000"
+            white = EloPlayer(
+                idbel=g.idbel_white,
+                idfide=g.idfide_white,
+                fullname=g.fullname_white,
+                fiderating=g.fiderating_white,
+                natfide=g.natfide_white,
+                birthday=g.birthday_white,
+                title=g.title_white,
+                gender=g.gender_white,
+                sc1=wsc1,
+                sc2=wsc2,
+                idopp=g.idbel_black,
+                team=unidecode(g.team_white),
+                color="w",
+            )
+            black = EloPlayer(
+                idbel=g.idbel_black,
+                idfide=g.idfide_black,
+                fullname=g.fullname_black,
+                fiderating=g.fiderating_black,
+                natfide=g.natfide_black,
+                birthday=g.birthday_black,
+                title=g.title_black,
+                gender=g.gender_black,
+                sc1=bsc1,
+                sc2=bsc2,
+                idopp=g.idbel_white,
+                team=unidecode(g.team_black),
+                color="b",
+            )
+            self.elopl[white.idbel] = white
+            self.elopl[black.idbel] = black
+        self.sortedplayers = sorted(
+            self.elopl.keys(),
+            key=lambda x: (-self.elopl[x].fiderating, self.elopl[x].fullname),
         )
-        black = EloPlayer(
-            idbel=g.idbel_black,
-            idfide=g.idfide_black,
-            fullname=g.fullname_black,
-            fiderating=g.fiderating_black,
-            natfide=g.natfide_black,
-            birthday=g.birthday_black,
-            title=g.title_black,
-            gender=g.gender_black,
-            sc1=bsc1,
-            sc2=bsc2,
-            idopp=g.idbel_white,
-            team=unidecode(g.team_black),
-            color="b",
-        )
-        elopl[white.idbel] = white
-        elopl[black.idbel] = black
-    sortedplayers = sorted(
-        elopl.keys(), key=lambda x: (-elopl[x].fiderating, elopl[x].fullname)
-    )
-    logger.info(f"sortedplayers {len(sortedplayers)}")
-    for ix, key in enumerate(sortedplayers):
-        elopl[key].myix = ix + 1
-        elopl[elopl[key].idopp].oppix = ix + 1
-        tlines[elopl[key].team].append(ix + 1)
-
+        logger.info(f"self.sortedplayers {len(self.sortedplayers)}")
+        for ix, key in enumerate(self.sortedplayers):
+            self.elopl[key].myix = ix + 1
+            self.elopl[self.elopl[key].idopp].oppix = ix + 1
+            self.tlines[self.elopl[key].team].append(ix + 1)
 
-def to_belgian_elo(records: List[EloGame], label: str, round: int):
-    """
-    writing a list EloGame records in a Belgian ELO file
-    """
-    hlines = [
-        "00A ### Interclubs",
-        "00B 1 rondes",
-        "00C Envoi des rondes {round} à {round}",
-        "00D Envoi par : interclubs@frbe-kbsb-ksb.be",
-        "00E Envoi par le club : 998",
-        "00F P={npart} R=1 S={icdate:%d/%m/%y} E={icdate:%d/%m/%y} +{won} ={drawn} -{lost}",
-        "012 Belgian Interclubs 2023 - 2024 - Round {round}",
-        "022 Various locations in Belgian Clubs",
-        "032 BEL",
-        "042 {icdate}",
-        "052 {icdate}",
-        "062 {npart}",
-        "102 Cornet, Luc",
-    ]
-    icdate = ICROUNDS[round]
-    ls = " " * 100
-    # make line 132
-    ls = replaceAt(ls, 0, "132")
-    ls = replaceAt(ls, 91, icdate.strftime("%y.%m.%d"))
-    hlines.append(ls)
-    won = 0
-    drawn = 0
-    lost = 0
-    npart = 0
-    ngames = 0
-    glines = []
-    for g in records:
-        if g.result not in ["1-0", "0-1", "½-½"]:
-            continue
-        # fetch player from signaletique
-        whiteline = {
-            "n": npart + 1,
-            "name": g.fullname_white,
-            "idn": g.idbel_white,
-            "nat": g.natfide_white or "BEL",
-            "elo": g.belrating_white,
-            "opponent": npart + 2,
-            "color": "w",
-        }
-        blackline = {
-            "n": npart + 2,
-            "name": g.fullname_black,
-            "idn": g.idbel_black,
-            "nat": g.natfide_black or "BEL",
-            "elo": g.belrating_black,
-            "opponent": npart + 1,
-            "color": "b",
-        }
-        if g.result == "1-0":
-            whiteline["rs"] = "1"
-            blackline["rs"] = "0"
-            whiteline["score"] = 1.0
-            blackline["score"] = 0.0
-            won += 1
-            lost += 1
-        if g.result == "½-½":
-            drawn += 2
-            whiteline["rs"] = "="
-            blackline["rs"] = "="
-            whiteline["score"] = 0.5
-            blackline["score"] = 0.5
-        if g.result == "0-1":
-            won += 1
-            lost += 1
-            whiteline["rs"] = "0"
-            blackline["rs"] = "1"
-            whiteline["score"] = 0.0
-            blackline["score"] = 1.0
-        glines.append(whiteline)
-        glines.append(blackline)
-        ngames += 1
-        npart += 2
-    with open(f"ICN_R{round}_{label}.txt", "w", encoding="latin1") as f:
-        headerdict = {
+    def belgian_elo_lines(self, records: List[EloGame]) -> Iterator[bytes]:
+        """
+        the lines of a Belgian ELO report of a list of EloGame records
+        """
+        won = 0
+        drawn = 0
+        lost = 0
+        npart = 0
+        ngames = 0
+        glines = []
+        for g in records:
+            if g.result not in ["1-0", "0-1", "½-½"]:
+                continue
+            # fetch player from signaletique
+            whiteline = {
+                "n": npart + 1,
+                "name": g.fullname_white,
+                "idn": g.idbel_white,
+                "nat": g.natfide_white or "BEL",
+                "elo": g.belrating_white,
+                "opponent": npart + 2,
+                "color": "w",
+            }
+            blackline = {
+                "n": npart + 2,
+                "name": g.fullname_black,
+                "idn": g.idbel_black,
+                "nat": g.natfide_black or "BEL",
+                "elo": g.belrating_black,
+                "opponent": npart + 1,
+                "color": "b",
+            }
+            if g.result == "1-0":
+                whiteline["rs"] = "1"
+                blackline["rs"] = "0"
+                whiteline["score"] = 1.0
+                blackline["score"] = 0.0
+                won += 1
+                lost += 1
+            if g.result == "½-½":
+                drawn += 2
+                whiteline["rs"] = "="
+                blackline["rs"] = "="
+                whiteline["score"] = 0.5
+                blackline["score"] = 0.5
+            if g.result == "0-1":
+                won += 1
+                lost += 1
+                whiteline["rs"] = "0"
+                blackline["rs"] = "1"
+                whiteline["score"] = 0.0
+                blackline["score"] = 1.0
+            glines.append(whiteline)
+            glines.append(blackline)
+            ngames += 1
+            npart += 2
+        header = {
             "ngames": ngames,
             "npart": npart,
             "won": won,
             "drawn": drawn,
             "lost": lost,
-            "round": round,
-            "icdate": icdate,
+            "round": self.round,
+            "icdate": ICROUNDS[self.round],
         }
-        for l in hlines:
-            fl = l.format(**headerdict)
-            f.write(fl)
-            f.write(linefeed)
-        for l in glines:
-            ls = " " * 100
-            ls = replaceAt(ls, 0, "001")
-            ls = replaceAt(ls, 4, "{:4d}".format(l["n"]))
-            ls = replaceAt(ls, 14, "{:32s}".format(l["name"]))
-            ls = replaceAt(ls, 48, "{:4d}".format(l["elo"]))
-            ls = replaceAt(ls, 63, "{:5d}".format(l["idn"]))
-            ls = replaceAt(ls, 81, "{:3.1f}".format(l["score"]))
-            ls = replaceAt(ls, 91, "{:4d}".format(l["opponent"]))
-            ls = replaceAt(ls, 96, "{:1s}".format(l["color"]))
-            ls = replaceAt(ls, 98, "{:1s}".format(l["rs"]))
-            f.write(ls)
-            f.write(linefeed)
-
-
-def to_fide_elo(round):
-    global sortedplayers
+        return render_belgian_elo(header, glines)
+
+    def fide_elo_lines(self) -> Iterator[bytes]:
+        """
+        the lines of the FIDE ELO report of the FIDE games
+        """
+        for g in self.fidegames:
+            if g.fiderating_white > 0:
+                self.cnt["nrated"] += 1
+            if g.fiderating_black > 0:
+                self.cnt["nrated"] += 1
+            self.cnt["ngames"] += 1
+            self.cnt["npart"] += 2
+        self.cnt["nteams"] = len(self.tlines)
+        self.cnt["icdate"] = ICROUNDS[self.round]
+        self.cnt["round"] = self.round
+        players = (
+            {
+                "myix": pl.myix,
+                "gender": pl.gender.lower(),
+                "title": pl.title,
+                "fullname": pl.fullname,
+                "fiderating": pl.fiderating,
+                "natfide": pl.natfide,
+                "idfide": pl.idfide,
+                "birthday": pl.birthday,
+                "sc1": pl.sc1,
+                "oppix": pl.oppix,
+                "color": pl.color,
+                "sc2": pl.sc2,
+            }
+            for pl in (self.elopl[key] for key in self.sortedplayers)
+        )
+        teams = ({"team": tk, "players": self.tlines[tk]} for tk in sorted(self.tlines))
+        return render_fide_elo(self.cnt, players, teams)
+
+    def fide_report(self, allseries: List[ICSeries]) -> Iterator[bytes]:
+        """
+        the FIDE ELO report, all work is done while iterating
+        """
+        self.read_elo_data()
+        self.fidegames_round(allseries)
+        self.to_elo_players()
+        yield from self.fide_elo_lines()
+
+    def belgian_report(self, allseries: List[ICSeries], label: str) -> Iterator[bytes]:
+        """
+        the Belgian ELO report part1 (division 1 to 4) or part2 (division 5)
+        all work is done while iterating
+        """
+        self.read_elo_data()
+        games1, games2 = self.belgames_round(allseries)
+        yield from self.belgian_elo_lines(games1 if label == "part1" else games2)
+
+    def write_fide(self, allseries: List[ICSeries]) -> str:
+        path = f"{ELOPATH}/ICN_fide_R{self.round}.txt"
+        writeFilestream(path, self.fide_report(allseries))
+        return path
+
+    def write_belg(self, allseries: List[ICSeries]) -> List[str]:
+        self.read_elo_data()
+        games1, games2 = self.belgames_round(allseries)
+        logger.info(f"games {len(games1)} {len(games2)}")
+        paths = []
+        for label, games in [("part1", games1), ("part2", games2)]:
+            path = f"{ELOPATH}/ICN_R{self.round}_{label}.txt"
+            writeFilestream(path, self.belgian_elo_lines(games))
+            paths.append(path)
+        return paths
+
+
+def round_pipeline(round: int) -> List[dict]:
+    return rounds_pipeline([round])
+
+
+def rounds_pipeline(rounds: List[int]) -> List[dict]:
     """
-    writing a list EloGame records in a Belgian ELO file
+    aggregation pipeline returning per series only the encounters of rounds
+    that are not a bye and have at least one game with both players filled in
+    the games are kept as is, as the board number determines the colors
     """
-    hlines = [
-        "012 Belgian Interclubs 2023 - 2024 - Round {round}",
-        "022 Various locations in Belgian Clubs",
-        "032 BEL",
-        "042 {icdate}",
-        "052 {icdate}",
-        "062 {npart}",
-        "072 {nrated}",
-        "082 {nteams}",
-        "092 Standard Team Round Robin",
-        "102 225185 Bailleul, Geert",
-        "112 205494 Cornet, Luc",
-        """122 90'/40 + 30'/end + 30"/move from move 1""",
+    filled = {
+        "$anyElementTrue": {
+            "$map": {
+                "input": {"$ifNull": ["$$e.games", []]},
+                "as": "g",
+                "in": {
+                    "$and": [
+                        {"$gt": ["$$g.idnumber_home", 0]},
+                        {"$gt": ["$$g.idnumber_visit", 0]},
+                    ]
+                },
+            }
+        }
+    }
+    encounters = {
+        "$filter": {
+            "input": "$$r.encounters",
+            "as": "e",
+            "cond": {
+                "$and": [
+                    {"$ne": ["$$e.icclub_home", 0]},
+                    {"$ne": ["$$e.icclub_visit", 0]},
+                    filled,
+                ]
+            },
+        }
+    }
+    return [
+        {"$match": {"rounds.round": {"$in": rounds}}},
+        {
+            "$project": {
+                "_id": 0,
+                "division": 1,
+                "index": 1,
+                "teams": 1,
+                "rounds": {
+                    "$map": {
+                        "input": {
+                            "$filter": {
+                                "input": "$rounds",
+                                "as": "r",
+                                "cond": {"$in": ["$$r.round", rounds]},
+                            }
+                        },
+                        "as": "r",
+                        "in": {
+                            "round": "$$r.round",
+                            "rdate": "$$r.rdate",
+                            "encounters": encounters,
+                        },
+                    }
+                },
+            }
+        },
+        {"$sort": {"division": 1, "index": 1}},
     ]
-    icdate = ICROUNDS[round]
-    ls = " " * 100
-    # make line 132
-    ls = replaceAt(ls, 0, "132")
-    ls = replaceAt(ls, 91, icdate.strftime("%d/%m/%y"))
-    hlines.append(ls)
-    for g in fidegames:
-        if g.fiderating_white > 0:
-            cnt["nrated"] += 1
-        if g.fiderating_black > 0:
-            cnt["nrated"] += 1
-        cnt["ngames"] += 1
-        cnt["npart"] += 2
-    cnt["nteams"] = len(tlines)
-    cnt["icdate"] = icdate
-    cnt["round"] = round
-    with open(f"ICN_fide_R{round}.txt", "w") as f:
-        for l in hlines:
-            fl = l.format(**cnt)
-            f.write(fl)
-            f.write(linefeed)
-        for key in sortedplayers:
-            pl = elopl[key]
-            ls = " " * 100
-            ls = replaceAt(ls, 0, "001")
-            ls = replaceAt(ls, 4, "{:4d}".format(pl.myix))
-            ls = replaceAt(ls, 9, "{:1s}".format(pl.gender.lower()))
-            ls = replaceAt(ls, 10, "{:>3s}".format(pl.title))
-            ls = replaceAt(ls, 14, "{:33s}".format(pl.fullname))
-            ls = replaceAt(ls, 48, "{:4d}".format(pl.fiderating))
-            ls = replaceAt(ls, 53, pl.natfide)
-            ls = replaceAt(ls, 57, "{:11d}".format(pl.idfide))
-            ls = replaceAt(ls, 69, "{:10s}".format(pl.birthday))
-            ls = replaceAt(ls, 80, "{:4.1f}".format(pl.sc1))
-            ls = replaceAt(ls, 91, "{:4d}".format(pl.oppix))
-            ls = replaceAt(ls, 96, pl.color)
-            ls = replaceAt(ls, 98, pl.sc2)
-            if "`" in ls:
-                ls = ls.replace("`", "'")
-            f.write(ls)
-            f.write(linefeed)
-        sortedkeys = sorted(tlines.keys())
-        for tk in sortedkeys:
-            ls = " " * 100
-            ls = replaceAt(ls, 0, "013")
-            ls = replaceAt(ls, 5, tk)
-            for ix, pl in enumerate(tlines[tk]):
-                ls = replaceAt(ls, 36 + 6 * ix, "{:4d}".format(pl))
-            f.write(ls)
-            f.write(linefeed)
-
-
-async def calc_fide_elo(round: int):
-    read_elo_data()
-    await fidegames_round(round)
-    to_elo_players()
-    to_fide_elo(round)
-
-
-async def calc_belg_elo(round):
-    read_elo_data()
-    games1, games2 = await belgames_round(round)
-    logger.info(f"games {len(games1)} {len(games2)}")
-    to_belgian_elo(games1, "part1", round)
-    to_belgian_elo(games2, "part2", round)
+
+
+async def iter_round_series(round: int) -> AsyncIterator[ICSeries]:
+    """
+    stream the series restricted to the played encounters of a round
+    """
+    coll = get_mongodb()[DbICSeries.COLLECTION]
+    async for doc in coll.aggregate(round_pipeline(round)):
+        yield ICSeries(**doc)
+
+
+async def read_round_series(round: int) -> List[ICSeries]:
+    return [s async for s in iter_round_series(round)]
+
+
+async def read_season_series(rounds: List[int]) -> List[ICSeries]:
+    """
+    read the series once for a list of rounds
+    """
+    coll = get_mongodb()[DbICSeries.COLLECTION]
+    return [ICSeries(**doc) async for doc in coll.aggregate(rounds_pipeline(rounds))]
+
+
+async def stream_elo_games(
+    round: int, fide: bool = False, elofile: str = ELOFILE
+) -> AsyncIterator[Tuple[ICSeries, EloGame]]:
+    """
+    stream the Belgian or FIDE ELO games of a round, series by series
+    only the series being processed is held in memory
+    """
+    export = EloExport(round, elofile)
+    await asyncio.to_thread(export.read_elo_data)
+    games = export.fidegames_series if fide else export.belgames_series
+    async for series in iter_round_series(round):
+        for game in games(series):
+            yield series, game
+
+
+async def calc_fide_elo(round: int) -> str:
+    """
+    write the FIDE ELO file of a round to the filestore, returns the path
+    """
+    allseries = await read_round_series(round)
+    return await asyncio.to_thread(EloExport(round).write_fide, allseries)
+
+
+async def calc_belg_elo(round: int) -> List[str]:
+    """
+    write the Belgian ELO files of a round to the filestore, returns the paths
+    """
+    allseries = await read_round_series(round)
+    return await asyncio.to_thread(EloExport(round).write_belg, allseries)
+
+
+def download_response(
+    chunks: List[bytes], media_type: str, filename: str, headers: Dict[str, str] = {}
+) -> StreamingResponse:
+    """
+    stream an export that is completely rendered, so a failing export is
+    reported as an error instead of a truncated download
+    """
+    return StreamingResponse(
+        iter(chunks),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Content-Length": str(sum(len(c) for c in chunks)),
+            **headers,
+        },
+    )
+
+
+async def mgmt_download_fide_elo(round: int) -> StreamingResponse:
+    """
+    download the FIDE ELO file of a round
+    the report is rendered in the threadpool before the response is sent
+    """
+    allseries = await read_round_series(round)
+    export = EloExport(round)
+    lines = await asyncio.to_thread(lambda: list(export.fide_report(allseries)))
+    return download_response(lines, "text/plain", f"ICN_fide_R{round}.txt")
+
+
+async def mgmt_download_belg_elo(round: int, label: str) -> StreamingResponse:
+    """
+    download a Belgian ELO file (part1 or part2) of a round
+    the report is rendered in the threadpool before the response is sent
+    """
+    if label not in ["part1", "part2"]:
+        raise RdBadRequest(description="InvalidLabel")
+    allseries = await read_round_series(round)
+    export = EloExport(round)
+    lines = await asyncio.to_thread(
+        lambda: list(export.belgian_report(allseries, label))
+    )
+    return download_response(
+        lines, "text/plain; charset=latin1", f"ICN_R{round}_{label}.txt"
+    )
+
+
+class StageTimer:
+    """
+    accumulates the time spent per stage of an export
+    """
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{k};dur={v * 1000:.1f}" for k, v in self.timings.items())
+
+
+def batch_rounds(first: int, last: int) -> List[int]:
+    """
+    the rounds from first to last, last 0 meaning the last round of the season
+    """
+    last = last or max(ICROUNDS)
+    if not (1 <= first <= last <= max(ICROUNDS)):
+        raise RdBadRequest(description="InvalidRoundRange")
+    return list(range(first, last + 1))
+
+
+def write_elo_zip(
+    rounds: List[int],
+    allseries: List[ICSeries],
+    f: IO[bytes],
+    timer: StageTimer,
+    elofile: str = ELOFILE,
+) -> List[str]:
+    """
+    write the Belgian part1/part2 and FIDE files of a list of rounds
+    in a zip archive, the ratings and the series are shared by all rounds
+    returns the names of the files in the archive
+    """
+    with timer.stage("ratings"):
+        elodata = load_rating_snapshot(elofile)
+    names = []
+    with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as zf:
+
+        def write_entry(name: str, lines: Iterator[bytes]):
+            with timer.stage("render"), zf.open(name, "w") as entry:
+                for line in lines:
+                    entry.write(line)
+            names.append(name)
+
+        for round in rounds:
+            export = EloExport(round, elofile)
+            export.elodata = elodata
+            with timer.stage("belgian_games"):
+                games1, games2 = export.belgames_round(allseries)
+            write_entry(f"ICN_R{round}_part1.txt", export.belgian_elo_lines(games1))
+            write_entry(f"ICN_R{round}_part2.txt", export.belgian_elo_lines(games2))
+            with timer.stage("fide_games"):
+                export.fidegames_round(allseries)
+                export.to_elo_players()
+            write_entry(f"ICN_fide_R{round}.txt", export.fide_elo_lines())
+    return names
+
+
+async def elo_batch(
+    first: int, last: int
+) -> Tuple[List[int], SpooledTemporaryFile, List[str], StageTimer]:
+    rounds = batch_rounds(first, last)
+    timer = StageTimer()
+    with timer.stage("series"):
+        allseries = await read_season_series(rounds)
+    f = SpooledTemporaryFile(max_size=ZIPSPOOLSIZE)
+    names = await asyncio.to_thread(write_elo_zip, rounds, allseries, f, timer)
+    f.seek(0)
+    return rounds, f, names, timer
+
+
+async def mgmt_elo_batch(first: int = 1, last: int = 0) -> EloBatchReport:
+    """
+    export the ELO files of a range of rounds (default the whole season)
+    in one pass as a zip archive in the filestore
+    """
+    rounds, f, names, timer = await elo_batch(first, last)
+    path = f"{ELOPATH}/ICN_R{rounds[0]}-R{rounds[-1]}.zip"
+    with f:
+        with timer.stage("upload"):
+            await asyncio.to_thread(
+                writeFilestream, path, iter(lambda: f.read(ZIPCHUNK), b"")
+            )
+    logger.info(f"elo batch {path} {timer.server_timing()}")
+    return EloBatchReport(path=path, rounds=rounds, files=names, timings=timer.timings)
+
+
+async def mgmt_download_elo_batch(first: int = 1, last: int = 0) -> StreamingResponse:
+    """
+    download the ELO files of a range of rounds as a zip archive
+    the archive of all rounds is complete before the response is created,
+    so a failing round is reported as an error instead of a corrupt zip
+    the time per stage is reported in the Server-Timing header
+    """
+    rounds, f, names, timer = await elo_batch(first, last)
+    size = f.seek(0, 2)
+    f.seek(0)
+
+    def chunks():
+        with f:
+            yield from iter(lambda: f.read(ZIPCHUNK), b"")
+
+    filename = f"ICN_R{rounds[0]}-R{rounds[-1]}.zip"
+    return StreamingResponse(
+        chunks(),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Content-Length": str(size),
+            "Server-Timing": timer.server_timing(),
+        },
+    )
@@ -0,0 +1,208 @@
+# copyright Ruben Decrop 2012 - 2024
+
+# fixed width record layouts of the Belgian and FIDE rating reports
+# every layout is declared once as a list of fields and compiled, every
+# record is rendered in a single pass
+# the render functions are generators, so the reports can be streamed
+# to a file, the filestore or an http response
+
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+LINEFEED = b"\x0D\x0A"
+
+
+class RecordLayout:
+    """
+    a fixed width record layout
+    fields are (offset, format, key) or (offset, format, key, stride)
+    a field without key is a constant, a field with a stride renders
+    the items of a list every stride positions
+    fields are rendered in order, so a field overflowing its width is
+    overwritten by the next field, as the report format expects
+
+    the layout is compiled once into a single format template, a record
+    whose fields all fit their width is rendered with one format call,
+    the others are rendered field by field into a work buffer of
+    characters, so the fields land on character offsets whatever the
+    encoding, and the full line is encoded once
+    """
+
+    def __init__(
+        self,
+        fields: List[Tuple],
+        width: int = 100,
+        encoding: str = "latin1",
+        translate: Dict[str, str] | None = None,
+    ):
+        self.width = width
+        self.encoding = encoding
+        self.blank = [" "] * width
+        self.table = str.maketrans(translate) if translate else None
+        self.fields = []
+        for f in fields:
+            offset, fmt, key, stride = (tuple(f) + (None, 0))[:4]
+            if key is None:
+                self.fields.append((offset, fmt, None, 0))
+            else:
+                self.fields.append((offset, fmt.format, key, stride))
+        self.template = self.compile(fields)
+
+    def compile(self, fields: List[Tuple]) -> str | None:
+        """
+        build a format template padding every field to its slot,
+        None if the layout cannot be expressed as a single template
+        """
+        offsets = [f[0] for f in fields] + [self.width]
+        if offsets != sorted(offsets) or any(len(f) > 3 for f in fields):
+            return None
+        parts = [" " * offsets[0]]
+        for f, end in zip(fields, offsets[1:]):
+            offset, fmt, key = (tuple(f) + (None,))[:3]
+            slot = end - offset
+            if key is None:
+                if len(fmt) > slot:
+                    return None
+                parts.append(fmt.ljust(slot))
+                continue
+            m = re.fullmatch(r"\{(?::([<>^]?)(\d*)(\.\d+)?([a-z]?))?\}", fmt)
+            if not m:
+                return None
+            align, size, precision, kind = (g or "" for g in m.groups())
+            if size and int(size) <= slot:
+                spec = f"{align}{size}{precision}{kind}"
+                parts.append(f"{{{key}:{spec}}}" + " " * (slot - int(size)))
+            elif not (align or size or precision) and kind in ("", "s"):
+                parts.append(f"{{{key}:<{slot}{kind}}}")
+            else:
+                return None
+        return "".join(parts)
+
+    def render(self, record: Dict[str, Any], buf: List[str]) -> bytes:
+        """
+        render a record, buf is a work buffer reused between records
+        """
+        text = self.template.format_map(record) if self.template else None
+        if text is None or len(text) != self.width:
+            buf[:] = self.blank
+            for offset, fmt, key, stride in self.fields:
+                if key is None:
+                    buf[offset : offset + len(fmt)] = fmt
+                elif stride:
+                    for ix, item in enumerate(record[key]):
+                        value = fmt(item)
+                        pos = offset + ix * stride
+                        buf[pos : pos + len(value)] = value
+                else:
+                    value = fmt(record[key])
+                    buf[offset : offset + len(value)] = value
+            text = "".join(buf)
+        if self.table:
+            text = text.translate(self.table)
+        return text.encode(self.encoding)
+
+
+BELGIAN_HEADER = [
+    "00A ### Interclubs",
+    "00B 1 rondes",
+    "00C Envoi des rondes {round} à {round}",
+    "00D Envoi par : interclubs@frbe-kbsb-ksb.be",
+    "00E Envoi par le club : 998",
+    "00F P={npart} R=1 S={icdate:%d/%m/%y} E={icdate:%d/%m/%y} +{won} ={drawn} -{lost}",
+    "012 Belgian Interclubs 2023 - 2024 - Round {round}",
+    "022 Various locations in Belgian Clubs",
+    "032 BEL",
+    "042 {icdate}",
+    "052 {icdate}",
+    "062 {npart}",
+    "102 Cornet, Luc",
+]
+BELGIAN_132 = RecordLayout([(0, "132"), (91, "{:%y.%m.%d}", "icdate")])
+BELGIAN_001 = RecordLayout(
+    [
+        (0, "001"),
+        (4, "{:4d}", "n"),
+        (14, "{:32s}", "name"),
+        (48, "{:4d}", "elo"),
+        (63, "{:5d}", "idn"),
+        (81, "{:3.1f}", "score"),
+        (91, "{:4d}", "opponent"),
+        (96, "{:1s}", "color"),
+        (98, "{:1s}", "rs"),
+    ]
+)
+
+FIDE_HEADER = [
+    "012 Belgian Interclubs 2023 - 2024 - Round {round}",
+    "022 Various locations in Belgian Clubs",
+    "032 BEL",
+    "042 {icdate}",
+    "052 {icdate}",
+    "062 {npart}",
+    "072 {nrated}",
+    "082 {nteams}",
+    "092 Standard Team Round Robin",
+    "102 225185 Bailleul, Geert",
+    "112 205494 Cornet, Luc",
+    """122 90'/40 + 30'/end + 30"/move from move 1""",
+]
+FIDE_132 = RecordLayout([(0, "132"), (91, "{:%d/%m/%y}", "icdate")], encoding="utf-8")
+FIDE_001 = RecordLayout(
+    [
+        (0, "001"),
+        (4, "{:4d}", "myix"),
+        (9, "{:1s}", "gender"),
+        (10, "{:>3s}", "title"),
+        (14, "{:33s}", "fullname"),
+        (48, "{:4d}", "fiderating"),
+        (53, "{}", "natfide"),
+        (57, "{:11d}", "idfide"),
+        (69, "{:10s}", "birthday"),
+        (80, "{:4.1f}", "sc1"),
+        (91, "{:4d}", "oppix"),
+        (96, "{}", "color"),
+        (98, "{}", "sc2"),
+    ],
+    encoding="utf-8",
+    translate={"`": "'"},
+)
+FIDE_013 = RecordLayout(
+    [(0, "013"), (5, "{}", "team"), (36, "{:4d}", "players", 6)], encoding="utf-8"
+)
+
+
+def render_belgian_elo(
+    header: Dict[str, Any],
+    glines: Iterable[Dict[str, Any]],
+    linefeed: bytes = LINEFEED,
+) -> Iterator[bytes]:
+    """
+    render a Belgian ELO report line by line
+    header holds round, icdate, npart, won, drawn and lost
+    """
+    buf: List[str] = []
+    for l in BELGIAN_HEADER:
+        yield l.format(**header).encode("latin1") + linefeed
+    yield BELGIAN_132.render(header, buf) + linefeed
+    for gl in glines:
+        yield BELGIAN_001.render(gl, buf) + linefeed
+
+
+def render_fide_elo(
+    header: Dict[str, Any],
+    players: Iterable[Dict[str, Any]],
+    teams: Iterable[Dict[str, Any]],
+    linefeed: bytes = LINEFEED,
+) -> Iterator[bytes]:
+    """
+    render a FIDE ELO report line by line
+    header holds round, icdate, npart, nrated and nteams
+    """
+    buf: List[str] = []
+    for l in FIDE_HEADER:
+        yield l.format(**header).encode("utf-8") + linefeed
+    yield FIDE_132.render(header, buf) + linefeed
+    for pl in players:
+        yield FIDE_001.render(pl, buf) + linefeed
+    for t in teams:
+        yield FIDE_013.render(t, buf) + linefeed
@@ -26,6 +26,7 @@ from kbsb.interclubs import (
     PLAYERSPERDIVISION,
 )
 from kbsb.club import get_club_idclub, club_locale
+from kbsb.interclubs.cache import invalidate_clubs
 
 
 # CRUD
@@ -122,6 +123,7 @@ async def set_interclubenrollment(idclub: str, ie: ICEnrollmentIn) -> ICEnrollme
             )
         )
         nenr = await get_interclubenrollment(id)
+    invalidate_clubs()
     receiver = (
         [club.email_main, settings.INTERCLUBS_CC_EMAIL]
         if club.email_main
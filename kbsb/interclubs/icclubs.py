@@ -5,30 +5,39 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-from typing import cast, List, Dict, Any
+from typing import cast, List, Dict, Any, Set, Tuple
+from datetime import datetime, timezone
 import openpyxl
 from tempfile import NamedTemporaryFile
 from fastapi.responses import Response
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
 
 
 from reddevil.core import (
     RdNotFound,
+    get_mongodb,
     get_settings,
 )
 from reddevil.mail import sendEmail
 
+from kbsb.core.cache import cached
 from kbsb.interclubs import (
     ICPlayer,
     ICClubDB,
     ICClubItem,
     ICPlayerUpdate,
+    ICPlayerUpdateItem,
     ICPlayerValidationError,
     ICTeam,
     DbICClub,
     DbICSeries,
     PLAYERSPERDIVISION,
+    iccache,
 )
+from kbsb.interclubs.cache import invalidate_club
 
+ILLEGALOPERATION = 20  # the mongodb error code of a transaction on a standalone server
 
 settings = get_settings()
 
@@ -36,6 +45,7 @@ settings = get_settings()
 # Interclub Clubs, Playerlist and Teams
 
 
+@cached(iccache, "idclub")
 async def anon_getICteams(idclub: int, options: dict = {}) -> List[ICTeam]:
     """
     get all the interclub teams for a club available in all divisions
@@ -49,6 +59,7 @@ async def anon_getICteams(idclub: int, options: dict = {}) -> List[ICTeam]:
     return teams
 
 
+@cached(iccache, "idclub")
 async def anon_getICclub(idclub: int, options: Dict[str, Any] = {}) -> ICClubDB | None:
     """
     get IC club by idclub, returns None if nothing found
@@ -62,6 +73,7 @@ async def anon_getICclub(idclub: int, options: Dict[str, Any] = {}) -> ICClubDB
     return club
 
 
+@cached(iccache)
 async def anon_getICclubs() -> List[ICClubItem] | None:
     """
     get IC club by idclub, returns None if nothing found
@@ -84,69 +96,180 @@ async def clb_getICclub(idclub: int, options: Dict[str, Any] = {}) -> ICClubDB |
     return await DbICClub.find_single(filter)
 
 
-async def clb_updateICplayers(idclub: int, pi: ICPlayerUpdate) -> None:
+def transfer_player(t: ICPlayerUpdateItem) -> ICPlayer:
     """
-    update the the player list of a ckub
+    the player as added to the playerlist of the receiving club
     """
-    icc = await clb_getICclub(idclub)
-    players = pi.players
+    return ICPlayer(
+        assignedrating=t.assignedrating,
+        fiderating=t.fiderating,
+        first_name=t.first_name,
+        idnumber=t.idnumber,
+        idcluborig=t.idcluborig,
+        idclubvisit=t.idclubvisit,
+        last_name=t.last_name,
+        natrating=t.natrating,
+        nature="requestedin",
+        titular=None,
+    )
+
+
+def playerlist_ops(
+    idclub: int, oldplayers: List[ICPlayer], players: List[ICPlayerUpdateItem]
+) -> Tuple[List[UpdateOne], List[Dict[str, Any]], Set[int]]:
+    """
+    the diff of a playerlist update as array operations on all involved clubs
+    returns the update operations, their history documents and the
+    idclubs of the involved clubs
+    """
+    now = datetime.now(timezone.utc)
+    fields = set(ICPlayerUpdateItem.model_fields)
+    oldplsix = {p.idnumber: p for p in oldplayers}
+    newplsix = {p.idnumber: p for p in players}
+    removed = [idn for idn in oldplsix if idn not in newplsix]
+    added = []
+    changed = []
     transfersout = []
     transferdeletes = []
-    inserts = []
-    oldplsix = {p.idnumber: p for p in icc.players}
-    newplsix = {p.idnumber: p for p in players}
-    for p in newplsix.values():
-        idn = p.idnumber
+    for idn, p in newplsix.items():
         if idn not in oldplsix:
-            # inserts
-            inserts.append(p)
-            if p.idclubvisit:
-                if p.idcluborig == idclub:
-                    transfersout.append(p)
-        else:
-            # check for modifications in transfer
-            oldpl = oldplsix[idn]
-            if oldpl.nature != p.nature:
-                if p.nature in ["assigned", "unassigned", "locked"]:
-                    logger.info(f"player {p} moved to transferdeletes")
-                    # the transfer is removed
-                    transferdeletes.append(p)
-                if p.nature in ["confirmedout"]:
-                    transfersout.append(p)
-    dictplayers = [p.model_dump() for p in players]
-    await DbICClub.update({"idclub": idclub}, {"players": dictplayers})
+            added.append(p)
+            if p.idclubvisit and p.idcluborig == idclub:
+                transfersout.append(p)
+            continue
+        oldpl = oldplsix[idn]
+        if p.model_dump() != oldpl.model_dump(include=fields):
+            changed.append(p)
+        if oldpl.nature != p.nature:
+            if p.nature in ["assigned", "unassigned", "locked"]:
+                logger.info(f"player {p} moved to transferdeletes")
+                # the transfer is removed
+                transferdeletes.append(p)
+            if p.nature in ["confirmedout"]:
+                transfersout.append(p)
     logger.info(f"trout {transfersout} trdel {transferdeletes}")
+    updates = []  # (filter, update, oldvalues)
+    if removed:
+        updates.append(
+            (
+                {"idclub": idclub},
+                {"$pull": {"players": {"idnumber": {"$in": removed}}}},
+                [oldplsix[idn].model_dump() for idn in removed],
+            )
+        )
+    for p in changed:
+        updates.append(
+            (
+                {"idclub": idclub, "players.idnumber": p.idnumber},
+                {"$set": {"players.$": p.model_dump()}},
+                [oldplsix[p.idnumber].model_dump()],
+            )
+        )
+    # the added players are inserted at their submitted position, one push
+    # per consecutive run, in ascending order so the positions stay valid
+    positions = {idn: ix for ix, idn in enumerate(newplsix)}
+    runs = []
+    for p in added:
+        if runs and positions[p.idnumber] == positions[runs[-1][-1].idnumber] + 1:
+            runs[-1].append(p)
+        else:
+            runs.append([p])
+    for run in runs:
+        updates.append(
+            (
+                {"idclub": idclub},
+                {
+                    "$push": {
+                        "players": {
+                            "$each": [p.model_dump() for p in run],
+                            "$position": positions[run[0].idnumber],
+                        }
+                    }
+                },
+                [],
+            )
+        )
+    kept = [idn for idn in oldplsix if idn in newplsix]
+    if kept != [idn for idn in newplsix if idn in oldplsix]:
+        # existing players were reordered, write the list in the submitted order
+        updates = [
+            (
+                {"idclub": idclub},
+                {"$set": {"players": [p.model_dump() for p in newplsix.values()]}},
+                [p.model_dump() for p in oldplayers],
+            )
+        ]
     for t in transfersout:
-        receivingclub = await clb_getICclub(t.idclubvisit)
-        rcplayers = receivingclub.players
-        trplayers = [x for x in rcplayers if x.idnumber == t.idnumber]
-        if not trplayers:
-            rcplayers.append(
-                ICPlayer(
-                    assignedrating=t.assignedrating,
-                    fiderating=t.fiderating,
-                    first_name=t.first_name,
-                    idnumber=t.idnumber,
-                    idcluborig=t.idcluborig,
-                    idclubvisit=t.idclubvisit,
-                    last_name=t.last_name,
-                    natrating=t.natrating,
-                    nature="requestedin",
-                    titular=None,
-                )
+        # the filter skips a receiving club already having the player
+        updates.append(
+            (
+                {"idclub": t.idclubvisit, "players.idnumber": {"$ne": t.idnumber}},
+                {"$push": {"players": transfer_player(t).model_dump()}},
+                [],
             )
-            dictplayers = [p.model_dump() for p in rcplayers]
-            await DbICClub.update({"idclub": t.idclubvisit}, {"players": dictplayers})
+        )
     for t in transferdeletes:
-        # we need to remove the transfer from the receiving club if it is existing
+        # remove the transfer from the receiving club if it is existing
+        updates.append(
+            (
+                {"idclub": t.idclubvisit},
+                {"$pull": {"players": {"idnumber": t.idnumber}}},
+                [],
+            )
+        )
+    ops = []
+    history = []
+    for filter, update, oldvalues in updates:
+        update.setdefault("$set", {})["_modificationtime"] = now
+        ops.append(UpdateOne(filter, update))
+        history.append(
+            {
+                "operation": "update",
+                "ts": now,
+                "user": "_unknown",
+                "filter": filter,
+                "values": update,
+                "oldvalues": oldvalues,
+            }
+        )
+    idclubs = {f["idclub"] for f, _, _ in updates}
+    return ops, history, idclubs
+
+
+async def write_playerlists(ops: List[UpdateOne], history: List[Dict[str, Any]]):
+    """
+    apply the playerlist operations and their history in a single transaction
+    a standalone mongodb without transactions gets an ordered bulk write
+    """
+    db = get_mongodb()
+    coll = db[DbICClub.COLLECTION]
+    collhist = db[f"{DbICClub.COLLECTION}__history"]
+    async with await db.client.start_session() as session:
         try:
-            receivingclub = await clb_getICclub(t.idclubvisit)
-            rcplayers = receivingclub.players
-            trplayers = [x for x in rcplayers if x.idnumber != t.idnumber]
-            dictplayers = [p.model_dump() for p in trplayers]
-            await DbICClub.update({"idclub": t.idclubvisit}, {"players": dictplayers})
-        except RdNotFound:
-            pass
+            async with session.start_transaction():
+                await coll.bulk_write(ops, ordered=True, session=session)
+                await collhist.insert_many(history, session=session)
+            return
+        except OperationFailure as e:
+            if e.code != ILLEGALOPERATION:
+                raise
+            logger.warning("transactions not supported, writing without")
+    await coll.bulk_write(ops, ordered=True)
+    await collhist.insert_many(history)
+
+
+async def clb_updateICplayers(idclub: int, pi: ICPlayerUpdate) -> None:
+    """
+    update the the player list of a ckub
+    only the changed players are written, together with the transfers
+    in the receiving clubs
+    """
+    icc = await clb_getICclub(idclub)
+    ops, history, idclubs = playerlist_ops(idclub, icc.players, pi.players)
+    if ops:
+        await write_playerlists(ops, history)
+    for id in idclubs:
+        invalidate_club(id)
 
 
 async def clb_validateICPlayers(
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Literal
+from typing import Dict, List, Literal
 
 
 class EloGame(BaseModel):
@@ -48,3 +48,36 @@ class EloPlayer(BaseModel):
     sc2: str = ""
     team: str
     title: str
+
+
+class EloBatchReport(BaseModel):
+    """
+    the result of a multi round ELO export
+    timings holds the seconds spent per stage
+    """
+
+    path: str
+    rounds: List[int]
+    files: List[str]
+    timings: Dict[str, float]
+
+
+class EloRatingChange(BaseModel):
+    """
+    the projected Belgian and FIDE rating change of a player in a round,
+    round 0 for an aggregate over several rounds
+    """
+
+    idbel: int
+    fullname: str = ""
+    round: int = 0
+    belrating: int = 0
+    belgames: int = 0
+    belscore: float = 0.0
+    belexpected: float = 0.0
+    beldelta: float = 0.0
+    fiderating: int = 0
+    fidegames: int = 0
+    fidescore: float = 0.0
+    fideexpected: float = 0.0
+    fidedelta: float = 0.0
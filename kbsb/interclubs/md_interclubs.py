@@ -189,6 +189,21 @@ class ICGameDetails(BaseModel):
         use_enum_values = True
 
 
+class ICEncounterDetails(BaseModel):
+    """
+    an output validator for the game details of an encounter
+    """
+
+    division: int
+    index: str
+    round: int
+    icclub_home: int
+    icclub_visit: int
+    pairingnr_home: int
+    pairingnr_visit: int
+    games: List[ICGameDetails]
+
+
 class ICEncounter(BaseModel):
     """
     a submodel of ICSeries, representing an IC encounter between 2 teams
@@ -243,6 +258,21 @@ class ICSeries(BaseModel):
     rounds: List[ICRound] = []
 
 
+class ICSeriesSnapshotDB(BaseModel):
+    """
+    a single round of an IC series, serialised for publication
+    as written in the database
+    """
+
+    division: int
+    embargoed: str  # json of the ICSeries without games
+    id: str | None = None
+    idclubs: List[int]
+    index: str
+    public: str  # json of the ICSeries
+    round: int
+
+
 class ICTeamGame(BaseModel):
     """
     an internal model, representing a result of a team in a round
@@ -272,6 +302,7 @@ class ICStandingsDB(BaseModel):
     the IC standings as written to the database
     """
 
+    dirtymarks: List[str] = []  # the queued updates not yet applied
     dirtytime: datetime | None = None
     division: int
     id: str | None = None
@@ -279,6 +310,95 @@ class ICStandingsDB(BaseModel):
     teams: List[ICTeamStanding]
 
 
+class ICCacheStats(BaseModel):
+    """
+    an output model for monitoring the interclub response cache
+    """
+
+    hits: int
+    misses: int
+    hitratio: float
+    size: int
+    maxsize: int
+    ttl: float
+
+
+class ICPenaltyRun(BaseModel):
+    """
+    an output model for a penalties run
+    timings holds the run time in seconds per rule
+    paths holds the filestore paths of the stored reports
+    """
+
+    round: int
+    issues: int
+    timings: Dict[str, float]
+    paths: List[str] = []
+
+
+class ICPenaltyReportFile(BaseModel):
+    """
+    an output model for a stored penalties report
+    """
+
+    format: str
+    path: str
+    round: int
+    size: int
+    updated: datetime | None = None
+
+
+class ICPlayedPlayersDB(BaseModel):
+    """
+    the players that played for a team in a round
+    as written in the database
+    """
+
+    division: int
+    id: str | None = None
+    idclub: int
+    index: str
+    pairingnumber: int
+    players: List[int]
+    round: int
+
+
+class ICViolation(BaseModel):
+    """
+    a rule violation in an encounter, as written in the database
+    pairingnr and idclub are those of the guilty team
+    """
+
+    boardnumber: int
+    division: int
+    guilty: str
+    id: str | None = None
+    idclub: int
+    index: str
+    opponent: str
+    pairingnr: int
+    pairingnr_home: int
+    pairingnr_visit: int
+    reason: str
+    round: int
+    rule: str
+
+
+class ICStandingsWorkerStats(BaseModel):
+    """
+    an output model for monitoring the standings worker
+    latencies are in seconds
+    """
+
+    queuedepth: int
+    processed: int
+    failed: int
+    avglatency: float
+    lastlatency: float
+    maxlatency: float
+    lastlag: float  # time between first enqueue and processing of last entry
+
+
 class ICPlanningItem(BaseModel):
     """
     a submodel of ICPlanning, represnting the planning a single team of a club
@@ -305,6 +425,30 @@ class ICPlanning(BaseModel):
     plannings: List[ICPlanningItem]
 
 
+class ICBoardEligibility(BaseModel):
+    """
+    an output model for the eligibility of the player on a board
+    """
+
+    boardnumber: int
+    eligible: bool = True
+    idnumber: int
+    reasons: List[str] = []
+
+
+class ICLineupEligibility(BaseModel):
+    """
+    an output model for the eligibility of the lineup of a team
+    """
+
+    boards: List[ICBoardEligibility]
+    division: int
+    idclub: int
+    index: str
+    pairingnumber: int
+    round: int
+
+
 class ICResultItem(BaseModel):
     """
     a submodel for the incoming results of a single team in a club
@@ -447,6 +591,13 @@ class DbICSeries(DbBase):
     IDGENERATOR = "uuid"
 
 
+class DbICSeriesSnapshot(DbBase):
+    COLLECTION = "interclub2324seriessnapshot"
+    DOCUMENTTYPE = ICSeriesSnapshotDB
+    VERSION = 1
+    IDGENERATOR = "uuid"
+
+
 class DbICStandings(DbBase):
     COLLECTION = "interclub2324standings"
     DOCUMENTTYPE = ICStandingsDB
@@ -454,6 +605,20 @@ class DbICStandings(DbBase):
     IDGENERATOR = "uuid"
 
 
+class DbICPlayedPlayers(DbBase):
+    COLLECTION = "interclub2324playedplayers"
+    DOCUMENTTYPE = ICPlayedPlayersDB
+    VERSION = 1
+    IDGENERATOR = "uuid"
+
+
+class DbICViolation(DbBase):
+    COLLECTION = "interclub2324violation"
+    DOCUMENTTYPE = ICViolation
+    VERSION = 1
+    IDGENERATOR = "uuid"
+
+
 class DbICVenue(DbBase):
     COLLECTION = "interclub2324venues"
     DOCUMENTTYPE = ICVenueDB
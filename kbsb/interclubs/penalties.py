@@ -1,417 +1,494 @@
-# copyright Ruben Decrop 2012 - 2022
+# copyright Ruben Decrop 2012 - 2024
+
+# the penalties rule engine
+# every check is a rule registered with penalty_rule
+# the season is traversed once: each rule receives the encounters of the
+# earlier rounds (history) and the non bye encounters of the checked round,
+# and can finish with the collected state
+# the lookups shared by the rules are precomputed once in the context
 
 import logging
 
 logger = logging.getLogger(__name__)
 
 import asyncio
-from typing import cast, List, Dict, Any
-from datetime import datetime, timezone, timedelta, time
+import re
+import time as timer
 from csv import DictWriter
+from datetime import datetime, timezone, timedelta, time
+from io import BytesIO, StringIO
+from typing import Any, Dict, List, Set, Tuple
+
+import openpyxl
+from fastapi.responses import StreamingResponse
+from reddevil.core import RdBadRequest, RdNotFound
 
-from reddevil.core import get_mongodb, connect_mongodb, register_app
+from kbsb.report.report import listFilecontent, readFilecontent, writeFilecontent
 from kbsb.interclubs.md_interclubs import (
     DbICSeries,
     ICSeries,
     DbICClub,
     ICClubDB,
-    ICRound,
-    ICTeam,
+    ICEncounter,
+    ICPenaltyReportFile,
+    ICPenaltyRun,
     ICROUNDS,
 )
+from kbsb.interclubs.eligibility import RATING_ORDER, EligibilityIndex
+from kbsb.interclubs.playedplayers import (
+    PlayedIndex,
+    doubleteams,
+    read_played_players,
+)
+
+PENALTIESPATH = "interclubs/penalties"  # filestore path of the reports
+PENALTYFIELDS = ["reason", "division", "pairingnr", "boardnumber", "guilty", "opponent"]
+REPORTNAME = re.compile(r"penalties_R(\d+)\.(csv|xlsx)$")
+REPORTCHUNK = 64 * 1024
 
 
-async def mgmt_generate_penalties(round: int):
+class PenaltyContext:
     """
-    generate penalties report
+    the state of a single penalties run
+    holds the lookups shared by all rules and the reported issues
     """
-    await read_interclubseries()
-    await read_interclubratings()
-    check_round(round)
-    with open("penalties.csv", "w") as f:
-        writer = DictWriter(
-            f,
-            fieldnames=[
-                "reason",
-                "division",
-                "pairingnr",
-                "boardnumber",
-                "guilty",
-                "opponent",
-            ],
-        )
-        writer.writeheader()
-        writer.writerows(issues)
-
-
-allseries = {}
-issues = []
-playerratings = {}
-playertitular = {}
-titulars = {}
-allclubs = []
-doublepairings = [
-    (174, 3, "A", 1, 12),
-    (601, 3, "D", 6, 7),
-    (601, 4, "A", 6, 7),
-    (607, 4, "A", 9, 10),
-]
-
-
-def report_issue(series, gameix, pairingnr, opp_pairingnr, reason):
-    clubnames = {t.pairingnumber: t.name for t in series.teams}
-    if pairingnr and pairingnr not in clubnames:
-        logger.info(f"clubnames issue {pairingnr} {clubnames}")
-    issues.append(
-        {
-            "reason": reason,
-            "division": f"{series.division}{series.index}",
-            "pairingnr": pairingnr,
-            "boardnumber": gameix + 1,
-            "guilty": clubnames.get(pairingnr, "###"),
-            "opponent": clubnames.get(opp_pairingnr, "###"),
+
+    def __init__(
+        self,
+        round: int,
+        allseries: List[ICSeries],
+        allclubs: List[ICClubDB],
+        played: PlayedIndex | None = None,
+    ):
+        self.round = round
+        self.allseries = {(s.division, s.index): s for s in allseries}
+        self.allclubs = allclubs
+        self.clubnames = {
+            (s.division, s.index): {t.pairingnumber: t.name for t in s.teams}
+            for s in allseries
         }
-    )
+        self.clubids = {
+            (s.division, s.index): {t.pairingnumber: t.idclub for t in s.teams}
+            for s in allseries
+        }
+        self.doubleteams = {(s.division, s.index): doubleteams(s) for s in allseries}
+        # the maintained played players index, built from the series if absent
+        if played is None:
+            played = PlayedIndex.from_series(allseries)
+        self.played = played
+        self.eligibility = EligibilityIndex.from_clubs(allclubs)
+        self.issues: List[Dict[str, Any]] = []
+        # the rule and encounter being checked, set by run_rules
+        self.rule = ""
+        self.enc: ICEncounter | None = None
+
+    def report_issue(self, series, gameix, pairingnr, opp_pairingnr, reason):
+        clubnames = self.clubnames[(series.division, series.index)]
+        if pairingnr and pairingnr not in clubnames:
+            logger.info(f"clubnames issue {pairingnr} {clubnames}")
+        self.issues.append(
+            {
+                "reason": reason,
+                "division": f"{series.division}{series.index}",
+                "pairingnr": pairingnr,
+                "boardnumber": gameix + 1,
+                "guilty": clubnames.get(pairingnr, "###"),
+                "opponent": clubnames.get(opp_pairingnr, "###"),
+                "series": (series.division, series.index),
+                "rule": self.rule,
+                "round": self.round,
+                "idclub": self.clubids[(series.division, series.index)].get(
+                    pairingnr, 0
+                ),
+                "pairingnr_home": self.enc.pairingnr_home if self.enc else 0,
+                "pairingnr_visit": self.enc.pairingnr_visit if self.enc else 0,
+            }
+        )
 
 
-def getround(series: ICSeries, rnd: int) -> ICRound:
-    for round in series.rounds:
-        if round.round == rnd:
-            return round
-    logger.info(f"We're fucked to get round {rnd} of {series.division}{series.index}")
-
-
-def getteam(clb, teamname) -> ICTeam:
-    for t in clb.teams:
-        if t.name == teamname:
-            return t
-    logger.info(f"We're fucked to get team {teamname}")
-
-
-async def read_interclubseries():
-    logger.info("reading interclub results")
-    for s in await DbICSeries.find_multiple({"_model": ICSeries}):
-        allseries[(s.division, s.index)] = s
-
-
-async def read_interclubratings():
-    logger.info("reading interclub ratings")
-    for clb in await DbICClub.find_multiple({"_model": ICClubDB, "enrolled": True}):
-        allclubs.append(clb)
-        for p in clb.players:
-            if p.nature in ["assigned", "requestedin"]:
-                playerratings[p.idnumber] = p.assignedrating
-                if p.titular:
-                    teamix = int(p.titular.split(" ")[-1])
-                    team = getteam(clb, p.titular)
-                    playertitular[p.idnumber] = {
-                        "team": teamix,
-                        "division": team.division,
-                        "index": team.index,
-                        "pairingnumber": team.pairingnumber,
-                    }
-
-
-def check_round(r):
-    logger.info("checking forfaits")
-    check_forfaits(r)
-    logger.info("checking signatures")
-    check_signatures(r)
-    logger.info("checking player order")
-    check_order_players(r)
-    logger.info("checking average")
-    check_average_elo(r)
-    logger.info("checking same series")
-    check_titular_ok(r)
-    logger.info("checking same division")
-    check_reserves_in_single_series(r)
-    logger.info("done")
-
-
-def check_forfaits(rnd: int):
-    for s in allseries.values():
-        round = getround(s, rnd)
-        for enc in round.encounters:
-            if enc.icclub_home == 0 or enc.icclub_visit == 0:
-                continue
-            for ix, g in enumerate(enc.games):
-                if g.result in ["1-0 FF", "0-0 FF"]:
-                    report_issue(
-                        s,
-                        ix,
-                        enc.pairingnr_visit,
-                        enc.pairingnr_home,
-                        "forfait away",
-                    )
-                if g.result in ["0-1 FF", "0-0 FF"]:
-                    report_issue(
-                        s,
-                        ix,
-                        enc.pairingnr_home,
-                        enc.pairingnr_visit,
-                        "forfait home",
-                    )
-
-
-def check_signatures(rnd: int):
-    for s in allseries.values():
-        round = getround(s, rnd)
-        nextday = ICROUNDS[rnd] + timedelta(days=1)
-        homesigndate = datetime.combine(nextday, time(0)).astimezone(timezone.utc)
-        visitsigndate = datetime.combine(nextday, time(12)).astimezone(timezone.utc)
-        for enc in round.encounters:
-            if enc.icclub_home == 0 or enc.icclub_visit == 0:
+class PenaltyRule:
+    """
+    base class of the penalty rules, all hooks are optional
+    a rule instance lives for a single run
+    incremental rules only need the encounter and the history of its
+    series, so they can be evaluated when a result is saved
+    """
+
+    name = ""
+    incremental = True
+
+    def history(self, ctx: PenaltyContext, s: ICSeries, rnd: int, enc: ICEncounter):
+        """
+        an encounter of a round before the checked round
+        """
+
+    def encounter(self, ctx: PenaltyContext, s: ICSeries, enc: ICEncounter):
+        """
+        a non bye encounter of the checked round
+        """
+
+    def finish(self, ctx: PenaltyContext):
+        """
+        called once after the traversal
+        """
+
+
+RULES: Dict[str, type] = {}
+
+
+def penalty_rule(name: str):
+    """
+    class decorator registering a penalty rule
+    """
+
+    def decorator(cls):
+        cls.name = name
+        RULES[name] = cls
+        return cls
+
+    return decorator
+
+
+def isbye(enc: ICEncounter) -> bool:
+    return enc.icclub_home == 0 or enc.icclub_visit == 0
+
+
+def incremental_rules() -> List[str]:
+    return [name for name, cls in RULES.items() if cls.incremental]
+
+
+def run_rules(
+    ctx: PenaltyContext,
+    names: List[str] | None = None,
+    encounters: Set[Tuple[int, int]] | None = None,
+) -> Dict[str, float]:
+    """
+    run the registered rules (default all) in a single traversal of the season
+    encounters restricts the checked encounters by (pairingnr_home, pairingnr_visit)
+    returns the run time in seconds per rule
+    """
+    rules = [RULES[n]() for n in (names or RULES)]
+    timings = {r.name: 0.0 for r in rules}
+    history = [
+        (r, r.history) for r in rules if type(r).history is not PenaltyRule.history
+    ]
+    current = [
+        (r, r.encounter)
+        for r in rules
+        if type(r).encounter is not PenaltyRule.encounter
+    ]
+    perf = timer.perf_counter
+    for s in ctx.allseries.values():
+        for rd in s.rounds:
+            if rd.round < ctx.round:
+                hooks, args = history, (rd.round,)
+            elif rd.round == ctx.round:
+                hooks, args = current, ()
+            else:
                 continue
-            if not enc.signhome_ts:
-                report_issue(
-                    s,
-                    -1,
-                    enc.pairingnr_home,
-                    enc.pairingnr_visit,
-                    "signature home missing",
-                )
-            elif enc.signhome_ts.astimezone(timezone.utc) > homesigndate:
-                report_issue(
-                    s,
-                    -1,
-                    enc.pairingnr_home,
-                    enc.pairingnr_visit,
-                    "signature home too late",
+            for enc in rd.encounters:
+                if rd.round == ctx.round:
+                    if isbye(enc):
+                        continue
+                    key = (enc.pairingnr_home, enc.pairingnr_visit)
+                    if encounters is not None and key not in encounters:
+                        continue
+                ctx.enc = enc
+                for rule, hook in hooks:
+                    ctx.rule = rule.name
+                    start = perf()
+                    hook(ctx, s, *args, enc)
+                    timings[rule.name] += perf() - start
+    ctx.enc = None
+    for rule in rules:
+        ctx.rule = rule.name
+        start = perf()
+        rule.finish(ctx)
+        timings[rule.name] += perf() - start
+    return timings
+
+
+@penalty_rule("forfeits")
+class ForfeitsRule(PenaltyRule):
+    def encounter(self, ctx, s, enc):
+        for ix, g in enumerate(enc.games):
+            if g.result in ["1-0 FF", "0-0 FF"]:
+                ctx.report_issue(
+                    s, ix, enc.pairingnr_visit, enc.pairingnr_home, "forfait away"
                 )
-            if not enc.signvisit_ts:
-                report_issue(
-                    s,
-                    -1,
-                    enc.pairingnr_visit,
-                    enc.pairingnr_home,
-                    "signature away missing",
-                )
-            elif enc.signvisit_ts.astimezone(timezone.utc) > visitsigndate:
-                report_issue(
-                    s,
-                    -1,
-                    enc.pairingnr_visit,
-                    enc.pairingnr_home,
-                    "signature home too late",
+            if g.result in ["0-1 FF", "0-0 FF"]:
+                ctx.report_issue(
+                    s, ix, enc.pairingnr_home, enc.pairingnr_visit, "forfait home"
                 )
 
 
-def check_order_players(rnd):
-    for s in allseries.values():
-        round = getround(s, rnd)
-        for enc in round.encounters:
-            if enc.icclub_home == 0 or enc.icclub_visit == 0:
-                continue
-            rhome = 3000
-            rvisit = 3000
-            for ix, g in enumerate(enc.games):
-                if not g.idnumber_home or not g.idnumber_visit:
-                    continue
-                newhome = playerratings[g.idnumber_home]
-                newvisit = playerratings[g.idnumber_visit]
-                if newhome > rhome:
-                    report_issue(
-                        s, ix, enc.pairingnr_home, 0, "rating order not correct"
-                    )
-                if newvisit > rvisit:
-                    report_issue(
-                        s, ix, enc.pairingnr_visit, 0, "rating order not correct"
-                    )
-                rhome = newhome
-                rvisit = newvisit
-
-
-def check_average_elo(rnd):
-    for clb in allclubs:
-        avgdivs = {}
-        for t in clb.teams:
-            serie = allseries[(t.division, t.index)]
-            round = getround(serie, rnd)
-            encounters = [
-                e
-                for e in round.encounters
-                if t.pairingnumber in (e.pairingnr_home, e.pairingnr_visit)
+@penalty_rule("signatures")
+class SignaturesRule(PenaltyRule):
+    def __init__(self):
+        self.deadlines = None
+
+    def encounter(self, ctx, s, enc):
+        if self.deadlines is None:
+            nextday = ICROUNDS[ctx.round] + timedelta(days=1)
+            self.deadlines = (
+                datetime.combine(nextday, time(0)).astimezone(timezone.utc),
+                datetime.combine(nextday, time(12)).astimezone(timezone.utc),
+            )
+        homesigndate, visitsigndate = self.deadlines
+        if not enc.signhome_ts:
+            ctx.report_issue(
+                s, -1, enc.pairingnr_home, enc.pairingnr_visit, "signature home missing"
+            )
+        elif enc.signhome_ts.astimezone(timezone.utc) > homesigndate:
+            ctx.report_issue(
+                s,
+                -1,
+                enc.pairingnr_home,
+                enc.pairingnr_visit,
+                "signature home too late",
+            )
+        if not enc.signvisit_ts:
+            ctx.report_issue(
+                s, -1, enc.pairingnr_visit, enc.pairingnr_home, "signature away missing"
+            )
+        elif enc.signvisit_ts.astimezone(timezone.utc) > visitsigndate:
+            ctx.report_issue(
+                s,
+                -1,
+                enc.pairingnr_visit,
+                enc.pairingnr_home,
+                "signature away too late",
+            )
+
+
+@penalty_rule("player order")
+class PlayerOrderRule(PenaltyRule):
+    def encounter(self, ctx, s, enc):
+        boards = [
+            (ix, g)
+            for ix, g in enumerate(enc.games)
+            if g.idnumber_home and g.idnumber_visit
+        ]
+        for pnr, side in [(enc.pairingnr_home, "home"), (enc.pairingnr_visit, "visit")]:
+            lineup = [(ix, getattr(g, f"idnumber_{side}")) for ix, g in boards]
+            for ix in ctx.eligibility.order_violations(lineup):
+                ctx.report_issue(s, ix, pnr, 0, RATING_ORDER)
+
+
+@penalty_rule("average elo")
+class AverageEloRule(PenaltyRule):
+    """
+    the average rating of a team may not exceed the lowest average
+    of the teams of the same club in a higher division
+    needs all teams of a club, so it only runs on the full season
+    """
+
+    incremental = False
+
+    def __init__(self):
+        self.avgdivs: Dict[int, Dict[int, List[float]]] = {}
+
+    def encounter(self, ctx, s, enc):
+        if not enc.boardpoint2_home or not enc.boardpoint2_visit:  # not played
+            return
+        for idclub, side in [(enc.icclub_home, "home"), (enc.icclub_visit, "visit")]:
+            ratings = [
+                ctx.eligibility.rating(getattr(g, f"idnumber_{side}"))
+                for g in enc.games
+                if getattr(g, f"idnumber_{side}")
             ]
-            if len(encounters) != 1:
-                logger.info(
-                    f"We're fucked to get encounter of {t.name} in {serie.division}{serie.index}"
-                )
-            enc = encounters[0]
-            if not enc.icclub_home or not enc.icclub_visit:  # bye
-                continue
-            if not enc.boardpoint2_home or not enc.boardpoint2_visit:  # not played]
-                continue
-            if t.pairingnumber == enc.pairingnr_home:
-                ratings = [
-                    playerratings[g.idnumber_home] for g in enc.games if g.idnumber_home
-                ]
-            if t.pairingnumber == enc.pairingnr_visit:
-                ratings = [
-                    playerratings[g.idnumber_visit]
-                    for g in enc.games
-                    if g.idnumber_visit
-                ]
-            avgdiv = avgdivs.setdefault(serie.division, [])
             if ratings:
-                avgdiv.append(sum(ratings) / len(ratings))
-        maxdiv2 = max(avgdivs.get(2, [0]))
-        maxdiv3 = max(avgdivs.get(3, [0]))
-        maxdiv4 = max(avgdivs.get(4, [0]))
-        maxdiv5 = max(avgdivs.get(5, [0]))
-        mindiv1 = avgdivs.get(1, [3000])[0]
-        mindiv2 = min(avgdivs.get(2, [3000]))
-        mindiv3 = min(avgdivs.get(3, [3000]))
-        if maxdiv2 > mindiv1:
-            logger.info(f"{t.idclub} Avg elo too high in division 2")
-        if maxdiv3 > min(mindiv1, mindiv2):
-            logger.info(f"{t.idclub} Avg elo too high in division 3")
-        if maxdiv4 > min(mindiv1, mindiv2, mindiv3):
-            logger.info(f"{t.idclub} Avg elo too high in division 4")
-        if maxdiv5 > min(mindiv1, mindiv2, mindiv3):
-            logger.info(f"{t.idclub} Avg elo too high in division 4")
-
-
-def check_titular_ok(rnd):
-    for s in allseries.values():
-        round = getround(s, rnd)
-        for enc in round.encounters:
-            if enc.icclub_home == 0 or enc.icclub_visit == 0:
-                continue
-            for ix, g in enumerate(enc.games):
-                if g.idnumber_home in playertitular:
-                    if s.division > playertitular[g.idnumber_home]["division"]:
-                        report_issue(
-                            s,
-                            ix,
-                            enc.pairingnr_home,
-                            0,
-                            "Titular played in a division too low",
-                        )
-                    if (
-                        s.division == playertitular[g.idnumber_home]["division"]
-                        and s.index != playertitular[g.idnumber_home]["index"]
-                    ):
-                        report_issue(
-                            s,
-                            ix,
-                            enc.pairingnr_home,
-                            0,
-                            "Titular played in wrong series",
-                        )
-                    if (
-                        s.division == playertitular[g.idnumber_home]["division"]
-                        and s.index == playertitular[g.idnumber_home]["index"]
-                        and enc.pairingnr_home
-                        != playertitular[g.idnumber_home]["pairingnumber"]
-                    ):
-                        report_issue(
-                            s,
-                            ix,
-                            enc.pairingnr_home,
-                            0,
-                            "Titular played in wrong team in the series",
-                        )
-                if g.idnumber_visit in playertitular:
-                    if s.division > playertitular[g.idnumber_visit]["division"]:
-                        report_issue(
-                            s,
-                            ix,
-                            enc.pairingnr_visit,
-                            0,
-                            "Titular played in a division too low",
-                        )
-                    if (
-                        s.division == playertitular[g.idnumber_visit]["division"]
-                        and s.index != playertitular[g.idnumber_visit]["index"]
-                    ):
-                        report_issue(
-                            s,
-                            ix,
-                            enc.pairingnr_visit,
-                            0,
-                            "Titular played in wrong series",
-                        )
-                    if (
-                        s.division == playertitular[g.idnumber_visit]["division"]
-                        and s.index == playertitular[g.idnumber_visit]["index"]
-                        and enc.pairingnr_visit
-                        != playertitular[g.idnumber_visit]["pairingnumber"]
-                    ):
-                        report_issue(
-                            s,
-                            ix,
-                            enc.pairingnr_visit,
-                            0,
-                            "Titular played in wrong team in the series",
-                        )
+                avgdivs = self.avgdivs.setdefault(idclub, {})
+                avgdivs.setdefault(s.division, []).append(sum(ratings) / len(ratings))
+
+    def finish(self, ctx):
+        for idclub, avgdivs in self.avgdivs.items():
+            maxdiv2 = max(avgdivs.get(2, [0]))
+            maxdiv3 = max(avgdivs.get(3, [0]))
+            maxdiv4 = max(avgdivs.get(4, [0]))
+            maxdiv5 = max(avgdivs.get(5, [0]))
+            mindiv1 = avgdivs.get(1, [3000])[0]
+            mindiv2 = min(avgdivs.get(2, [3000]))
+            mindiv3 = min(avgdivs.get(3, [3000]))
+            if maxdiv2 > mindiv1:
+                logger.info(f"{idclub} Avg elo too high in division 2")
+            if maxdiv3 > min(mindiv1, mindiv2):
+                logger.info(f"{idclub} Avg elo too high in division 3")
+            if maxdiv4 > min(mindiv1, mindiv2, mindiv3):
+                logger.info(f"{idclub} Avg elo too high in division 4")
+            if maxdiv5 > min(mindiv1, mindiv2, mindiv3):
+                logger.info(f"{idclub} Avg elo too high in division 5")
+
+
+@penalty_rule("titulars")
+class TitularsRule(PenaltyRule):
+    def encounter(self, ctx, s, enc):
+        for ix, g in enumerate(enc.games):
+            for idnumber, pairingnr in [
+                (g.idnumber_home, enc.pairingnr_home),
+                (g.idnumber_visit, enc.pairingnr_visit),
+            ]:
+                reason = ctx.eligibility.titular_reason(
+                    idnumber, s.division, s.index, pairingnr
+                )
+                if reason:
+                    ctx.report_issue(s, ix, pairingnr, 0, reason)
 
 
-def check_reserves_in_single_series(r):
-    for idclub, division, index, pnr1, pnr2 in doublepairings:
-        series = allseries[(division, index)]
-        # build up sets of previous players
-        players1 = set()
-        players2 = set()
-        for rr in range(1, r):
-            round = getround(series, rr)
-            for enc in round.encounters:
-                if enc.icclub_home == 0 or enc.icclub_visit == 0:
-                    continue
-                if pnr1 in (enc.pairingnr_home, enc.pairingnr_visit):
-                    for g in enc.games:
-                        if pnr1 == enc.pairingnr_home:
-                            players1.add(g.idnumber_home)
-                        else:
-                            players1.add(g.idnumber_visit)
-                if pnr2 in (enc.pairingnr_home, enc.pairingnr_visit):
-                    for g in enc.games:
-                        if pnr2 == enc.pairingnr_home:
-                            players2.add(g.idnumber_home)
-                        else:
-                            players2.add(g.idnumber_visit)
-        # now check the players of this round
-        round = getround(series, r)
-        for enc in round.encounters:
-            if enc.icclub_home == 0 or enc.icclub_visit == 0:
-                continue
-            club601 = enc.icclub_home == 601 or enc.icclub_visit == 601
-            if pnr1 in (enc.pairingnr_home, enc.pairingnr_visit):
-                for ix, g in enumerate(enc.games):
-                    if club601:
-                        logger.info(f"game pn1 {g.idnumber_home} - {g.idnumber_visit}")
-                    if pnr1 == enc.pairingnr_home and g.idnumber_home in players2:
-                        report_issue(
-                            series,
-                            ix,
-                            pnr1,
-                            0,
-                            f"player {g.idnumber_home} already played in other team of series",
-                        )
-                    elif pnr1 == enc.pairingnr_visit and g.idnumber_visit in players2:
-                        report_issue(
-                            series,
-                            ix,
-                            pnr1,
-                            0,
-                            f"player {g.idnumber_visit} already played in other team of series",
-                        )
-            if pnr2 in (enc.pairingnr_home, enc.pairingnr_visit):
+@penalty_rule("reserves single series")
+class ReservesSingleSeriesRule(PenaltyRule):
+    """
+    a reserve of a club with 2 teams in the same series can only play
+    for one of these teams
+    the players of the other teams in the earlier rounds come from the
+    played players index, so an encounter costs a lookup per board
+    """
+
+    def encounter(self, ctx, s, enc):
+        doubles = ctx.doubleteams[(s.division, s.index)]
+        for pnr, side in [(enc.pairingnr_home, "home"), (enc.pairingnr_visit, "visit")]:
+            for other in doubles.get(pnr, []):
+                played = ctx.played.before((s.division, s.index, other), ctx.round)
                 for ix, g in enumerate(enc.games):
-                    if club601:
-                        logger.info(f"game pnr2 {g.idnumber_home} - {g.idnumber_visit}")
-                    if pnr2 == enc.pairingnr_home and g.idnumber_home in players1:
-                        report_issue(
-                            series,
-                            ix,
-                            pnr2,
-                            0,
-                            f"player {g.idnumber_home} already played in other team of series",
-                        )
-                    elif pnr2 == enc.pairingnr_visit and g.idnumber_visit in players1:
-                        report_issue(
-                            series,
+                    idnumber = getattr(g, f"idnumber_{side}")
+                    if idnumber in played:
+                        ctx.report_issue(
+                            s,
                             ix,
-                            pnr2,
+                            pnr,
                             0,
-                            f"player {g.idnumber_visit} already played in other team of series",
+                            f"player {idnumber} already played in other team of series",
                         )
+
+
+async def load_penalty_context(round: int) -> PenaltyContext:
+    logger.info("reading interclub results and ratings")
+    allseries = await DbICSeries.find_multiple({"_model": ICSeries})
+    allclubs = await DbICClub.find_multiple({"_model": ICClubDB, "enrolled": True})
+    played = await read_played_players()
+    if not played.covers(allseries, round):
+        logger.warning(
+            "played players index incomplete, using the series, "
+            "run mgmt_rebuild_played_players"
+        )
+        played = None
+    return PenaltyContext(round, allseries, allclubs, played)
+
+
+def penalties_csv(issues: List[Dict[str, Any]]) -> bytes:
+    f = StringIO()
+    writer = DictWriter(f, fieldnames=PENALTYFIELDS, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(issues)
+    return f.getvalue().encode("utf-8")
+
+
+def penalties_xlsx(issues: List[Dict[str, Any]]) -> bytes:
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(PENALTYFIELDS)
+    for issue in issues:
+        ws.append([issue[k] for k in PENALTYFIELDS])
+    f = BytesIO()
+    wb.save(f)
+    return f.getvalue()
+
+
+REPORTFORMATS = {
+    "csv": ("text/csv", penalties_csv),
+    "xlsx": (
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        penalties_xlsx,
+    ),
+}
+
+
+def report_path(round: int, format: str) -> str:
+    return f"{PENALTIESPATH}/penalties_R{round}.{format}"
+
+
+def store_reports(round: int, issues: List[Dict[str, Any]]) -> Dict[str, bytes]:
+    """
+    render the report of a round in all formats and write them to the filestore
+    returns the content per format
+    """
+    contents = {}
+    for format, (_, render) in REPORTFORMATS.items():
+        contents[format] = render(issues)
+        writeFilecontent(report_path(round, format), BytesIO(contents[format]))
+    return contents
+
+
+async def generate_penalties(round: int) -> Tuple[ICPenaltyRun, Dict[str, bytes]]:
+    ctx = await load_penalty_context(round)
+    timings = run_rules(ctx)
+    for name, t in timings.items():
+        logger.info(f"penalty rule {name}: {t * 1000:.1f} ms")
+    contents = await asyncio.to_thread(store_reports, round, ctx.issues)
+    run = ICPenaltyRun(
+        round=round,
+        issues=len(ctx.issues),
+        timings=timings,
+        paths=[report_path(round, format) for format in contents],
+    )
+    return run, contents
+
+
+async def mgmt_generate_penalties(round: int) -> ICPenaltyRun:
+    """
+    generate the penalties report of a round and store it in the filestore
+    as csv and xlsx
+    """
+    run, _ = await generate_penalties(round)
+    return run
+
+
+async def mgmt_download_penalties(
+    round: int, format: str = "csv", refresh: bool = False
+) -> StreamingResponse:
+    """
+    download the penalties report of a round
+    the stored report is streamed, it is only generated when missing or
+    when a refresh is requested
+    """
+    if format not in REPORTFORMATS:
+        raise RdBadRequest(description="InvalidFormat")
+    content = None
+    if not refresh:
+        try:
+            content = await asyncio.to_thread(
+                readFilecontent, report_path(round, format)
+            )
+        except (RdNotFound, FileNotFoundError):
+            logger.info(f"no stored penalties report for round {round}")
+    if content is None:
+        _, contents = await generate_penalties(round)
+        content = contents[format]
+    return StreamingResponse(
+        (content[i : i + REPORTCHUNK] for i in range(0, len(content), REPORTCHUNK)),
+        media_type=REPORTFORMATS[format][0],
+        headers={
+            "Content-Disposition": (f"attachment; filename=penalties_R{round}.{format}")
+        },
+    )
+
+
+async def mgmt_list_penalty_reports() -> List[ICPenaltyReportFile]:
+    """
+    list the penalties reports stored in the filestore
+    """
+    files = await asyncio.to_thread(listFilecontent, PENALTIESPATH)
+    reports = []
+    for f in files:
+        match = REPORTNAME.search(f["path"])
+        if match:
+            reports.append(
+                ICPenaltyReportFile(
+                    format=match.group(2),
+                    path=f["path"],
+                    round=int(match.group(1)),
+                    size=f["size"],
+                    updated=f["updated"],
+                )
+            )
+    return sorted(reports, key=lambda r: (r.round, r.format))
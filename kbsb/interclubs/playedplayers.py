@@ -0,0 +1,238 @@
+# copyright Ruben Decrop 2012 - 2024
+
+# the played players index
+# one document per team and round holds the players that played for the team
+# the index is updated for the changed encounters on every result save,
+# together with the playersplayed of the teams in the series
+# the reserves single series rule reads the index instead of the rounds
+# the double teams of a club in a series are derived from the series teams
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from pymongo import UpdateOne
+from reddevil.core import get_mongodb
+
+from kbsb.interclubs.md_interclubs import (
+    DbICPlayedPlayers,
+    DbICSeries,
+    ICEncounter,
+    ICPlayedPlayersDB,
+    ICSeries,
+)
+
+TeamKey = Tuple[int, str, int]  # division, index, pairingnumber
+
+
+def doubleteams(s: ICSeries) -> Dict[int, List[int]]:
+    """
+    the pairing numbers of the other teams of the same club in the series,
+    for the clubs with more than one team in the series
+    """
+    perclub: Dict[int, List[int]] = {}
+    for t in s.teams:
+        if t.idclub:
+            perclub.setdefault(t.idclub, []).append(t.pairingnumber)
+    return {
+        pnr: [other for other in pnrs if other != pnr]
+        for pnrs in perclub.values()
+        if len(pnrs) > 1
+        for pnr in pnrs
+    }
+
+
+def encounter_players(enc: ICEncounter) -> Tuple[Set[int], Set[int]]:
+    """
+    the players of the home and visiting team in an encounter
+    """
+    home = {g.idnumber_home for g in enc.games if g.idnumber_home}
+    visit = {g.idnumber_visit for g in enc.games if g.idnumber_visit}
+    return home, visit
+
+
+class PlayedIndex:
+    """
+    the players per team and round, with the union of the earlier rounds
+    computed once per team and round
+    """
+
+    def __init__(self):
+        self.played: Dict[TeamKey, Dict[int, Set[int]]] = {}
+        self._before: Dict[Tuple[TeamKey, int], Set[int]] = {}
+
+    def add(self, key: TeamKey, round: int, players: Iterable[int]) -> None:
+        self.played.setdefault(key, {}).setdefault(round, set()).update(players)
+        self._before.clear()
+
+    def before(self, key: TeamKey, round: int) -> Set[int]:
+        """
+        the players that played for a team in the rounds before round
+        """
+        players = self._before.get((key, round))
+        if players is None:
+            players = set()
+            for r, ids in self.played.get(key, {}).items():
+                if r < round:
+                    players |= ids
+            self._before[(key, round)] = players
+        return players
+
+    def team(self, key: TeamKey) -> Set[int]:
+        """
+        the players that played for a team in any round
+        """
+        return set().union(*self.played.get(key, {}).values())
+
+    def covers(self, allseries: Iterable[ICSeries], round: int) -> bool:
+        """
+        check if the index holds every team that played in the series
+        in the rounds before round
+        """
+        for s in allseries:
+            for rd in s.rounds:
+                if rd.round >= round:
+                    continue
+                for enc in rd.encounters:
+                    if enc.icclub_home == 0 or enc.icclub_visit == 0:
+                        continue
+                    home, visit = encounter_players(enc)
+                    for pnr, players in (
+                        (enc.pairingnr_home, home),
+                        (enc.pairingnr_visit, visit),
+                    ):
+                        key = (s.division, s.index, pnr)
+                        if players and rd.round not in self.played.get(key, {}):
+                            return False
+        return True
+
+    @classmethod
+    def from_series(cls, allseries: Iterable[ICSeries]) -> "PlayedIndex":
+        index = cls()
+        for s in allseries:
+            for rd in s.rounds:
+                for enc in rd.encounters:
+                    if enc.icclub_home == 0 or enc.icclub_visit == 0:
+                        continue
+                    home, visit = encounter_players(enc)
+                    index.add((s.division, s.index, enc.pairingnr_home), rd.round, home)
+                    index.add(
+                        (s.division, s.index, enc.pairingnr_visit), rd.round, visit
+                    )
+        return index
+
+    @classmethod
+    def from_docs(cls, docs: Iterable[Dict[str, Any]]) -> "PlayedIndex":
+        index = cls()
+        for d in docs:
+            index.add(
+                (d["division"], d["index"], d["pairingnumber"]),
+                d["round"],
+                d["players"],
+            )
+        return index
+
+
+def played_updates(
+    s: ICSeries, changes: Iterable[Tuple[int, ICEncounter]]
+) -> List[UpdateOne]:
+    """
+    the upserts of the index documents of the changed encounters (round, encounter)
+    """
+    idclubs = {t.pairingnumber: t.idclub for t in s.teams}
+    ops = []
+    for round, enc in changes:
+        if enc.icclub_home == 0 or enc.icclub_visit == 0:
+            continue
+        for pnr, players in zip(
+            (enc.pairingnr_home, enc.pairingnr_visit), encounter_players(enc)
+        ):
+            doc = ICPlayedPlayersDB(
+                division=s.division,
+                idclub=idclubs.get(pnr, 0),
+                index=s.index,
+                pairingnumber=pnr,
+                players=sorted(players),
+                round=round,
+            )
+            ops.append(
+                UpdateOne(
+                    {
+                        "division": s.division,
+                        "index": s.index,
+                        "pairingnumber": pnr,
+                        "round": round,
+                    },
+                    {"$set": doc.model_dump(exclude={"id"})},
+                    upsert=True,
+                )
+            )
+    return ops
+
+
+def playersplayed_updates(s: ICSeries, pairingnrs: Iterable[int]) -> Dict[str, Any]:
+    """
+    the $set paths of the playersplayed of some teams of a series
+    """
+    index = PlayedIndex.from_series([s])
+    pairingnrs = set(pairingnrs)
+    return {
+        f"teams.{ix}.playersplayed": sorted(
+            index.team((s.division, s.index, t.pairingnumber))
+        )
+        for ix, t in enumerate(s.teams)
+        if t.pairingnumber in pairingnrs
+    }
+
+
+async def update_played_players(
+    s: ICSeries, changes: Iterable[Tuple[int, ICEncounter]]
+) -> None:
+    """
+    update the index documents of the changed encounters (round, encounter)
+    the playersplayed of the teams are written with the series
+    """
+    ops = played_updates(s, changes)
+    if ops:
+        coll = get_mongodb()[DbICPlayedPlayers.COLLECTION]
+        await coll.bulk_write(ops, ordered=False)
+
+
+async def read_played_players(division: int = 0, index: str = "") -> PlayedIndex:
+    """
+    read the index of all series or of a single series
+    """
+    filter = {"division": division, "index": index} if division else {}
+    coll = get_mongodb()[DbICPlayedPlayers.COLLECTION]
+    return PlayedIndex.from_docs(await coll.find(filter, {"_id": 0}).to_list(None))
+
+
+async def mgmt_rebuild_played_players() -> int:
+    """
+    rebuild the index and the playersplayed of all teams from the series
+    """
+    db = get_mongodb()
+    coll = db[DbICPlayedPlayers.COLLECTION]
+    await coll.create_index(
+        [("division", 1), ("index", 1), ("pairingnumber", 1), ("round", 1)],
+        unique=True,
+    )
+    await coll.create_index([("players", 1)])
+    ops = []
+    async for doc in db[DbICSeries.COLLECTION].find({}):
+        s = ICSeries(**doc)
+        ops.extend(
+            played_updates(
+                s, ((rd.round, enc) for rd in s.rounds for enc in rd.encounters)
+            )
+        )
+        await DbICSeries.update(
+            {"division": s.division, "index": s.index},
+            playersplayed_updates(s, [t.pairingnumber for t in s.teams]),
+        )
+    if ops:
+        await coll.bulk_write(ops, ordered=False)
+    logger.info(f"rebuilt {len(ops)} played players documents")
+    return len(ops)
@@ -0,0 +1,160 @@
+# copyright Ruben Decrop 2012 - 2024
+
+# publication of the interclub series for anonymous users
+# every round of every series is serialised once into a snapshot document,
+# in an embargoed version (no games) and a public version
+# anonymous requests are served from the snapshots only, a round without
+# snapshots (before the first mgmt_publish_series) is built once on its
+# first read
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+import asyncio
+import hashlib
+from datetime import datetime, time
+from typing import Iterable, List, Tuple
+
+from pymongo import UpdateOne
+from reddevil.core import RdNotFound, get_mongodb
+
+from kbsb.core.cache import cached
+from kbsb.interclubs.cache import iccache
+from kbsb.interclubs.md_interclubs import (
+    DbICSeries,
+    DbICSeriesSnapshot,
+    ICROUNDS,
+    ICSeries,
+)
+
+# serialises the builds of missing rounds within the process
+publishlock = asyncio.Lock()
+
+
+def embargo_time(round: int) -> datetime:
+    """
+    the time the games of a round become public
+    """
+    return datetime.combine(ICROUNDS[round], time(15))
+
+
+def snapshot_updates(s: ICSeries, rounds: Iterable[int]) -> list:
+    """
+    serialises the rounds of a series into snapshot upserts
+    """
+    idclubs = sorted({t.idclub for t in s.teams if t.idclub})
+    ops = []
+    for r in s.rounds:
+        if r.round not in rounds:
+            continue
+        public = ICSeries(division=s.division, index=s.index, teams=s.teams, rounds=[r])
+        embargoed = public.model_copy(deep=True)
+        for enc in embargoed.rounds[0].encounters:
+            enc.games = []
+        ops.append(
+            UpdateOne(
+                {"round": r.round, "division": s.division, "index": s.index},
+                {
+                    "$set": {
+                        "idclubs": idclubs,
+                        "public": public.model_dump_json(),
+                        "embargoed": embargoed.model_dump_json(),
+                    }
+                },
+                upsert=True,
+            )
+        )
+    return ops
+
+
+async def publish_series(s: ICSeries, rounds: Iterable[int] | None = None) -> None:
+    """
+    rebuild the snapshots of some rounds (default all) of a series
+    """
+    rounds = set(rounds) if rounds else {r.round for r in s.rounds}
+    ops = snapshot_updates(s, rounds)
+    if ops:
+        coll = get_mongodb()[DbICSeriesSnapshot.COLLECTION]
+        await coll.bulk_write(ops, ordered=False)
+    for r in rounds:
+        iccache.invalidate("read_ICseries_snapshot", r)
+
+
+async def mgmt_publish_series() -> None:
+    """
+    rebuild all snapshots from the series collection
+    """
+    db = get_mongodb()
+    coll = db[DbICSeriesSnapshot.COLLECTION]
+    await coll.create_index([("round", 1), ("idclubs", 1)])
+    await coll.create_index([("round", 1), ("division", 1), ("index", 1)])
+    ops = []
+    async for doc in db[DbICSeries.COLLECTION].find({}):
+        s = ICSeries(**doc)
+        ops.extend(snapshot_updates(s, {r.round for r in s.rounds}))
+    if ops:
+        await coll.bulk_write(ops, ordered=False)
+    iccache.invalidate("read_ICseries_snapshot")
+    logger.info(f"published {len(ops)} series rounds")
+
+
+async def publish_round(round: int) -> None:
+    """
+    build the snapshots of a round of all series if they are missing
+    """
+    db = get_mongodb()
+    coll = db[DbICSeriesSnapshot.COLLECTION]
+    async with publishlock:
+        if await coll.find_one({"round": round}, {"_id": 1}):
+            return
+        logger.warning(f"no snapshots for round {round}, publishing the round")
+        proj = {i: 1 for i in ICSeries.model_fields.keys()}
+        proj["rounds"] = {"$elemMatch": {"round": round}}
+        ops = []
+        async for doc in db[DbICSeries.COLLECTION].find({}, proj):
+            ops.extend(snapshot_updates(ICSeries(**doc), {round}))
+        if ops:
+            await coll.bulk_write(ops, ordered=False)
+        iccache.invalidate("read_ICseries_snapshot", round)
+
+
+async def anon_getICseries_snapshot(idclub: int, round: int) -> Tuple[str, str]:
+    """
+    get the published series of a round as a json string and its etag
+    idclub 0 returns all series of the round
+    """
+    field = "public" if datetime.now() >= embargo_time(round) else "embargoed"
+    try:
+        return await read_ICseries_snapshot(round, idclub, field)
+    except RdNotFound:
+        await publish_round(round)
+    try:
+        return await read_ICseries_snapshot(round, idclub, field)
+    except RdNotFound:
+        return snapshot_content([])
+
+
+def snapshot_content(fragments: List[str]) -> Tuple[str, str]:
+    content = f"[{','.join(fragments)}]"
+    etag = f'"{hashlib.md5(content.encode()).hexdigest()}"'
+    return content, etag
+
+
+@cached(iccache)
+async def read_ICseries_snapshot(
+    round: int, idclub: int, field: str
+) -> Tuple[str, str]:
+    """
+    read the snapshot fragments of a round, field is public or embargoed
+    raises RdNotFound if the round is not published, so the miss is not cached
+    """
+    coll = get_mongodb()[DbICSeriesSnapshot.COLLECTION]
+    filter = {"round": round}
+    if idclub:
+        filter["idclubs"] = idclub
+    cursor = coll.find(filter, {field: 1}, sort=[("division", 1), ("index", 1)])
+    fragments = [doc[field] for doc in await cursor.to_list(None)]
+    if not fragments and not await coll.find_one({"round": round}, {"_id": 1}):
+        raise RdNotFound(description="RoundNotPublished")
+    return snapshot_content(fragments)
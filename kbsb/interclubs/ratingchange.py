@@ -0,0 +1,304 @@
+# copyright Ruben Decrop 2012 - 2024
+
+# projected rating changes of the interclub games
+# the Belgian and FIDE games assembled by the ELO export are turned into
+# columns (one entry per game), expected scores and K factor deltas of all
+# games are computed in a single vectorised pass, and aggregated per player
+# and round with bincount
+# the anonymous rating change of a player only reads and rates the games of
+# that player and is cached until the next results are saved
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
+from reddevil.core import get_mongodb
+
+from kbsb.core.cache import cached
+
+from .cache import iccache
+from .elo import ELOFILE, EloExport, batch_rounds, read_season_series, rounds_pipeline
+from .md_elo import EloGame, EloRatingChange
+from .md_interclubs import ICROUNDS, DbICSeries, ICSeries
+from .publication import embargo_time
+from .ratingsnapshot import load_rating_snapshot
+
+SCORES = {"1-0": 1.0, "½-½": 0.5, "0-1": 0.0}  # forfeits are not rated
+FIDE_MAXDIFF = 400  # FIDE caps the rating difference at 400 points
+BELGIAN_K = 20
+FIDE_K = 20
+FIDE_K_JUNIOR = 40  # under 18 and rated below 2300
+FIDE_K_TOP = 10  # rated 2400 or higher
+
+
+def expected_score(
+    rating: np.ndarray, opprating: np.ndarray, maxdiff: int | None = None
+) -> np.ndarray:
+    """
+    the expected score of the rating against the opponent rating
+    """
+    diff = (opprating - rating).astype(np.float64)
+    if maxdiff:
+        diff = np.clip(diff, -maxdiff, maxdiff)
+    return 1.0 / (1.0 + 10.0 ** (diff / 400.0))
+
+
+def fide_kfactor(rating: np.ndarray, age: np.ndarray) -> np.ndarray:
+    k = np.full(rating.shape, FIDE_K, dtype=np.float64)
+    k[(age < 18) & (rating < 2300)] = FIDE_K_JUNIOR
+    k[rating >= 2400] = FIDE_K_TOP
+    return k
+
+
+def birthyear(birthday: str) -> int:
+    """
+    the birth year of a YYYY-MM-DD date, 0 if unknown
+    """
+    return int(birthday[:4]) if birthday[:4].isdigit() else 0
+
+
+def game_columns(games: List[Tuple[int, EloGame]], fide: bool) -> Dict[str, np.ndarray]:
+    """
+    the columns of a list of (round, game), forfeits are dropped
+    the games are read in a single pass into one integer table
+    """
+    table = []
+    for r, g in games:
+        score = SCORES.get(g.result)
+        if score is None:
+            continue
+        if fide:
+            table.append(
+                (
+                    r,
+                    g.idbel_white,
+                    g.idbel_black,
+                    g.fiderating_white,
+                    g.fiderating_black,
+                    score * 2,
+                    birthyear(g.birthday_white),
+                    birthyear(g.birthday_black),
+                )
+            )
+        else:
+            table.append(
+                (
+                    r,
+                    g.idbel_white,
+                    g.idbel_black,
+                    g.belrating_white,
+                    g.belrating_black,
+                    score * 2,
+                    0,
+                    0,
+                )
+            )
+    table = np.array(table, dtype=np.int32).reshape(-1, 8)
+    cols = {
+        "round": table[:, 0],
+        "white": table[:, 1],
+        "black": table[:, 2],
+        "rating_white": table[:, 3],
+        "rating_black": table[:, 4],
+        "score": table[:, 5] / 2.0,
+    }
+    if fide:
+        years = np.array([d.year for d in ICROUNDS.values()], dtype=np.int32)
+        years = years[table[:, 0] - min(ICROUNDS)]
+        for ix, color in [(6, "white"), (7, "black")]:
+            born = table[:, ix]
+            cols[f"age_{color}"] = np.where(born > 0, years - born, 99)
+    return cols
+
+
+def rating_deltas(
+    cols: Dict[str, np.ndarray], fide: bool
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    the expected score and rating delta of white and black for every game
+    a game only counts if both players are rated
+    returns (rated, expected_white, expected_black, delta_white, delta_black)
+    """
+    rw, rb = cols["rating_white"], cols["rating_black"]
+    rated = (rw > 0) & (rb > 0)
+    maxdiff = FIDE_MAXDIFF if fide else None
+    exp_w = expected_score(rw, rb, maxdiff)
+    exp_b = 1.0 - exp_w
+    if fide:
+        k_w = fide_kfactor(rw, cols["age_white"])
+        k_b = fide_kfactor(rb, cols["age_black"])
+    else:
+        k_w = k_b = BELGIAN_K
+    delta_w = np.where(rated, k_w * (cols["score"] - exp_w), 0.0)
+    delta_b = np.where(rated, k_b * ((1.0 - cols["score"]) - exp_b), 0.0)
+    return rated, exp_w, exp_b, delta_w, delta_b
+
+
+def player_totals(
+    cols: Dict[str, np.ndarray], fide: bool, perround: bool = True
+) -> Dict[Tuple[int, int], Tuple[int, int, float, float, float]]:
+    """
+    aggregate the rated games per (player, round), round 0 if not perround
+    returns (rating, games, score, expected, delta) per (idbel, round)
+    """
+    rated, exp_w, exp_b, delta_w, delta_b = rating_deltas(cols, fide)
+    rounds = cols["round"] if perround else np.zeros_like(cols["round"])
+    ids = np.concatenate([cols["white"], cols["black"]])[np.tile(rated, 2)]
+    if not len(ids):
+        return {}
+    rnds = np.tile(rounds, 2)[np.tile(rated, 2)]
+    keys, inverse = np.unique(ids.astype(np.int64) * 256 + rnds, return_inverse=True)
+
+    def total(white, black):
+        values = np.concatenate([white, black])[np.tile(rated, 2)]
+        return np.bincount(inverse, weights=values, minlength=len(keys))
+
+    games = np.bincount(inverse, minlength=len(keys))
+    score = total(cols["score"], 1.0 - cols["score"])
+    expected = total(exp_w, exp_b)
+    delta = total(delta_w, delta_b)
+    # the rating of the player in the first game of the period
+    ratings = np.concatenate([cols["rating_white"], cols["rating_black"]])
+    ratings = ratings[np.tile(rated, 2)]
+    first = np.full(len(keys), len(inverse))
+    np.minimum.at(first, inverse, np.arange(len(inverse)))
+    return {
+        divmod(k, 256): row
+        for k, row in zip(
+            keys.tolist(),
+            zip(
+                ratings[first].tolist(),
+                games.tolist(),
+                score.tolist(),
+                expected.tolist(),
+                delta.tolist(),
+            ),
+        )
+    }
+
+
+def rating_changes(
+    rounds: List[int], allseries: list, perround: bool, elofile: str = ELOFILE
+) -> List[EloRatingChange]:
+    """
+    the projected Belgian and FIDE rating changes of the games of rounds
+    """
+    elodata = load_rating_snapshot(elofile)
+    belgames, fidegames = [], []
+    for rnd in rounds:
+        export = EloExport(rnd, elofile)
+        export.elodata = elodata
+        games1, games2 = export.belgames_round(allseries)
+        belgames.extend((rnd, g) for g in games1 + games2)
+        export.fidegames_round(allseries)
+        fidegames.extend((rnd, g) for g in export.fidegames)
+    beltotals = player_totals(game_columns(belgames, False), False, perround)
+    fidetotals = player_totals(game_columns(fidegames, True), True, perround)
+    names = {}
+    for _, g in belgames:
+        names[g.idbel_white] = g.fullname_white
+        names[g.idbel_black] = g.fullname_black
+    changes = []
+    for key in sorted(set(beltotals) | set(fidetotals)):
+        idbel, rnd = key
+        bel = beltotals.get(key, (0, 0, 0.0, 0.0, 0.0))
+        fide = fidetotals.get(key, (0, 0, 0.0, 0.0, 0.0))
+        changes.append(
+            EloRatingChange(
+                idbel=idbel,
+                fullname=names.get(idbel, ""),
+                round=rnd,
+                belrating=bel[0],
+                belgames=bel[1],
+                belscore=bel[2],
+                belexpected=round(bel[3], 2),
+                beldelta=round(bel[4], 2),
+                fiderating=fide[0],
+                fidegames=fide[1],
+                fidescore=fide[2],
+                fideexpected=round(fide[3], 2),
+                fidedelta=round(fide[4], 2),
+            )
+        )
+    return changes
+
+
+def published_rounds(last: int = 0) -> List[int]:
+    """
+    the rounds up to last (0: all) whose games are public
+    """
+    now = datetime.now()
+    return [r for r in batch_rounds(1, last) if embargo_time(r) <= now]
+
+
+async def read_player_series(rounds: List[int], idbel: int) -> List[ICSeries]:
+    """
+    read the series in which a player played in one of the rounds
+    """
+    coll = get_mongodb()[DbICSeries.COLLECTION]
+    played = {
+        "$or": [
+            {"rounds.encounters.games.idnumber_home": idbel},
+            {"rounds.encounters.games.idnumber_visit": idbel},
+        ]
+    }
+    pipeline = [{"$match": played}] + rounds_pipeline(rounds)
+    return [ICSeries(**doc) async for doc in coll.aggregate(pipeline)]
+
+
+def player_ratingchanges(
+    rounds: List[int], allseries: List[ICSeries], idbel: int, elofile: str = ELOFILE
+) -> List[EloRatingChange]:
+    """
+    the projected rating changes of a single player
+    the games of the other players and the games against a player missing
+    in the rating snapshot are blanked, the boards keep their colors
+    """
+    elodata = load_rating_snapshot(elofile)
+    if idbel not in elodata:
+        return []
+    for s in allseries:
+        for r in s.rounds:
+            for enc in r.encounters:
+                for g in enc.games:
+                    players = (g.idnumber_home, g.idnumber_visit)
+                    if idbel not in players or not all(
+                        idn in elodata for idn in players
+                    ):
+                        g.idnumber_home = g.idnumber_visit = None
+    changes = rating_changes(rounds, allseries, True, elofile)
+    return [c for c in changes if c.idbel == idbel]
+
+
+@cached(iccache)
+async def read_ICratingchange(idbel: int, rounds: Tuple[int, ...]):
+    allseries = await read_player_series(list(rounds), idbel)
+    return await asyncio.to_thread(player_ratingchanges, list(rounds), allseries, idbel)
+
+
+async def anon_getICratingchange(idbel: int, last: int = 0) -> List[EloRatingChange]:
+    """
+    the projected rating changes of a player per published round
+    an unknown player has no rating changes
+    """
+    rounds = published_rounds(last)
+    if not rounds:
+        return []
+    return await read_ICratingchange(idbel, tuple(rounds))
+
+
+async def mgmt_getICratingchanges(
+    first: int = 1, last: int = 0
+) -> List[EloRatingChange]:
+    """
+    the projected season to date rating changes of all players
+    over the rounds first to last (0: last round)
+    """
+    rounds = batch_rounds(first, last)
+    allseries = await read_season_series(rounds)
+    return await asyncio.to_thread(rating_changes, rounds, allseries, False)
@@ -0,0 +1,224 @@
+# copyright Ruben Decrop 2012 - 2024
+
+# the player rating snapshot
+# the ratings of all players are stored in a numpy structured array sorted on
+# idnumber, saved as a .npy file next to the csv it is built from
+# the file is memory mapped read-only, so loading is instantaneous and the
+# pages are shared by all workers through the os page cache
+# lookups are binary searches on the idnumber column
+# the snapshot is built at deploy time by kbsb.etl.build_ratingsnapshot, when
+# it must be built at runtime on a read-only filesystem it goes to the temp dir
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+import hashlib
+import os
+import tempfile
+import threading
+from csv import DictReader
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+
+RATINGDTYPE = np.dtype(
+    [
+        ("idnumber", np.int32),
+        ("idfide", np.int32),
+        ("idclub", np.int32),
+        ("belrating", np.int16),
+        ("fiderating", np.int16),
+        ("last_name", "U32"),
+        ("first_name", "U32"),
+        ("fullname", "U48"),
+        ("birthday", "U10"),
+        ("natfide", "U3"),
+        ("title", "U3"),
+        ("gender", "U1"),
+        ("gender2", "U1"),
+    ]
+)
+INTFIELDS = [n for n in RATINGDTYPE.names if RATINGDTYPE[n].kind == "i"]
+
+_snapshots: Dict[str, "RatingSnapshot"] = {}
+_lock = threading.Lock()
+
+
+def build_rating_snapshot(rows: Iterable[Dict[str, Any]]) -> np.ndarray:
+    """
+    build a rating array sorted on idnumber from dicts holding the fields
+    of RATINGDTYPE, missing or empty numbers become 0, None strings ""
+    """
+    records = []
+    for r in rows:
+        records.append(
+            tuple(
+                (
+                    int(r.get(n) or 0)
+                    if n in INTFIELDS
+                    else str(r.get(n) or "")[: RATINGDTYPE[n].itemsize // 4]
+                )
+                for n in RATINGDTYPE.names
+            )
+        )
+    ratings = np.array(records, dtype=RATINGDTYPE)
+    ratings.sort(order="idnumber", kind="stable")
+    return ratings
+
+
+def read_rating_csv(path: str | Path) -> np.ndarray:
+    """
+    build a rating array from an eloprocessing csv file
+    """
+    with open(path) as f:
+        return build_rating_snapshot(DictReader(f))
+
+
+def write_rating_snapshot(ratings: np.ndarray, path: str | Path) -> None:
+    """
+    save a rating array, the file is replaced atomically so readers
+    never see a partial snapshot
+    """
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+    with open(tmp, "wb") as f:
+        np.save(f, ratings)
+    os.replace(tmp, path)
+
+
+class RatingSnapshot:
+    """
+    read-only lookups on a rating array sorted on idnumber
+    rows are returned as dicts of python values
+    """
+
+    def __init__(self, ratings: np.ndarray):
+        self.ratings = ratings.view(np.ndarray)
+        self.idnumbers = self.ratings["idnumber"]
+        self.mtime = 0.0
+        self._index = None
+        self._rows = {}
+
+    @classmethod
+    def load(cls, path: str | Path) -> "RatingSnapshot":
+        return cls(np.load(path, mmap_mode="r"))
+
+    def __len__(self) -> int:
+        return len(self.ratings)
+
+    def positions(self, idnumbers: Iterable[int]) -> np.ndarray:
+        """
+        the row positions of a list of idnumbers, -1 if not found
+        """
+        ids = np.asarray(list(idnumbers), dtype=np.int32)
+        pos = np.searchsorted(self.idnumbers, ids)
+        pos[pos == len(self.idnumbers)] = 0
+        found = len(self.idnumbers) > 0 and self.idnumbers[pos] == ids
+        return np.where(found, pos, -1)
+
+    def position(self, idnumber: int) -> int:
+        """
+        the row position of a single idnumber, -1 if not found
+        single lookups go through a dict built on first use, as a
+        searchsorted call costs more than the lookup itself
+        """
+        if self._index is None:
+            self._index = {id: ix for ix, id in enumerate(self.idnumbers.tolist())}
+        return self._index.get(idnumber, -1)
+
+    def row(self, pos: int) -> Dict[str, Any]:
+        """
+        the row at a position, rows are converted once and shared,
+        they must not be modified
+        """
+        row = self._rows.get(pos)
+        if row is None:
+            values = self.ratings[pos : pos + 1].tolist()[0]
+            row = self._rows[pos] = dict(zip(RATINGDTYPE.names, values))
+        return row
+
+    def rows(self, idnumbers: Iterable[int]) -> List[Dict[str, Any] | None]:
+        """
+        the rows of a list of idnumbers, None for unknown players
+        """
+        pos = self.positions(idnumbers)
+        values = self.ratings[np.maximum(pos, 0)].tolist()
+        return [
+            dict(zip(RATINGDTYPE.names, v)) if p >= 0 else None
+            for p, v in zip(pos.tolist(), values)
+        ]
+
+    def get(self, idnumber: int, default: Any = None) -> Dict[str, Any] | Any:
+        pos = self.position(idnumber)
+        return default if pos < 0 else self.row(pos)
+
+    def __getitem__(self, idnumber: int) -> Dict[str, Any]:
+        pos = self.position(idnumber)
+        if pos < 0:
+            raise KeyError(idnumber)
+        return self.row(pos)
+
+    def __contains__(self, idnumber: int) -> bool:
+        return self.position(idnumber) >= 0
+
+    def column(self, field: str, idnumbers: Iterable[int]) -> np.ndarray:
+        """
+        a column for a list of idnumbers, 0 or "" for unknown players
+        """
+        pos = self.positions(idnumbers)
+        values = self.ratings[field][np.maximum(pos, 0)]
+        return np.where(pos >= 0, values, values.dtype.type())
+
+
+def snapshot_path(elofile: str | Path) -> Path:
+    return Path(elofile).with_suffix(".npy")
+
+
+def tmp_snapshot_path(elofile: str | Path) -> Path:
+    """
+    the snapshot path in the temp dir, for read-only data directories
+    """
+    digest = hashlib.md5(str(Path(elofile).resolve()).encode("utf-8")).hexdigest()
+    return (
+        Path(tempfile.gettempdir()) / f"kbsb_{digest[:8]}_{snapshot_path(elofile).name}"
+    )
+
+
+def snapshot_stale(path: Path, elofile: str | Path) -> bool:
+    try:
+        return os.path.getmtime(path) < os.path.getmtime(elofile)
+    except FileNotFoundError:
+        return os.path.exists(elofile) or not os.path.exists(path)
+
+
+def load_rating_snapshot(elofile: str | Path) -> RatingSnapshot:
+    """
+    the rating snapshot of an eloprocessing csv file
+    the snapshot is (re)built when it is missing or older than the csv
+    and kept loaded as long as it does not change on disk
+    """
+    path = snapshot_path(elofile)
+    with _lock:
+        if snapshot_stale(path, elofile):
+            tmppath = tmp_snapshot_path(elofile)
+            if not snapshot_stale(tmppath, elofile):
+                path = tmppath
+            else:
+                ratings = read_rating_csv(elofile)
+                try:
+                    logger.info(f"building rating snapshot {path} from {elofile}")
+                    write_rating_snapshot(ratings, path)
+                except OSError:
+                    path = tmppath
+                    logger.info(f"data dir read-only, building snapshot {path}")
+                    write_rating_snapshot(ratings, path)
+        key = str(path.resolve())
+        mtime = os.path.getmtime(path)
+        snapshot = _snapshots.get(key)
+        if snapshot is None or snapshot.mtime != mtime:
+            snapshot = RatingSnapshot.load(path)
+            snapshot.mtime = mtime
+            _snapshots[key] = snapshot
+        return snapshot
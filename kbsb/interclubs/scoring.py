@@ -0,0 +1,106 @@
+# copyright Ruben Decrop 2012 - 2024
+
+# the scoring kernel
+# game results are encoded as small integer codes in a 2 dimensional array
+# (encounters x boards), board points, match points and the played flag
+# of all encounters are then computed in a single vectorised pass
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from kbsb.interclubs.md_interclubs import GAMERESULT, ICEncounter
+
+# one code per game result, PADCODE fills the empty boards
+RESULTCODES = {r: ix for ix, r in enumerate(GAMERESULT)}
+PADCODE = len(RESULTCODES)
+NORCODE = RESULTCODES[GAMERESULT.NOTOVERRULED]
+NOTPLAYEDCODE = RESULTCODES[GAMERESULT.NOTPLAYED]
+FORFEITTEAMCODE = RESULTCODES[GAMERESULT.FORFEIT_TEAM]
+
+
+def lookup(points: dict) -> np.ndarray:
+    """
+    build a lookup table indexed by result code
+    """
+    table = np.zeros(PADCODE + 1, dtype=np.int16)
+    for r, p in points.items():
+        table[RESULTCODES[r]] = p
+    return table
+
+
+# board points times 2 per result code
+BP2_HOME = lookup(
+    {
+        GAMERESULT.HOMEWIN: 2,
+        GAMERESULT.FORFEIT_VISIT: 2,
+        GAMERESULT.DRAW: 1,
+        GAMERESULT.SPECIAL_5_0: 1,
+    }
+)
+BP2_VISIT = lookup(
+    {
+        GAMERESULT.VISITWIN: 2,
+        GAMERESULT.FORFEIT_HOME: 2,
+        GAMERESULT.DRAW: 1,
+        GAMERESULT.SPECIAL_0_5: 1,
+    }
+)
+
+
+def encode_games(encounters: List[ICEncounter]) -> np.ndarray:
+    """
+    encode the effective result of each game, the overruled result if any,
+    in an array of shape (encounters, boards)
+    """
+    nboards = max((len(enc.games) for enc in encounters), default=0)
+    results = np.full((len(encounters), nboards), PADCODE, dtype=np.int8)
+    overruled = np.full((len(encounters), nboards), NORCODE, dtype=np.int8)
+    for ix, enc in enumerate(encounters):
+        n = len(enc.games)
+        results[ix, :n] = [RESULTCODES[g.result] for g in enc.games]
+        overruled[ix, :n] = [RESULTCODES[g.overruled or ""] for g in enc.games]
+    isoverruled = (overruled != NORCODE) & (overruled != NOTPLAYEDCODE)
+    return np.where(isoverruled, overruled, results)
+
+
+def score_codes(
+    codes: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    compute per encounter the board points (times 2), match points
+    and played flag from an array of result codes
+    returns (bp2_home, bp2_visit, mp_home, mp_visit, played)
+    """
+    bp2_home = BP2_HOME[codes].sum(axis=1)
+    bp2_visit = BP2_VISIT[codes].sum(axis=1)
+    played = ~(codes == NOTPLAYEDCODE).any(axis=1)
+    scored = played & ~(codes == FORFEITTEAMCODE).any(axis=1)
+    diff = np.sign(bp2_home - bp2_visit)
+    mp_home = np.where(scored, diff + 1, 0)
+    mp_visit = np.where(scored, 1 - diff, 0)
+    return bp2_home, bp2_visit, mp_home, mp_visit, played
+
+
+def calc_points_bulk(encounters: Iterable[ICEncounter]) -> None:
+    """
+    calculate the match points and board points of a list of encounters
+    played is only set, never cleared
+    """
+    encounters = list(encounters)
+    if not encounters:
+        return
+    bp2_home, bp2_visit, mp_home, mp_visit, played = score_codes(
+        encode_games(encounters)
+    )
+    for ix, enc in enumerate(encounters):
+        enc.boardpoint2_home = int(bp2_home[ix])
+        enc.boardpoint2_visit = int(bp2_visit[ix])
+        enc.matchpoint_home = int(mp_home[ix])
+        enc.matchpoint_visit = int(mp_visit[ix])
+        if played[ix]:
+            enc.played = True
@@ -5,7 +5,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-from typing import cast, List, Dict, Any
+from typing import cast, Iterable, List, Dict, Any, Tuple
 from datetime import datetime, timezone, timedelta, time
 import openpyxl
 from tempfile import NamedTemporaryFile
@@ -23,21 +23,36 @@ from reddevil.mail import sendEmail
 
 from kbsb.interclubs import (
     ICEncounter,
+    ICEncounterDetails,
     ICGame,
     ICGameDetails,
+    ICLineupEligibility,
     ICPlanningItem,
     ICResultItem,
     ICSeries,
     ICSeriesDB,
     ICStandingsDB,
-    ICTeamGame,
-    ICTeamStanding,
+    DbICClub,
     DbICSeries,
     DbICStandings,
     ICROUNDS,
     GAMERESULT,
     PLAYERSPERDIVISION,
     anon_getICclub,
+    iccache,
+)
+from kbsb.core.cache import cached
+from kbsb.interclubs.cache import invalidate_series
+from kbsb.interclubs.eligibility import clb_validateICplanning
+from kbsb.interclubs.playedplayers import playersplayed_updates, update_played_players
+from kbsb.interclubs.publication import embargo_time, publish_series
+from kbsb.interclubs.violations import save_violations
+from kbsb.interclubs.scoring import calc_points_bulk
+from kbsb.interclubs.standings import (
+    calc_standings,
+    enqueue_standings,
+    mark_standings,
+    sort_standings,
 )
 
 settings = get_settings()
@@ -48,6 +63,18 @@ settings = get_settings()
 async def anon_getICseries(idclub: int, round: int) -> List[ICSeries] | None:
     """
     get IC club by idclub, returns None if nothing found
+    the games are blanked until the embargo time of the round
+    """
+    embargoed = datetime.now() < embargo_time(round)
+    return await read_ICseries(idclub, round, embargoed)
+
+
+@cached(iccache)
+async def read_ICseries(
+    idclub: int, round: int, embargoed: bool
+) -> List[ICSeries] | None:
+    """
+    read the series, the embargo is part of the cache key
     """
     db = get_mongodb()
     coll = db[DbICSeries.COLLECTION]
@@ -59,10 +86,9 @@ async def anon_getICseries(idclub: int, round: int) -> List[ICSeries] | None:
     if idclub:
         filter["teams.idclub"] = idclub
     series = []
-    icdate = datetime.combine(ICROUNDS[round], time(15))
     async for doc in coll.find(filter, proj):
         s = encode_model(doc, ICSeries)
-        if datetime.now() < icdate:
+        if embargoed:
             for r in s.rounds:
                 for enc in r.encounters:
                     enc.games = []
@@ -94,95 +120,197 @@ async def clb_getICseries(idclub: int, round: int) -> List[ICSeries] | None:
     return series
 
 
-async def clb_saveICplanning(plannings: List[ICPlanningItem]) -> None:
+def getround_ix(s: ICSeries, round: int) -> int:
+    """
+    returns the position of a round in the rounds array of a series
+    """
+    for ix, r in enumerate(s.rounds):
+        if r.round == round:
+            return ix
+    raise RdBadRequest(description="InvalidRound")
+
+
+def encounter_updates(rix: int, encounters: Dict[int, ICEncounter]) -> Dict[str, Any]:
+    """
+    returns the $set paths for the modified encounters of a round,
+    so only those encounters are written instead of the whole rounds array
+    """
+    return {
+        f"rounds.{rix}.encounters.{eix}": enc.model_dump()
+        for eix, enc in encounters.items()
+    }
+
+
+def group_by_series(
+    items: List[ICPlanningItem] | List[ICResultItem],
+) -> Dict[Tuple[int, str], List[ICPlanningItem] | List[ICResultItem]]:
+    """
+    groups planning or result items per series, keeping the submission order
+    """
+    groups = {}
+    for item in items:
+        groups.setdefault((item.division, item.index), []).append(item)
+    return groups
+
+
+def apply_planning(s: ICSeries, plan: ICPlanningItem) -> Dict[str, Any]:
+    """
+    applies the planning of a team on the series in memory
+    returns the $set paths of the modified encounters
+    """
+    rix = getround_ix(s, plan.round)
+    changes = {}
+    for eix, enc in enumerate(s.rounds[rix].encounters):
+        if plan.playinghome and (enc.icclub_home == plan.idclub):
+            changes[eix] = enc
+            if enc.games:
+                for ix, g in enumerate(enc.games):
+                    g.idnumber_home = plan.games[ix].idnumber_home or 0
+            else:
+                enc.games = [
+                    ICGame(
+                        idnumber_home=g.idnumber_home or 0,
+                        idnumber_visit=0,
+                    )
+                    for g in plan.games
+                ]
+        if not plan.playinghome and (enc.icclub_visit == plan.idclub):
+            changes[eix] = enc
+            if enc.games:
+                for ix, g in enumerate(enc.games):
+                    g.idnumber_visit = plan.games[ix].idnumber_visit or 0
+            else:
+                enc.games = [
+                    ICGame(
+                        idnumber_home=0,
+                        idnumber_visit=g.idnumber_visit or 0,
+                    )
+                    for g in plan.games
+                ]
+    return encounter_updates(rix, changes)
+
+
+def apply_result(
+    s: ICSeries, res: ICResultItem, mgmt: bool = False
+) -> List[Tuple[int, int, ICEncounter, ICEncounter]]:
+    """
+    applies the result of an encounter on the series in memory
+    only management can overrule game results
+    returns a list of (round index, encounter index, old encounter, new encounter)
+    """
+    rix = getround_ix(s, res.round)
+    changes = []
+    for eix, enc in enumerate(s.rounds[rix].encounters):
+        if enc.icclub_home == 0 or enc.icclub_visit == 0:
+            continue
+        if enc.icclub_home != res.icclub_home or enc.icclub_visit != res.icclub_visit:
+            continue
+        if mgmt and (
+            enc.pairingnr_home != res.pairingnr_home
+            or enc.pairingnr_visit != res.pairingnr_visit
+        ):
+            continue
+        old = enc.model_copy(deep=True)
+        if mgmt:
+            enc.games = [
+                ICGame(
+                    idnumber_home=g.idnumber_home,
+                    idnumber_visit=g.idnumber_visit,
+                    result=g.result,
+                    overruled=g.overruled,
+                )
+                for g in res.games
+            ]
+        else:
+            # a club cannot overrule, the stored overruled results are kept
+            overruled = [g.overruled for g in old.games]
+            enc.games = [
+                ICGame(
+                    idnumber_home=g.idnumber_home,
+                    idnumber_visit=g.idnumber_visit,
+                    result=g.result,
+                    overruled=(
+                        overruled[ix]
+                        if ix < len(overruled)
+                        else GAMERESULT.NOTOVERRULED
+                    ),
+                )
+                for ix, g in enumerate(res.games)
+            ]
+        if res.signhome_idnumber:
+            enc.signhome_idnumber = res.signhome_idnumber
+            enc.signhome_ts = res.signhome_ts
+        if res.signvisit_idnumber:
+            enc.signvisit_idnumber = res.signvisit_idnumber
+            enc.signvisit_ts = res.signvisit_ts
+        calc_points(enc)
+        changes.append((rix, eix, old, enc))
+    return changes
+
+
+async def clb_saveICplanning(
+    plannings: List[ICPlanningItem],
+) -> List[ICLineupEligibility]:
     """
     save a lists of pleanning per team
+    each series is read and written once
+    returns the eligibility per board of the saved lineups
     """
-    for plan in plannings:
+    for (division, index), plans in group_by_series(plannings).items():
         s = await DbICSeries.find_single(
-            {"division": plan.division, "index": plan.index, "_model": ICSeries}
+            {"division": division, "index": index, "_model": ICSeries}
         )
-        curround = None
-        for r in s.rounds:
-            if r.round == plan.round:
-                curround = r
-        if not curround:
-            raise RdBadRequest(description="InvalidRound")
-        for enc in curround.encounters:
-            if plan.playinghome and (enc.icclub_home == plan.idclub):
-                if enc.games:
-                    for ix, g in enumerate(enc.games):
-                        g.idnumber_home = plan.games[ix].idnumber_home or 0
-                else:
-                    enc.games = [
-                        ICGame(
-                            idnumber_home=g.idnumber_home or 0,
-                            idnumber_visit=0,
-                        )
-                        for g in plan.games
-                    ]
-            if not plan.playinghome and (enc.icclub_visit == plan.idclub):
-                if enc.games:
-                    for ix, g in enumerate(enc.games):
-                        g.idnumber_visit = plan.games[ix].idnumber_visit or 0
-                else:
-                    enc.games = [
-                        ICGame(
-                            idnumber_home=0,
-                            idnumber_visit=g.idnumber_visit or 0,
-                        )
-                        for g in plan.games
-                    ]
-        await DbICSeries.update(
-            {"division": plan.division, "index": plan.index},
-            {"rounds": [r.model_dump() for r in s.rounds]},
+        updates = {}
+        for plan in plans:
+            updates.update(apply_planning(s, plan))
+        if updates:
+            await DbICSeries.update({"division": division, "index": index}, updates)
+            await publish_series(s, {plan.round for plan in plans})
+            invalidate_series(s, {plan.round for plan in plans})
+    return await clb_validateICplanning(plannings)
+
+
+async def save_results(results: List[ICResultItem], mgmt: bool) -> None:
+    """
+    save a list of results,
+    each series is read and written once and its standings updated once
+    """
+    for (division, index), items in group_by_series(results).items():
+        s = await DbICSeries.find_single(
+            {"division": division, "index": index, "_model": ICSeries}
         )
+        changes = {}
+        for res in items:
+            for rix, eix, old, enc in apply_result(s, res, mgmt):
+                # keep the encounter as it was before the first change
+                changes.setdefault((rix, eix), (s.rounds[rix].round, old, enc))
+        if not changes:
+            continue
+        updates = {}
+        for (rix, eix), (_, _, enc) in changes.items():
+            updates.update(encounter_updates(rix, {eix: enc}))
+        saved = [(r, enc) for r, _, enc in changes.values()]
+        pairingnrs = {
+            pnr for _, enc in saved for pnr in (enc.pairingnr_home, enc.pairingnr_visit)
+        }
+        updates.update(playersplayed_updates(s, pairingnrs))
+        # mark the standings before the write, so a failure in any of the
+        # steps below leaves them dirty and the next read recalculates them
+        mark = await mark_standings(division, index)
+        await DbICSeries.update({"division": division, "index": index}, updates)
+        enqueue_standings(division, index, list(changes.values()), series=s, mark=mark)
+        await update_played_players(s, saved)
+        rounds = {r for r, _, _ in changes.values()}
+        await publish_series(s, rounds)
+        invalidate_series(s, rounds)
+        await save_violations(s, saved)
 
 
 async def mgmt_saveICresults(results: List[ICResultItem]) -> None:
     """
     save a list of results per team
     """
-    for res in results:
-        s = await DbICSeries.find_single(
-            {"division": res.division, "index": res.index, "_model": ICSeries}
-        )
-        curround = None
-        for r in s.rounds:
-            if r.round == res.round:
-                curround = r
-        if not curround:
-            raise RdBadRequest(description="InvalidRound")
-        for enc in curround.encounters:
-            if enc.icclub_home == 0 or enc.icclub_visit == 0:
-                continue
-            if (
-                enc.icclub_home == res.icclub_home
-                and enc.icclub_visit == res.icclub_visit
-                and enc.pairingnr_home == res.pairingnr_home
-                and enc.pairingnr_visit == res.pairingnr_visit
-            ):
-                enc.games = [
-                    ICGame(
-                        idnumber_home=g.idnumber_home,
-                        idnumber_visit=g.idnumber_visit,
-                        result=g.result,
-                        overruled=g.overruled,
-                    )
-                    for g in res.games
-                ]
-                if res.signhome_idnumber:
-                    enc.signhome_idnumber = res.signhome_idnumber
-                    enc.signhome_ts = res.signhome_ts
-                if res.signvisit_idnumber:
-                    enc.signvisit_idnumber = res.signvisit_idnumber
-                    enc.signvisit_ts = res.signvisit_ts
-                calc_points(enc)
-        await DbICSeries.update(
-            {"division": res.division, "index": res.index},
-            {"rounds": [r.model_dump() for r in s.rounds]},
-        )
-        await calc_standings(s)
+    await save_results(results, mgmt=True)
 
 
 async def clb_saveICresults(results: List[ICResultItem]) -> None:
@@ -190,98 +318,117 @@ async def clb_saveICresults(results: List[ICResultItem]) -> None:
     save a list of results per team
     """
     # TODO check for time
-    for res in results:
-        s = await DbICSeries.find_single(
-            {"division": res.division, "index": res.index, "_model": ICSeries}
-        )
-        curround = None
-        for r in s.rounds:
-            if r.round == res.round:
-                curround = r
-        if not curround:
-            raise RdBadRequest(description="InvalidRound")
-        for enc in curround.encounters:
-            if enc.icclub_home == 0 or enc.icclub_visit == 0:
-                continue
-            if (
-                enc.icclub_home == res.icclub_home
-                and enc.icclub_visit == res.icclub_visit
-            ):
-                enc.games = [
-                    ICGame(
-                        idnumber_home=g.idnumber_home,
-                        idnumber_visit=g.idnumber_visit,
-                        result=g.result,
-                    )
-                    for g in res.games
-                ]
-                if res.signhome_idnumber:
-                    enc.signhome_idnumber = res.signhome_idnumber
-                    enc.signhome_ts = res.signhome_ts
-                if res.signvisit_idnumber:
-                    enc.signvisit_idnumber = res.signvisit_idnumber
-                    enc.signvisit_ts = res.signvisit_ts
-                calc_points(enc)
-        await DbICSeries.update(
-            {"division": res.division, "index": res.index},
-            {"rounds": [r.model_dump() for r in s.rounds]},
-        )
-        if enc.played:
-            standings = await DbICStandings.find_single(
-                {
-                    "division": s.division,
-                    "index": s.index,
-                    "_model": ICStandingsDB,
-                }
-            )
-            if not standings.dirtytime:
-                await DbICStandings.update(
-                    {
-                        "division": s.division,
-                        "index": s.index,
-                    },
-                    {"dirtytime": datetime.now(timezone.utc)},
-                )
+    await save_results(results, mgmt=False)
 
 
 def calc_points(enc: ICEncounter):
     """
     calculate the matchpoint and boardpoint for the encounter
     """
-    enc.boardpoint2_home = 0
-    enc.boardpoint2_visit = 0
-    enc.matchpoint_home = 0
-    enc.matchpoint_visit = 0
-    allfilled = True
-    forfeited = False
+    calc_points_bulk([enc])
+
+
+async def read_clubplayers(idclubs: Iterable[int]) -> Dict[int, Dict[int, dict]]:
+    """
+    read the players of a set of clubs in a single query
+    returns the players by idnumber by idclub
+    """
+    coll = get_mongodb()[DbICClub.COLLECTION]
+    proj = {"idclub": 1, "_id": 0}
+    for f in ["idnumber", "first_name", "last_name", "assignedrating"]:
+        proj[f"players.{f}"] = 1
+    clubs = {}
+    async for doc in coll.find({"idclub": {"$in": list(idclubs)}}, proj):
+        clubs[doc["idclub"]] = {p["idnumber"]: p for p in doc.get("players", [])}
+    return clubs
+
+
+def encounter_details(
+    enc: ICEncounter, homeplayers: Dict[int, dict], visitplayers: Dict[int, dict]
+) -> List[ICGameDetails]:
+    """
+    build the game details of an encounter
+    """
+    details = []
     for g in enc.games:
-        result = (
-            g.overruled
-            if g.overruled and g.overruled != GAMERESULT.NOTOVERRULED
-            else g.result
+        if not g.idnumber_home or not g.idnumber_visit:
+            continue
+        hpl = homeplayers.get(g.idnumber_home)
+        vpl = visitplayers.get(g.idnumber_visit)
+        if not hpl or not vpl:
+            logger.info(f"player not found {g.idnumber_home} {g.idnumber_visit}")
+            continue
+        details.append(
+            ICGameDetails(
+                idnumber_home=g.idnumber_home,
+                fullname_home=f"{hpl['last_name']}, {hpl['first_name']}",
+                rating_home=hpl["assignedrating"],
+                idnumber_visit=g.idnumber_visit,
+                fullname_visit=f"{vpl['last_name']}, {vpl['first_name']}",
+                rating_visit=vpl["assignedrating"],
+                result=g.result,
+                overruled=g.overruled,
+            )
         )
-        if result in [GAMERESULT.HOMEWIN, GAMERESULT.FORFEIT_VISIT]:
-            enc.boardpoint2_home += 2
-        if result in [GAMERESULT.VISITWIN, GAMERESULT.FORFEIT_HOME]:
-            enc.boardpoint2_visit += 2
-        if result in [GAMERESULT.DRAW, GAMERESULT.SPECIAL_5_0]:
-            enc.boardpoint2_home += 1
-        if result in [GAMERESULT.DRAW, GAMERESULT.SPECIAL_0_5]:
-            enc.boardpoint2_visit += 1
-        if result == GAMERESULT.FORFEIT_TEAM:
-            forfeited = True
-        if result == GAMERESULT.NOTPLAYED:
-            allfilled = False
-    if allfilled:
-        enc.played = True
-        if not forfeited:
-            if enc.boardpoint2_home > enc.boardpoint2_visit:
-                enc.matchpoint_home = 2
-            if enc.boardpoint2_home == enc.boardpoint2_visit:
-                enc.matchpoint_home = 1
-                enc.matchpoint_visit = 1
-            if enc.boardpoint2_home < enc.boardpoint2_visit:
-                enc.matchpoint_visit = 2
+    return details
+
+
+async def anon_getICrounddetails(
+    round: int, division: int = 0, index: str = ""
+) -> List[ICEncounterDetails]:
+    """
+    get the game details of all encounters of a round,
+    optionally limited to a division or a series
+    empty before the embargo time
+    """
+    if datetime.now() < embargo_time(round):
+        return []
+    return await get_ICrounddetails(round, division, index)
+
+
+@cached(iccache)
+async def get_ICrounddetails(
+    round: int, division: int, index: str
+) -> List[ICEncounterDetails]:
+    """
+    the series are read once, with only the requested round,
+    and the players of all involved clubs in a single query
+    """
+    coll = get_mongodb()[DbICSeries.COLLECTION]
+    filter = {}
+    if division:
+        filter["division"] = division
+    if index:
+        filter["index"] = index
+    proj = {"division": 1, "index": 1, "rounds": {"$elemMatch": {"round": round}}}
+    encounters = []
+    async for doc in coll.find(filter, proj):
+        for r in doc.get("rounds", []):
+            for e in r["encounters"]:
+                enc = ICEncounter(**e)
+                if enc.icclub_home and enc.icclub_visit:
+                    encounters.append((doc["division"], doc["index"], enc))
+    idclubs = set()
+    for _, _, enc in encounters:
+        idclubs.update([enc.icclub_home, enc.icclub_visit])
+    clubs = await read_clubplayers(idclubs)
+    return [
+        ICEncounterDetails(
+            division=div,
+            index=ix,
+            round=round,
+            icclub_home=enc.icclub_home,
+            icclub_visit=enc.icclub_visit,
+            pairingnr_home=enc.pairingnr_home,
+            pairingnr_visit=enc.pairingnr_visit,
+            games=encounter_details(
+                enc,
+                clubs.get(enc.icclub_home, {}),
+                clubs.get(enc.icclub_visit, {}),
+            ),
+        )
+        for div, ix, enc in encounters
+    ]
 
 
 async def anon_getICencounterdetails(
@@ -293,144 +440,22 @@ async def anon_getICencounterdetails(
     pairingnr_home: int,
     pairingnr_visit: int,
 ) -> List[ICGameDetails]:
-    icserie = await DbICSeries.find_single(
-        {
-            "_model": ICSeries,
-            "division": division,
-            "index": index,
-        }
-    )
-    icdate = datetime.combine(ICROUNDS[round], time(15))
-    if datetime.now() < icdate:
-        return []
-    details = []
-    for r in icserie.rounds:
-        if r.round == round:
-            for enc in r.encounters:
-                if not enc.icclub_home or not enc.icclub_visit:
-                    continue
-                if (
-                    enc.icclub_home == icclub_home
-                    and enc.icclub_visit == icclub_visit
-                    and enc.pairingnr_home == pairingnr_home
-                    and enc.pairingnr_visit == pairingnr_visit
-                ):
-                    homeclub = await anon_getICclub(icclub_home)
-                    homeplayers = {p.idnumber: p for p in homeclub.players}
-                    visitclub = await anon_getICclub(icclub_visit)
-                    visitplayers = {p.idnumber: p for p in visitclub.players}
-                    for g in enc.games:
-                        if not g.idnumber_home or not g.idnumber_visit:
-                            continue
-                        hpl = homeplayers[g.idnumber_home]
-                        vpl = visitplayers[g.idnumber_visit]
-                        details.append(
-                            ICGameDetails(
-                                idnumber_home=g.idnumber_home,
-                                fullname_home=f"{hpl.last_name}, {hpl.first_name}",
-                                rating_home=hpl.assignedrating,
-                                idnumber_visit=g.idnumber_visit,
-                                fullname_visit=f"{vpl.last_name}, {vpl.first_name}",
-                                rating_visit=vpl.assignedrating,
-                                result=g.result,
-                                overruled=g.overruled,
-                            )
-                        )
-    return details
-
-
-async def calc_standings(series: ICSeries) -> ICStandingsDB:
     """
-    calculates and persists standings of a series
+    get the game details of a single encounter
+    served from the details of the round of the series
     """
-    logger.info(f"recalculate standings {series.division}{series.index}")
-    try:
-        standings = await DbICStandings.find_single(
-            {
-                "division": series.division,
-                "index": series.index,
-                "_model": ICStandingsDB,
-            }
-        )
-    except RdNotFound:
-        standings = ICStandingsDB(
-            division=series.division,
-            index=series.index,
-            teams=[
-                ICTeamStanding(
-                    name=t.name,
-                    idclub=t.idclub,
-                    pairingnumber=t.pairingnumber,
-                    matchpoints=0,
-                    boardpoints=0,
-                    games=[],
-                )
-                for t in series.teams
-                if t.idclub
-            ],
-        )
-        await DbICStandings.add(standings.model_dump(exclude_none=True))
-    for r in series.rounds:
-        for enc in r.encounters:
-            if enc.icclub_home == 0 or enc.icclub_visit == 0:
-                continue
-            if not enc.played:
-                continue
-            team_home = next(
-                (x for x in standings.teams if x.pairingnumber == enc.pairingnr_home),
-                None,
-            )
-            team_visit = next(
-                (x for x in standings.teams if x.pairingnumber == enc.pairingnr_visit),
-                None,
-            )
-            game_home = next(
-                (
-                    x
-                    for x in team_home.games
-                    if x.pairingnumber_opp == team_visit.pairingnumber
-                ),
-                None,
-            )
-            if not game_home:
-                game_home = ICTeamGame(
-                    pairingnumber_opp=team_visit.pairingnumber, round=r.round
-                )
-                team_home.games.append(game_home)
-            game_visit = next(
-                (
-                    x
-                    for x in team_visit.games
-                    if x.pairingnumber_opp == team_home.pairingnumber
-                ),
-                None,
-            )
-            if not game_visit:
-                game_visit = ICTeamGame(
-                    pairingnumber_opp=team_home.pairingnumber, round=r.round
-                )
-                team_visit.games.append(game_visit)
-            game_home.matchpoints = enc.matchpoint_home
-            game_home.boardpoints2 = enc.boardpoint2_home
-            game_visit.matchpoints = enc.matchpoint_visit
-            game_visit.boardpoints2 = enc.boardpoint2_visit
-    for t in standings.teams:
-        t.matchpoints = sum(g.matchpoints for g in t.games)
-        t.boardpoints = sum(g.boardpoints2 for g in t.games) / 2
-    standings.teams = sorted(
-        standings.teams, key=lambda t: (-t.matchpoints, -t.boardpoints)
-    )
-    standings.dirtytime = None
-    return await DbICStandings.update(
-        {
-            "division": series.division,
-            "index": series.index,
-        },
-        standings.model_dump(),
-        {"_model": ICStandingsDB},
-    )
+    for ed in await anon_getICrounddetails(round, division, index):
+        if (
+            ed.icclub_home == icclub_home
+            and ed.icclub_visit == icclub_visit
+            and ed.pairingnr_home == pairingnr_home
+            and ed.pairingnr_visit == pairingnr_visit
+        ):
+            return ed.games
+    return []
 
 
+@cached(iccache)
 async def anon_getICstandings(idclub: int) -> List[ICStandingsDB] | None:
     """
     get the Standings by club
@@ -439,15 +464,20 @@ async def anon_getICstandings(idclub: int) -> List[ICStandingsDB] | None:
     if idclub:
         options["teams.idclub"] = idclub
     docs = await DbICStandings.find_multiple(options)
-    for ix, d in enumerate(docs):
-        dirty = d.dirtytime.replace(tzinfo=timezone.utc) if d.dirtytime else None
-        if dirty and dirty < datetime.now(timezone.utc) - timedelta(minutes=5):
-            logger.info("recalc standings")
-            series = await DbICSeries.find_single(
-                {"division": d.division, "index": d.index, "_model": ICSeries}
-            )
-            docs[ix] = await calc_standings(series)
-    return docs
+    for d in docs:
+        if d.dirtytime:
+            # recalculated by the standings worker, not in the request
+            enqueue_standings(d.division, d.index, full=True)
+    # team rows are updated in place by update_standings, so sort on read
+    return [sort_standings(d) for d in docs]
+
+
+async def mgmt_recalc_standings() -> None:
+    """
+    queue a full recalculation of the standings of all series
+    """
+    for doc in await DbICSeries.find_multiple({"_fieldlist": ["division", "index"]}):
+        enqueue_standings(doc["division"], doc["index"], full=True)
 
 
 async def mgmt_register_teamforfeit(division: int, index: str, name: str) -> None:
@@ -474,6 +504,7 @@ async def mgmt_register_teamforfeit(division: int, index: str, name: str) -> Non
     else:
         raise RdNotFound(description="TeamNotFound")
     team.teamforfeit = True
+    forfeited = []
     for r in series.rounds:
         for enc in r.encounters:
             if team.pairingnumber in [enc.pairingnr_home, enc.pairingnr_visit]:
@@ -485,7 +516,8 @@ async def mgmt_register_teamforfeit(division: int, index: str, name: str) -> Non
                         ICGame(overruled=GAMERESULT.FORFEIT_TEAM)
                         for ix in range(PLAYERSPERDIVISION[division])
                     ]
-                calc_points(enc)
+                forfeited.append(enc)
+    calc_points_bulk(forfeited)
     await DbICSeries.update(
         {"_id": series.id},
         {
@@ -494,5 +526,7 @@ async def mgmt_register_teamforfeit(division: int, index: str, name: str) -> Non
         },
     )
     logger.info("series updated")
+    await publish_series(series)
+    invalidate_series(series)
     await calc_standings(series)
     logger.info("standings updated")
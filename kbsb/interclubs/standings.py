@@ -0,0 +1,502 @@
+# copyright Ruben Decrop 2012 - 2024
+
+# the standings engine
+# compute_standings does a full walk over all rounds of a series
+# apply_encounter only updates the 2 team rows touched by a single encounter
+# the standings worker applies the queued changes in the background
+# every queued save leaves a mark on the standings document, the worker
+# removes its marks once the change is applied, so the changes lost by a
+# failing worker, a restart or another process keep the standings dirty
+# and the next read queues a full recalculation
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Tuple
+from uuid import uuid4
+
+from reddevil.core import RdNotFound, get_mongodb
+
+from kbsb.interclubs.md_interclubs import (
+    DbICSeries,
+    DbICStandings,
+    ICEncounter,
+    ICSeries,
+    ICStandingsDB,
+    ICStandingsWorkerStats,
+    ICTeamGame,
+    ICTeamStanding,
+)
+from kbsb.interclubs.cache import invalidate_standings
+
+STANDINGS_DEBOUNCE = 5  # seconds without new changes before a series is processed
+STANDINGS_MAXDELAY = 30  # max seconds a series can stay in the queue
+STANDINGS_CONCURRENCY = 4  # number of series processed concurrently
+
+
+def new_standings(series: ICSeries) -> ICStandingsDB:
+    """
+    create empty standings for a series
+    """
+    return ICStandingsDB(
+        division=series.division,
+        index=series.index,
+        teams=[
+            ICTeamStanding(
+                name=t.name,
+                idclub=t.idclub,
+                pairingnumber=t.pairingnumber,
+                matchpoints=0,
+                boardpoints=0,
+                games=[],
+            )
+            for t in series.teams
+            if t.idclub
+        ],
+    )
+
+
+def index_standings(standings: ICStandingsDB) -> Dict[int, int]:
+    """
+    returns the position of each team row in standings.teams by pairingnumber
+    """
+    return {t.pairingnumber: ix for ix, t in enumerate(standings.teams)}
+
+
+def sort_standings(standings: ICStandingsDB) -> ICStandingsDB:
+    """
+    sort the team rows by matchpoints and boardpoints
+    """
+    standings.teams = sorted(
+        standings.teams, key=lambda t: (-t.matchpoints, -t.boardpoints)
+    )
+    return standings
+
+
+def encounter_changed(old: ICEncounter | None, new: ICEncounter) -> bool:
+    """
+    check if an encounter update has an impact on the standings
+    """
+    if old is None:
+        return new.played
+    return (
+        old.played != new.played
+        or old.matchpoint_home != new.matchpoint_home
+        or old.matchpoint_visit != new.matchpoint_visit
+        or old.boardpoint2_home != new.boardpoint2_home
+        or old.boardpoint2_visit != new.boardpoint2_visit
+    )
+
+
+def set_teamgame(
+    team: ICTeamStanding,
+    pairingnumber_opp: int,
+    round: int,
+    played: bool,
+    matchpoints: int,
+    boardpoints2: int,
+) -> None:
+    """
+    set the result of a team against an opponent, keeping the team totals
+    in sync by applying only the difference with the previous result
+    """
+    games = {g.pairingnumber_opp: ix for ix, g in enumerate(team.games)}
+    ix = games.get(pairingnumber_opp)
+    if ix is not None:
+        game = team.games[ix]
+        team.matchpoints -= game.matchpoints
+        team.boardpoints -= game.boardpoints2 / 2
+        if not played:
+            del team.games[ix]
+            return
+    elif played:
+        game = ICTeamGame(pairingnumber_opp=pairingnumber_opp, round=round)
+        team.games.append(game)
+    else:
+        return
+    game.matchpoints = matchpoints
+    game.boardpoints2 = boardpoints2
+    team.matchpoints += matchpoints
+    team.boardpoints += boardpoints2 / 2
+
+
+def apply_encounter(
+    standings: ICStandingsDB,
+    round: int,
+    old: ICEncounter | None,
+    new: ICEncounter,
+    teamsix: Dict[int, int] | None = None,
+) -> List[int]:
+    """
+    apply the difference between the old and the new version of an encounter
+    on the standings.
+    returns the positions in standings.teams of the modified team rows
+    raises KeyError if a team is missing in the standings
+    """
+    if new.icclub_home == 0 or new.icclub_visit == 0:
+        return []
+    if not encounter_changed(old, new):
+        return []
+    if teamsix is None:
+        teamsix = index_standings(standings)
+    ixhome = teamsix[new.pairingnr_home]
+    ixvisit = teamsix[new.pairingnr_visit]
+    set_teamgame(
+        standings.teams[ixhome],
+        new.pairingnr_visit,
+        round,
+        new.played,
+        new.matchpoint_home,
+        new.boardpoint2_home,
+    )
+    set_teamgame(
+        standings.teams[ixvisit],
+        new.pairingnr_home,
+        round,
+        new.played,
+        new.matchpoint_visit,
+        new.boardpoint2_visit,
+    )
+    return [ixhome, ixvisit]
+
+
+def compute_standings(series: ICSeries, standings: ICStandingsDB) -> ICStandingsDB:
+    """
+    full recalculation of the standings over all rounds of a series
+    """
+    teamsix = index_standings(standings)
+    for t in standings.teams:
+        t.games = []
+        t.matchpoints = 0
+        t.boardpoints = 0
+    for r in series.rounds:
+        for enc in r.encounters:
+            if enc.icclub_home == 0 or enc.icclub_visit == 0:
+                continue
+            if not enc.played:
+                continue
+            try:
+                apply_encounter(standings, r.round, None, enc, teamsix)
+            except KeyError:
+                logger.info(
+                    f"no standings for encounter {enc.pairingnr_home}-"
+                    f"{enc.pairingnr_visit} in {series.division}{series.index}"
+                )
+    return sort_standings(standings)
+
+
+# persistence
+
+
+async def calc_standings(series: ICSeries) -> ICStandingsDB:
+    """
+    calculates and persists standings of a series
+    this is a full recalculation, use update_standings for a single encounter
+    """
+    logger.info(f"recalculate standings {series.division}{series.index}")
+    try:
+        standings = await DbICStandings.find_single(
+            {
+                "division": series.division,
+                "index": series.index,
+                "_model": ICStandingsDB,
+            }
+        )
+    except RdNotFound:
+        standings = new_standings(series)
+        await DbICStandings.add(standings.model_dump(exclude_none=True))
+    compute_standings(series, standings)
+    # the dirty marks are cleared by the standings worker
+    standings = await DbICStandings.update(
+        {
+            "division": series.division,
+            "index": series.index,
+        },
+        standings.model_dump(exclude={"dirtymarks", "dirtytime"}),
+        {"_model": ICStandingsDB},
+    )
+    invalidate_standings(series)
+    return standings
+
+
+async def update_standings(
+    series: ICSeries,
+    changes: List[Tuple[int, ICEncounter | None, ICEncounter]],
+) -> None:
+    """
+    applies a list of (round, old encounter, new encounter) changes on the
+    persisted standings, only the team rows of those encounters are written,
+    matched on their pairingnumber
+    falls back to a full recalculation if the standings are missing
+    """
+    changes = [
+        (r, old, new)
+        for r, old, new in changes
+        if new.icclub_home and new.icclub_visit and encounter_changed(old, new)
+    ]
+    if not changes:
+        return
+    try:
+        standings = await DbICStandings.find_single(
+            {
+                "division": series.division,
+                "index": series.index,
+                "_model": ICStandingsDB,
+            }
+        )
+    except RdNotFound:
+        await calc_standings(series)
+        return
+    teamsix = index_standings(standings)
+    teamixs = set()
+    try:
+        for r, old, new in changes:
+            teamixs.update(apply_encounter(standings, r, old, new, teamsix))
+    except KeyError:
+        logger.info(
+            f"standings {series.division}{series.index} inconsistent, recalculate"
+        )
+        await calc_standings(series)
+        return
+    if teamixs:
+        # the rows are targeted by pairingnumber, as calc_standings can
+        # reorder the teams array between our read and this write
+        teams = [standings.teams[ix] for ix in sorted(teamixs)]
+        coll = get_mongodb()[DbICStandings.COLLECTION]
+        await coll.update_one(
+            {"division": series.division, "index": series.index},
+            {"$set": {f"teams.$[t{t.pairingnumber}]": t.model_dump() for t in teams}},
+            array_filters=[
+                {f"t{t.pairingnumber}.pairingnumber": t.pairingnumber} for t in teams
+            ],
+        )
+        invalidate_standings(series)
+
+
+# dirty marks
+
+
+async def mark_standings(division: int, index: str) -> str:
+    """
+    mark the standings of a series dirty until a queued change is applied
+    dirtytime is the time of the oldest mark
+    """
+    mark = uuid4().hex
+    coll = get_mongodb()[DbICStandings.COLLECTION]
+    await coll.update_one(
+        {"division": division, "index": index},
+        [
+            {
+                "$set": {
+                    "dirtymarks": {
+                        "$concatArrays": [
+                            {"$ifNull": ["$dirtymarks", []]},
+                            {"$literal": [mark]},
+                        ]
+                    },
+                    "dirtytime": {
+                        "$ifNull": ["$dirtytime", datetime.now(timezone.utc)]
+                    },
+                }
+            }
+        ],
+    )
+    return mark
+
+
+async def read_standings_marks(division: int, index: str) -> List[str] | None:
+    """
+    the dirty marks of the standings of a series, None if there are no standings
+    """
+    coll = get_mongodb()[DbICStandings.COLLECTION]
+    doc = await coll.find_one(
+        {"division": division, "index": index}, {"dirtymarks": 1, "_id": 0}
+    )
+    return (doc.get("dirtymarks") or []) if doc is not None else None
+
+
+async def clear_standings_marks(division: int, index: str, marks: Iterable[str]):
+    """
+    remove applied marks, the standings are clean once no marks are left
+    """
+    coll = get_mongodb()[DbICStandings.COLLECTION]
+    await coll.update_one(
+        {"division": division, "index": index},
+        [
+            {
+                "$set": {
+                    "dirtymarks": {
+                        "$setDifference": [
+                            {"$ifNull": ["$dirtymarks", []]},
+                            {"$literal": list(marks)},
+                        ]
+                    }
+                }
+            },
+            {
+                "$set": {
+                    "dirtytime": {
+                        "$cond": [
+                            {"$eq": [{"$size": "$dirtymarks"}, 0]},
+                            None,
+                            "$dirtytime",
+                        ]
+                    }
+                }
+            },
+        ],
+    )
+
+
+# standings worker
+
+# pending changes by (division, index)
+# each entry holds the latest series, the changes by encounter,
+# a full recalculation flag and the enqueue times
+pending: Dict[Tuple[int, str], dict] = {}
+workerstats = {
+    "processed": 0,
+    "failed": 0,
+    "totallatency": 0.0,
+    "lastlatency": 0.0,
+    "maxlatency": 0.0,
+    "lastlag": 0.0,
+}
+wakeup = asyncio.Event()
+
+
+def enqueue_standings(
+    division: int,
+    index: str,
+    changes: List[Tuple[int, ICEncounter | None, ICEncounter]] = [],
+    series: ICSeries | None = None,
+    full: bool = False,
+    mark: str | None = None,
+) -> None:
+    """
+    queue standings changes of a series for the standings worker
+    multiple changes of the same encounter are merged, keeping the oldest
+    version of the encounter and the newest
+    if no series is given, it is read when the entry is processed
+    mark is the dirty mark of the change, see mark_standings
+    """
+    now = time.monotonic()
+    entry = pending.setdefault(
+        (division, index),
+        {"changes": {}, "full": False, "first": now, "marks": [], "series": None},
+    )
+    if mark:
+        entry["marks"].append(mark)
+    entry["series"] = series or entry["series"]
+    entry["last"] = now
+    entry["full"] = entry["full"] or full or series is None
+    for r, old, new in changes:
+        enckey = (r, new.pairingnr_home, new.pairingnr_visit)
+        if enckey in entry["changes"]:
+            old = entry["changes"][enckey][1]
+        entry["changes"][enckey] = (r, old, new)
+    entry["division"] = division
+    entry["index"] = index
+    wakeup.set()
+
+
+async def process_standings(entry: dict) -> None:
+    """
+    apply a queued entry on the persisted standings
+    the changes of other processes or of failed entries, visible as marks
+    not owned by the entry, force a full recalculation
+    on failure the marks stay and the standings remain dirty
+    """
+    start = time.perf_counter()
+    division, index = entry["division"], entry["index"]
+    marks = set(entry["marks"])
+    try:
+        # the marks are read before the series, so a full recalculation
+        # covers all of them
+        stored = await read_standings_marks(division, index)
+        if entry["full"] or stored is None or set(stored) - marks:
+            series = await DbICSeries.find_single(
+                {"division": division, "index": index, "_model": ICSeries}
+            )
+            await calc_standings(series)
+            marks.update(stored or [])
+        else:
+            await update_standings(entry["series"], list(entry["changes"].values()))
+        if marks:
+            await clear_standings_marks(division, index, marks)
+    except Exception:
+        workerstats["failed"] += 1
+        logger.exception(f"standings worker failed {division}{index}")
+        return
+    latency = time.perf_counter() - start
+    workerstats["processed"] += 1
+    workerstats["totallatency"] += latency
+    workerstats["lastlatency"] = latency
+    workerstats["maxlatency"] = max(workerstats["maxlatency"], latency)
+    workerstats["lastlag"] = time.monotonic() - entry["first"]
+
+
+async def process_pending(force: bool = False) -> None:
+    """
+    process all queued series that are due, or all of them if force is set
+    """
+    now = time.monotonic()
+    due = [
+        k
+        for k, e in pending.items()
+        if force
+        or now - e["last"] >= STANDINGS_DEBOUNCE
+        or now - e["first"] >= STANDINGS_MAXDELAY
+    ]
+    if not due:
+        return
+    semaphore = asyncio.Semaphore(STANDINGS_CONCURRENCY)
+
+    async def run(entry):
+        async with semaphore:
+            await process_standings(entry)
+
+    await asyncio.gather(*[run(pending.pop(k)) for k in due])
+
+
+async def standings_worker() -> None:
+    """
+    background task recalculating the standings of the queued series
+    pending changes are flushed when the task is cancelled
+    """
+    logger.info("standings worker started")
+    try:
+        while True:
+            wakeup.clear()
+            if pending:
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=1)
+                except asyncio.TimeoutError:
+                    pass
+                await process_pending()
+            else:
+                await wakeup.wait()
+    except asyncio.CancelledError:
+        logger.info("standings worker stopping, flushing queue")
+        await process_pending(force=True)
+        raise
+
+
+def get_standingsworker_stats() -> ICStandingsWorkerStats:
+    """
+    monitoring data of the standings worker
+    """
+    processed = workerstats["processed"]
+    return ICStandingsWorkerStats(
+        queuedepth=len(pending),
+        processed=processed,
+        failed=workerstats["failed"],
+        avglatency=workerstats["totallatency"] / processed if processed else 0.0,
+        lastlatency=workerstats["lastlatency"],
+        maxlatency=workerstats["maxlatency"],
+        lastlag=workerstats["lastlag"],
+    )
@@ -0,0 +1,238 @@
+# copyright Ruben Decrop 2012 - 2024
+
+# incremental penalty detection
+# when a result is saved, the incremental penalty rules are evaluated on the
+# changed encounters only, with the clubs of these encounters as context
+# the violations are stored per encounter in an indexed collection, so a
+# report per round, club or division is a single indexed query
+# the players of a double team are checked in the later rounds of the
+# other teams of its club (reserves single series), so these encounters
+# are re-evaluated as well
+# a failing evaluation on the save path does not fail the save, the changed
+# encounters are kept and re-evaluated with the next save of the series
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from pymongo import DeleteMany, InsertOne
+from reddevil.core import get_mongodb
+
+from kbsb.interclubs.md_interclubs import (
+    DbICClub,
+    DbICViolation,
+    ICClubDB,
+    ICEncounter,
+    ICSeries,
+    ICViolation,
+)
+from kbsb.interclubs.playedplayers import (
+    PlayedIndex,
+    doubleteams,
+    read_played_players,
+)
+from kbsb.interclubs.penalties import (
+    PenaltyContext,
+    incremental_rules,
+    isbye,
+    load_penalty_context,
+    run_rules,
+)
+
+ViolationKey = Tuple[int, int, int]  # round, pairingnr_home, pairingnr_visit
+
+# changes (round, encounter) of failed evaluations by (division, index)
+failedchanges: Dict[Tuple[int, str], Dict[ViolationKey, Tuple[int, ICEncounter]]] = {}
+
+
+def violation_doc(issue: Dict[str, Any]) -> Dict[str, Any]:
+    division, index = issue["series"]
+    return ICViolation(
+        boardnumber=issue["boardnumber"],
+        division=division,
+        guilty=issue["guilty"],
+        idclub=issue["idclub"],
+        index=index,
+        opponent=issue["opponent"],
+        pairingnr=issue["pairingnr"],
+        pairingnr_home=issue["pairingnr_home"],
+        pairingnr_visit=issue["pairingnr_visit"],
+        reason=issue["reason"],
+        round=issue["round"],
+        rule=issue["rule"],
+    ).model_dump(exclude={"id"})
+
+
+def affected_encounters(
+    s: ICSeries, changes: Iterable[Tuple[int, ICEncounter]]
+) -> Set[ViolationKey]:
+    """
+    the encounters to re-evaluate after the changes (round, encounter)
+    a double team playing in a changed encounter affects the encounters
+    of its partner team in the later rounds
+    """
+    partners = doubleteams(s)
+    keys = set()
+    for round, enc in changes:
+        keys.add((round, enc.pairingnr_home, enc.pairingnr_visit))
+        others = {
+            other
+            for pnr in (enc.pairingnr_home, enc.pairingnr_visit)
+            for other in partners.get(pnr, [])
+        }
+        if not others:
+            continue
+        for rd in s.rounds:
+            if rd.round <= round:
+                continue
+            for e in rd.encounters:
+                if {e.pairingnr_home, e.pairingnr_visit} & others and not isbye(e):
+                    keys.add((rd.round, e.pairingnr_home, e.pairingnr_visit))
+    return keys
+
+
+async def read_encounter_clubs(s: ICSeries, keys: Set[ViolationKey]) -> List[ICClubDB]:
+    """
+    the clubs playing in the encounters, with their players and teams
+    """
+    pnrs = {pnr for _, home, visit in keys for pnr in (home, visit)}
+    idclubs = [t.idclub for t in s.teams if t.pairingnumber in pnrs and t.idclub]
+    if not idclubs:
+        return []
+    return await DbICClub.find_multiple(
+        {"_model": ICClubDB, "idclub": {"$in": idclubs}}
+    )
+
+
+def evaluate_encounters(
+    s: ICSeries,
+    keys: Set[ViolationKey],
+    clubs: List[ICClubDB],
+    played: PlayedIndex | None = None,
+) -> List[Dict[str, Any]]:
+    """
+    run the incremental rules on the encounters of a series
+    played is the played players index of the series
+    returns the violation documents
+    """
+    docs = []
+    for round in sorted({r for r, _, _ in keys}):
+        ctx = PenaltyContext(round, [s], clubs, played)
+        encounters = {(home, visit) for r, home, visit in keys if r == round}
+        run_rules(ctx, incremental_rules(), encounters)
+        docs.extend(violation_doc(issue) for issue in ctx.issues)
+    return docs
+
+
+def encounter_filter(s: ICSeries, key: ViolationKey) -> Dict[str, Any]:
+    round, home, visit = key
+    return {
+        "round": round,
+        "division": s.division,
+        "index": s.index,
+        "pairingnr_home": home,
+        "pairingnr_visit": visit,
+    }
+
+
+async def update_violations(
+    s: ICSeries, changes: Iterable[Tuple[int, ICEncounter]]
+) -> int:
+    """
+    re-evaluate the violations of the changed encounters (round, encounter)
+    of a series and replace them in the violations collection
+    returns the number of violations written
+    """
+    keys = affected_encounters(s, changes)
+    if not keys:
+        return 0
+    clubs = await read_encounter_clubs(s, keys)
+    played = await read_played_players(s.division, s.index)
+    if not played.covers([s], max(r for r, _, _ in keys)):
+        logger.info(f"played players index of {s.division}{s.index} incomplete")
+        played = None
+    docs = evaluate_encounters(s, keys, clubs, played)
+    ops = [DeleteMany(encounter_filter(s, key)) for key in sorted(keys)]
+    ops.extend(InsertOne(doc) for doc in docs)
+    coll = get_mongodb()[DbICViolation.COLLECTION]
+    await coll.bulk_write(ops, ordered=True)
+    return len(docs)
+
+
+async def save_violations(
+    s: ICSeries, changes: Iterable[Tuple[int, ICEncounter]]
+) -> None:
+    """
+    update_violations on the result save path, never raises
+    the changes of a failed evaluation are retried with the next save of
+    the series, mgmt_rebuild_violations repairs a whole round
+    """
+    retry = failedchanges.pop((s.division, s.index), {})
+    for round, enc in changes:
+        retry[(round, enc.pairingnr_home, enc.pairingnr_visit)] = (round, enc)
+    try:
+        await update_violations(s, list(retry.values()))
+    except Exception:
+        logger.exception(
+            f"violations of {s.division}{s.index} not updated, "
+            f"{len(retry)} encounters left for re-evaluation"
+        )
+        failedchanges[(s.division, s.index)] = retry
+
+
+async def mgmt_getICviolations(
+    round: int = 0, idclub: int = 0, division: int = 0, index: str = ""
+) -> List[ICViolation]:
+    """
+    the stored violations, filtered on round, guilty club and series
+    """
+    filter = {}
+    if round:
+        filter["round"] = round
+    if idclub:
+        filter["idclub"] = idclub
+    if division:
+        filter["division"] = division
+        if index:
+            filter["index"] = index
+    coll = get_mongodb()[DbICViolation.COLLECTION]
+    cursor = coll.find(
+        filter,
+        {"_id": 0},
+        sort=[
+            ("round", 1),
+            ("division", 1),
+            ("index", 1),
+            ("pairingnr_home", 1),
+            ("boardnumber", 1),
+        ],
+    )
+    return [ICViolation(**doc) async for doc in cursor]
+
+
+async def mgmt_rebuild_violations(round: int) -> int:
+    """
+    evaluate the incremental rules on all encounters of a round
+    and replace the stored violations of that round
+    """
+    coll = get_mongodb()[DbICViolation.COLLECTION]
+    await coll.create_index([("round", 1), ("idclub", 1)])
+    await coll.create_index([("round", 1), ("division", 1), ("index", 1)])
+    await coll.create_index(
+        [
+            ("round", 1),
+            ("division", 1),
+            ("index", 1),
+            ("pairingnr_home", 1),
+            ("pairingnr_visit", 1),
+        ]
+    )
+    ctx = await load_penalty_context(round)
+    run_rules(ctx, incremental_rules())
+    ops = [DeleteMany({"round": round})]
+    ops.extend(InsertOne(violation_doc(issue)) for issue in ctx.issues)
+    await coll.bulk_write(ops, ordered=True)
+    logger.info(f"rebuilt {len(ctx.issues)} violations of round {round}")
+    return len(ctx.issues)
@@ -1,6 +1,7 @@
 # copyright Ruben Decrop 2015-22
 
 import os.path
+import asyncio
 import logging, logging.config
 
 from contextlib import asynccontextmanager
@@ -21,8 +22,17 @@ logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # imported here as the interclubs modules need the registered settings
+    from kbsb.interclubs import standings_worker
+
     connect_mongodb()
+    worker = asyncio.create_task(standings_worker())
     yield
+    worker.cancel()
+    try:
+        await worker
+    except asyncio.CancelledError:
+        pass
     close_mongodb()
 
 
@@ -10,16 +10,29 @@ from .md_member import (
     Member,
     AnonMember,
     OldUserPasswordValidator,
+    MemberCacheStats,
+    MemberSyncRun,
+    RatingHistory,
+    RatingHistoryItem,
 )
 from .member import (
     anon_getclubmembers,
     anon_getmember,
+    anon_getmembers,
     anon_belid_from_fideid,
     anon_getfidemember,
     login,
     mgmt_getmember,
     mgmt_getclubmembers,
+    mgmt_warm_membercache,
     old_userpassword,
     validate_membertoken,
 )
+from .cache import get_membercache_stats, invalidate_member, membercache
+from .sync import mgmt_get_membersync, mgmt_sync_members
+from .ratinghistory import (
+    anon_getclubratinghistory,
+    anon_getratinghistory,
+    mgmt_sync_ratinghistory,
+)
 from .api_member import router
@@ -5,7 +5,7 @@
 
 import logging
 
-from fastapi import HTTPException, APIRouter, Depends, Security
+from fastapi import HTTPException, APIRouter, BackgroundTasks, Depends, Query, Security
 from fastapi.security import HTTPAuthorizationCredentials, APIKeyHeader
 from reddevil.core import RdException, bearer_schema, validate_token, get_settings
 from typing import List
@@ -13,14 +13,25 @@ from kbsb.member import (
     AnonMember,
     LoginValidator,
     Member,
+    MemberCacheStats,
+    MemberSyncRun,
     OldUserPasswordValidator,
+    RatingHistory,
     anon_getclubmembers,
+    anon_getclubratinghistory,
     anon_getmember,
+    anon_getmembers,
     anon_getfidemember,
+    anon_getratinghistory,
     anon_belid_from_fideid,
+    get_membercache_stats,
     login,
     mgmt_getmember,
     mgmt_getclubmembers,
+    mgmt_get_membersync,
+    mgmt_sync_members,
+    mgmt_sync_ratinghistory,
+    mgmt_warm_membercache,
     validate_membertoken,
     old_userpassword,
 )
@@ -110,6 +121,21 @@ async def api_anon_getmember(idnumber: int):
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+@router.get("/anon/members", response_model=List[AnonMember])
+async def api_anon_getmembers(idnumber: List[int] = Query([])):
+    """
+    get many members by their idnumber (only name, club and rating)
+    unknown idnumbers are skipped
+    """
+    try:
+        return await anon_getmembers(idnumber)
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api call anon_getmembers")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
 @router.get("/anon/fidemember/{idnumber}", response_model=AnonMember)
 async def api_anon_getfidemember(idnumber: int):
     """
@@ -153,3 +179,119 @@ async def api_anon_belid_from_fideid(idfide: int):
     except:
         logger.exception("failed api call anon_getmember")
         raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.get("/mgmt/membercache", response_model=MemberCacheStats)
+async def api_mgmt_get_membercache_stats(
+    auth: HTTPAuthorizationCredentials = Depends(bearer_schema),
+):
+    """
+    the hit rate and size of the member cache
+    """
+    try:
+        await validate_token(auth)
+        return get_membercache_stats()
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api call get_membercache_stats")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.post("/mgmt/command/membercache/{idclub}", response_model=int)
+async def api_mgmt_warm_membercache(
+    idclub: int,
+    auth: HTTPAuthorizationCredentials = Depends(bearer_schema),
+):
+    """
+    fill the member cache with the active members of a club
+    """
+    try:
+        await validate_token(auth)
+        return await mgmt_warm_membercache(idclub)
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api call warm_membercache")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.get("/mgmt/membersync", response_model=List[MemberSyncRun])
+async def api_mgmt_get_membersync(
+    auth: HTTPAuthorizationCredentials = Depends(bearer_schema),
+):
+    """
+    the last sync of the member tables to mongodb, with throughput and lag
+    """
+    try:
+        await validate_token(auth)
+        return await mgmt_get_membersync()
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api call get_membersync")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.post("/mgmt/command/membersync", status_code=202)
+async def api_mgmt_sync_members(
+    bt: BackgroundTasks,
+    auth: HTTPAuthorizationCredentials = Depends(bearer_schema),
+):
+    """
+    replicate the mysql member tables to mongodb in the background
+    """
+    try:
+        await validate_token(auth)
+        bt.add_task(mgmt_sync_members)
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api call sync_members")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.get("/anon/ratinghistory/{idnumber}", response_model=RatingHistory)
+async def api_anon_getratinghistory(idnumber: int):
+    """
+    the national and fide ratings of a member over all quarters
+    """
+    try:
+        return await anon_getratinghistory(idnumber)
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api call anon_getratinghistory")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.get("/anon/clubratinghistory/{idclub}", response_model=List[RatingHistory])
+async def api_anon_getclubratinghistory(idclub: int):
+    """
+    the rating histories of the active members of a club
+    """
+    try:
+        return await anon_getclubratinghistory(idclub)
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api call anon_getclubratinghistory")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.post("/mgmt/command/ratinghistory", status_code=202)
+async def api_mgmt_sync_ratinghistory(
+    bt: BackgroundTasks,
+    auth: HTTPAuthorizationCredentials = Depends(bearer_schema),
+):
+    """
+    load the new rating quarters into the rating history in the background
+    """
+    try:
+        await validate_token(auth)
+        bt.add_task(mgmt_sync_ratinghistory)
+    except RdException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.description)
+    except:
+        logger.exception("failed api call sync_ratinghistory")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
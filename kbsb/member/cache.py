@@ -0,0 +1,48 @@
+# copyright Ruben Decrop 2012 - 2024
+
+# the cache of the anonymous member lookups
+# the keys hold the rating table of the quarter, so a new quarter starts
+# with fresh entries and the old ones age out
+# unknown ids are cached as None for a shorter time
+# the writers of member data invalidate the entries they affect
+
+from typing import Any, Tuple
+
+from kbsb.core.cache import ResponseCache
+from kbsb.member.md_member import MemberCacheStats
+
+MEMBERCACHE_MAXSIZE = 20000
+MEMBERCACHE_TTL = 3600  # seconds
+MEMBERCACHE_NEGATIVE_TTL = 300  # seconds
+
+membercache = ResponseCache(maxsize=MEMBERCACHE_MAXSIZE, ttl=MEMBERCACHE_TTL)
+
+
+def get_cached(kind: str, elotable: str, id: int) -> Tuple[bool, Any]:
+    """
+    returns (found, value), value None for a cached unknown id
+    """
+    return membercache.get((kind, elotable, id))
+
+
+def set_cached(kind: str, elotable: str, id: int, value: Any) -> None:
+    membercache.set(
+        (kind, elotable, id),
+        value,
+        ttl=MEMBERCACHE_NEGATIVE_TTL if value is None else None,
+    )
+
+
+def invalidate_member(idnumber: int) -> None:
+    """
+    invalidate the cached lookups of a member in all quarters
+    """
+    membercache.invalidate("anon_getmember", match=lambda k: k[2] == idnumber)
+    membercache.invalidate("anon_belid_from_fideid")
+
+
+def get_membercache_stats() -> MemberCacheStats:
+    """
+    monitoring data of the member cache
+    """
+    return MemberCacheStats(**membercache.stats())
@@ -5,9 +5,10 @@
 
 import logging
 
-from datetime import date
+from datetime import date, datetime
 from typing import Dict, Any, List
 from pydantic import BaseModel
+from reddevil.core.dbbase import DbBase
 
 logger = logging.getLogger(__name__)
 
@@ -89,3 +90,119 @@ class AnonMember(BaseModel):
     nationalitybel: str = ""
     nationalityfide: str = ""
     natrating: int | None = 0
+
+
+class MemberCacheStats(BaseModel):
+    """
+    an output model for monitoring the member cache
+    """
+
+    hits: int
+    misses: int
+    hitratio: float
+    size: int
+    maxsize: int
+    ttl: float
+
+
+class MemberDB(Member):
+    """
+    a member replicated from the signaletique with the ratings of the quarter
+    as written in the database
+    """
+
+    checksum: str = ""
+    id: str | None = None
+    period: str = ""  # the rating table of the quarter
+    rated: bool = False  # the member is in the rating table
+
+
+class FideMemberDB(BaseModel):
+    """
+    a player replicated from the fide table
+    as written in the database
+    """
+
+    birthday: date | None = None
+    checksum: str = ""
+    fiderating: int | None = 0
+    fullname: str = ""
+    gender: str | None = None
+    id: str | None = None
+    idfide: int
+    nationalityfide: str | None = ""
+
+
+class MemberSyncRun(BaseModel):
+    """
+    the report of the sync of a table to mongodb
+    """
+
+    deleted: int = 0
+    duration: float = 0.0  # seconds
+    finished: datetime | None = None
+    id: str | None = None
+    lag: float = 0.0  # seconds since finished, computed on read
+    period: str = ""
+    read: int = 0
+    rowspersecond: float = 0.0
+    started: datetime
+    table: str
+    upserted: int = 0
+
+
+class RatingHistoryDB(BaseModel):
+    """
+    the ratings of a member in a quarter
+    as written in the database
+    """
+
+    fiderating: int | None = None  # only known for the quarters synced live
+    id: str | None = None
+    idfide: int | None = 0
+    idnumber: int
+    natrating: int | None = 0
+    period: str  # YYYYMM
+
+
+class RatingHistoryItem(BaseModel):
+    fiderating: int | None = None
+    natrating: int | None = 0
+    period: str
+
+
+class RatingHistory(BaseModel):
+    """
+    the ratings of a member over all quarters, oldest first
+    """
+
+    idnumber: int
+    ratings: List[RatingHistoryItem] = []
+
+
+class DbMember(DbBase):
+    COLLECTION = "member"
+    DOCUMENTTYPE = MemberDB
+    VERSION = 1
+    IDGENERATOR = "uuid"
+
+
+class DbFideMember(DbBase):
+    COLLECTION = "fidemember"
+    DOCUMENTTYPE = FideMemberDB
+    VERSION = 1
+    IDGENERATOR = "uuid"
+
+
+class DbMemberSync(DbBase):
+    COLLECTION = "membersync"
+    DOCUMENTTYPE = MemberSyncRun
+    VERSION = 1
+    IDGENERATOR = "uuid"
+
+
+class DbRatingHistory(DbBase):
+    COLLECTION = "ratinghistory"
+    DOCUMENTTYPE = RatingHistoryDB
+    VERSION = 1
+    IDGENERATOR = "uuid"
@@ -23,6 +23,7 @@ from kbsb.member import (
 from kbsb.member.mysql_member import (
     mysql_login,
     mysql_anon_getmember,
+    mysql_anon_getmembers,
     mysql_mgmt_getmember,
     mysql_anon_getclubmembers,
     mysql_mgmt_getclubmembers,
@@ -33,6 +34,7 @@ from kbsb.member.mysql_member import (
 from kbsb.member.mongo_member import (
     mongodb_login,
     mongodb_anon_getmember,
+    mongodb_anon_getmembers,
     mongodb_mgmt_getmember,
     mongodb_anon_getclubmembers,
     mongodb_mgmt_getclubmembers,
@@ -137,6 +139,27 @@ async def anon_getmember(idbel: int) -> AnonMember:
     raise NotImplemented
 
 
+async def anon_getmembers(idnumbers: List[int]) -> List[AnonMember]:
+    """
+    find many members by idnumber, unknown idnumbers are skipped
+    """
+    settings = get_settings()
+    if settings.MEMBERDB == "oldmysql":
+        return await mysql_anon_getmembers(idnumbers)
+    elif settings.MEMBERDB == "mongodb":
+        return await mongodb_anon_getmembers(idnumbers)
+    raise NotImplemented
+
+
+async def mgmt_warm_membercache(idclub: int) -> int:
+    """
+    fill the member cache with the active members of a club
+    returns the number of members read
+    """
+    members = await anon_getclubmembers(idclub, True)
+    return len(members)
+
+
 async def anon_getfidemember(idfide: int) -> AnonMember:
     settings = get_settings()
     if settings.MEMBERDB == "oldmysql":
@@ -160,5 +183,5 @@ async def old_userpassword(oupw: OldUserPasswordValidator) -> None:
     if settings.MEMBERDB == "oldmysql":
         return await mysql_old_userpassword(oupw)
     elif settings.MEMBERDB == "mongodb":
-        return await mongodb_mgmt_getmember(oupw)
+        return await mongodb_old_userpassword(oupw)
     raise NotImplemented
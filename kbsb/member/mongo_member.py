@@ -1,30 +1,127 @@
-async def mongodb_login(idmemberer: int, password: str):
-    pass
+# copyright Ruben Decrop 2012 - 2024
 
+# the member backend on the mongodb replica of the mysql member tables
+# the replica is maintained by kbsb.member.sync
+# the logins and passwords stay in the p_user table of the mysql database
 
-async def mongodb_mgmt_getmember(idmember: int, password: str):
-    pass
+import logging
+from typing import Any, Dict, List
 
+from reddevil.core import get_mongodb, RdNotFound
 
-async def mongodb_anon_getmember(idmember: int, password: str):
-    pass
+from kbsb.member.md_member import (
+    AnonMember,
+    DbFideMember,
+    DbMember,
+    Member,
+    OldUserPasswordValidator,
+)
+from kbsb.member.mysql_member import (
+    current_affiliation_year,
+    mysql_login,
+    mysql_old_userpassword,
+)
 
+logger = logging.getLogger(__name__)
 
-async def mongodb_anon_getclubmembers(idclub: int):
-    pass
 
+def anon_member(doc: Dict[str, Any]) -> AnonMember:
+    return AnonMember(
+        birthyear=doc["birthdate"].year if doc.get("birthdate") else 0,
+        fiderating=doc.get("fiderating"),
+        first_name=doc.get("first_name") or "",
+        gender=doc.get("gender") or "",
+        idclub=doc.get("idclub") or 0,
+        idfide=doc.get("idfide") or 0,
+        idnumber=doc["idbel"],
+        last_name=doc.get("last_name") or "",
+        nationalitybel=doc.get("nationalitybel") or "",
+        nationalityfide=doc.get("nationalityfide") or "",
+        natrating=doc.get("natrating"),
+    )
 
-async def mongodb_mgmt_getclubmembers(idclub: int):
-    pass
 
+async def mongodb_login(idnumber: str, password: str):
+    return await mysql_login(idnumber, password)
 
-async def mongodb_anon_belid_from_fideid():
-    pass
 
+async def mongodb_mgmt_getmember(idmember: int) -> Member:
+    coll = get_mongodb()[DbMember.COLLECTION]
+    doc = await coll.find_one({"idbel": int(idmember)}, {"_id": 0})
+    if not doc:
+        raise RdNotFound(description="MemberNotFound")
+    return Member(**doc)
 
-async def mongodb_anon_getfidemember():
-    pass
 
+async def mongodb_anon_getmember(idnumber: int) -> AnonMember:
+    coll = get_mongodb()[DbMember.COLLECTION]
+    doc = await coll.find_one({"idbel": idnumber, "rated": True}, {"_id": 0})
+    if not doc:
+        raise RdNotFound(description="MemberNotFound")
+    return anon_member(doc)
 
-async def mongodb_old_userpassword():
-    pass
+
+async def mongodb_anon_getmembers(idnumbers: List[int]) -> List[AnonMember]:
+    coll = get_mongodb()[DbMember.COLLECTION]
+    members = {
+        doc["idbel"]: anon_member(doc)
+        async for doc in coll.find(
+            {"idbel": {"$in": list(idnumbers)}, "rated": True}, {"_id": 0}
+        )
+    }
+    return [members[idn] for idn in dict.fromkeys(idnumbers) if idn in members]
+
+
+def club_filter(idclub: int, active: bool) -> Dict[str, Any]:
+    filter = {"idclub": idclub}
+    if active:
+        filter["year_affiliation"] = {"$gte": current_affiliation_year()}
+    return filter
+
+
+async def mongodb_anon_getclubmembers(
+    idclub: int, active: bool = True
+) -> List[AnonMember]:
+    coll = get_mongodb()[DbMember.COLLECTION]
+    return [
+        anon_member(doc)
+        async for doc in coll.find(club_filter(idclub, active), {"_id": 0})
+    ]
+
+
+async def mongodb_mgmt_getclubmembers(idclub: int, active: bool = True) -> List[Member]:
+    coll = get_mongodb()[DbMember.COLLECTION]
+    return [
+        Member(**doc)
+        async for doc in coll.find(club_filter(idclub, active), {"_id": 0})
+    ]
+
+
+async def mongodb_anon_belid_from_fideid(idfide: int) -> int:
+    coll = get_mongodb()[DbMember.COLLECTION]
+    doc = await coll.find_one({"idfide": idfide, "rated": True}, {"idbel": 1})
+    return doc["idbel"] if doc else 0
+
+
+async def mongodb_anon_getfidemember(idfide: int) -> AnonMember:
+    coll = get_mongodb()[DbFideMember.COLLECTION]
+    doc = await coll.find_one({"idfide": idfide}, {"_id": 0})
+    if not doc:
+        raise RdNotFound(description="MemberNotFound")
+    nparts = doc["fullname"].split(", ")
+    return AnonMember(
+        birthyear=doc["birthday"].year if doc.get("birthday") else 0,
+        idclub=0,
+        idnumber=0,
+        idfide=idfide,
+        first_name=nparts[1] if len(nparts) > 1 else "",
+        fiderating=doc.get("fiderating"),
+        gender=doc.get("gender") or "",
+        last_name=nparts[0],
+        natrating=0,
+        nationalityfide=doc.get("nationalityfide") or "",
+    )
+
+
+async def mongodb_old_userpassword(oup: OldUserPasswordValidator) -> None:
+    await mysql_old_userpassword(oup)
@@ -3,7 +3,7 @@ import hashlib
 import asyncio
 from datetime import datetime, timedelta, date
 from typing import List
-from kbsb.core.db import get_mysql
+from kbsb.core.db import get_mysql, run_mysql
 from reddevil.core import (
     RdNotAuthorized,
     jwt_encode,
@@ -13,28 +13,41 @@ from reddevil.core import (
 )
 from kbsb.member.md_member import Member, AnonMember, OldUserPasswordValidator
 from kbsb.member import SALT
+from kbsb.member.cache import get_cached, invalidate_member, set_cached
 
 
 logger = logging.getLogger(__name__)
 
+MEMBERCHUNK = 500  # idnumbers per IN query
 
-async def mysql_login(idnumber: str, password: str):
-    logger.info(f"mysqllogin {idnumber} ")
-    settings = get_settings()
-    cnx = get_mysql()
-    query = """
-        SELECT user, password from p_user WHERE user = %(user)s
+
+def mysql_fetch(
+    query: str, params: dict | tuple, many: bool = False, dictionary: bool = True
+):
     """
-    logger.info(f"idnumber {idnumber}")
+    run a query on a pooled connection and fetch one or all rows
+    blocking, called in the mysql executor via run_mysql
+    """
+    cnx = get_mysql()
     try:
-        cursor = cnx.cursor()
-        cursor.execute(query, {"user": idnumber})
-        user = cursor.fetchone()
+        cursor = cnx.cursor(dictionary=dictionary)
+        cursor.execute(query, params)
+        return cursor.fetchall() if many else cursor.fetchone()
     except Exception as e:
         logger.exception("Mysql error")
         raise RdInternalServerError(description="MySQLError")
     finally:
         cnx.close()
+
+
+async def mysql_login(idnumber: str, password: str):
+    logger.info(f"mysqllogin {idnumber} ")
+    settings = get_settings()
+    query = """
+        SELECT user, password from p_user WHERE user = %(user)s
+    """
+    logger.info(f"idnumber {idnumber}")
+    user = await run_mysql(mysql_fetch, query, {"user": idnumber}, dictionary=False)
     if not user:
         logger.info(f"user empty: idnumber {idnumber} not found")
         raise RdNotAuthorized(description="WrongUsernamePasswordCombination")
@@ -47,7 +60,6 @@ async def mysql_login(idnumber: str, password: str):
             "sub": idnumber,
             "exp": datetime.utcnow() + timedelta(minutes=settings.TOKEN["timeout"]),
         }
-        await asyncio.sleep(0)
         return jwt_encode(payload, SALT)
     logger.info(f"password hash failed for {idnumber} ")
     raise RdNotAuthorized(description="WrongUsernamePasswordCombination")
@@ -68,7 +80,6 @@ def current_affiliation_year() -> int:
 
 
 async def mysql_mgmt_getmember(idmember: int) -> Member:
-    cnx = get_mysql()
     query = """
         SELECT 
             signaletique.Dnaiss as birthdate,
@@ -92,25 +103,16 @@ async def mysql_mgmt_getmember(idmember: int) -> Member:
         LEFT JOIN fide ON {elotable}.Fide =  fide.ID_NUMBER 
         WHERE signaletique.Matricule = %(idbel)s
     """
-    try:
-        cursor = cnx.cursor(dictionary=True)
-        qf = query.format(elotable=get_elotable())
-        cursor.execute(qf, {"idbel": idmember})
-        member = cursor.fetchone()
-    except Exception as e:
-        logger.exception("Mysql error")
-        raise RdInternalServerError(description="MySQLError")
-    finally:
-        cnx.close()
+    member = await run_mysql(
+        mysql_fetch, query.format(elotable=get_elotable()), {"idbel": idmember}
+    )
     if not member:
         raise RdNotFound(description="MemberNotFound")
     logger.info("member", member)
-    await asyncio.sleep(0)
     return Member(**member)
 
 
 async def mysql_mgmt_getclubmembers(idclub: int, active: bool = True) -> List[Member]:
-    cnx = get_mysql()
     qactive = " AND signaletique.AnneeAffilie >= %(year)s " if active else ""
     query = """
         SELECT 
@@ -135,28 +137,31 @@ async def mysql_mgmt_getclubmembers(idclub: int, active: bool = True) -> List[Me
         LEFT JOIN fide ON {elotable}.Fide =  fide.ID_NUMBER
         WHERE signaletique.Club = %(idclub)s {qactive}
     """
-    try:
-        cursor = cnx.cursor(dictionary=True)
-        qf = query.format(elotable=get_elotable(), qactive=qactive)
-        cursor.execute(
-            qf,
-            {
-                "idclub": idclub,
-                "year": current_affiliation_year(),
-            },
-        )
-        members = cursor.fetchall()
-    except Exception as e:
-        logger.exception("Mysql error")
-        raise RdInternalServerError(description="MySQLError")
-    finally:
-        cnx.close()
-    await asyncio.sleep(0)
+    members = await run_mysql(
+        mysql_fetch,
+        query.format(elotable=get_elotable(), qactive=qactive),
+        {
+            "idclub": idclub,
+            "year": current_affiliation_year(),
+        },
+        many=True,
+    )
     return [Member(**member) for member in members]
 
 
+def anon_member(member: dict) -> AnonMember:
+    am = AnonMember(**member)
+    am.birthyear = member["birthdate"].year if member["birthdate"] else 0
+    return am
+
+
 async def mysql_anon_getmember(idnumber: int) -> AnonMember:
-    cnx = get_mysql()
+    elotable = get_elotable()
+    found, am = get_cached("anon_getmember", elotable, idnumber)
+    if found:
+        if am is None:
+            raise RdNotFound(description="MemberNotFound")
+        return am
     query = """
         SELECT
             signaletique.Dnaiss as birthdate,
@@ -175,27 +180,78 @@ async def mysql_anon_getmember(idnumber: int) -> AnonMember:
         LEFT JOIN fide on {elotable}.Fide = fide.ID_NUMBER
         WHERE signaletique.Matricule = %(idnumber)s
     """
-    try:
-        cursor = cnx.cursor(dictionary=True)
-        qf = query.format(elotable=get_elotable())
-        cursor.execute(qf, {"idnumber": idnumber})
-        member = cursor.fetchone()
-    except Exception as e:
-        logger.exception("Mysql error")
-        raise RdInternalServerError(description="MySQLError")
-    finally:
-        cnx.close()
+    member = await run_mysql(
+        mysql_fetch, query.format(elotable=elotable), {"idnumber": idnumber}
+    )
     if not member:
+        set_cached("anon_getmember", elotable, idnumber, None)
         raise RdNotFound(description="MemberNotFound")
     logger.info(f"member {member}")
-    await asyncio.sleep(0)
-    am = AnonMember(**member)
-    am.birthyear = member["birthdate"].year
+    am = anon_member(member)
+    set_cached("anon_getmember", elotable, idnumber, am)
     return am
 
 
+async def mysql_anon_getmembers(idnumbers: List[int]) -> List[AnonMember]:
+    """
+    find many members by idnumber, the cached members are not queried,
+    the others with one IN query per chunk of idnumbers
+    unknown idnumbers are skipped, the members are returned in requested order
+    """
+    query = """
+        SELECT
+            signaletique.Dnaiss as birthdate,
+            fide.Elo as fiderating,
+            signaletique.Prenom as first_name,
+            signaletique.Sexe as gender,
+            signaletique.Club as idclub,
+            {elotable}.Fide as idfide,
+            signaletique.Matricule as idnumber,
+            signaletique.Nom as last_name,
+            signaletique.Nationalite as nationalitybel,
+            signaletique.NatFIDE as nationalityfide,
+            {elotable}.Elo as natrating
+        FROM signaletique
+        INNER JOIN {elotable} ON  signaletique.Matricule = {elotable}.Matricule
+        LEFT JOIN fide on {elotable}.Fide = fide.ID_NUMBER
+        WHERE signaletique.Matricule IN ({placeholders})
+    """
+    idnumbers = list(dict.fromkeys(idnumbers))
+    elotable = get_elotable()
+    members = {}
+    missing = []
+    for idn in idnumbers:
+        found, am = get_cached("anon_getmember", elotable, idn)
+        if not found:
+            missing.append(idn)
+        elif am:
+            members[idn] = am
+    chunks = [
+        missing[ix : ix + MEMBERCHUNK] for ix in range(0, len(missing), MEMBERCHUNK)
+    ]
+    results = await asyncio.gather(
+        *[
+            run_mysql(
+                mysql_fetch,
+                query.format(
+                    elotable=elotable, placeholders=", ".join(["%s"] * len(chunk))
+                ),
+                tuple(chunk),
+                many=True,
+            )
+            for chunk in chunks
+        ]
+    )
+    for rows in results:
+        for member in rows:
+            am = anon_member(member)
+            members[am.idnumber] = am
+    for idn in missing:
+        set_cached("anon_getmember", elotable, idn, members.get(idn))
+    return [members[idn] for idn in idnumbers if idn in members]
+
+
 async def mysql_anon_getclubmembers(idclub: int, active: bool = True):
-    cnx = get_mysql()
     qactive = " AND signaletique.AnneeAffilie >= %(year)s " if active else ""
     query = """
         SELECT 
@@ -215,29 +271,34 @@ async def mysql_anon_getclubmembers(idclub: int, active: bool = True):
         LEFT JOIN fide ON {elotable}.Fide =  fide.ID_NUMBER
         WHERE signaletique.Club = %(idclub)s {qactive}
     """
-    try:
-        cursor = cnx.cursor(dictionary=True)
-        qf = query.format(elotable=get_elotable(), qactive=qactive)
-        cursor.execute(
-            qf,
-            {
-                "idclub": idclub,
-                "year": current_affiliation_year(),
-            },
-        )
-        members = cursor.fetchall()
-    except Exception as e:
-        logger.exception("Mysql error")
-        raise RdInternalServerError(description="MySQLError")
-    finally:
-        cnx.close()
-    await asyncio.sleep(0)
+    elotable = get_elotable()
+    members = await run_mysql(
+        mysql_fetch,
+        query.format(elotable=elotable, qactive=qactive),
+        {
+            "idclub": idclub,
+            "year": current_affiliation_year(),
+        },
+        many=True,
+    )
+    # warm up the member cache, the members without rating in the quarter
+    # are unknown to mysql_anon_getmember
+    for member in members:
+        if member["natrating"] is not None:
+            set_cached(
+                "anon_getmember", elotable, member["idnumber"], anon_member(member)
+            )
     return [AnonMember(**member) for member in members]
 
 
 async def mysql_anon_getfidemember(idfide: int) -> AnonMember:
     logger.info(f"getfide {idfide}")
-    cnx = get_mysql()
+    elotable = get_elotable()
+    found, am = get_cached("anon_getfidemember", elotable, idfide)
+    if found:
+        if am is None:
+            raise RdNotFound(description="MemberNotFound")
+        return am
     query = """
         SELECT
             Name as fullname,
@@ -248,19 +309,11 @@ async def mysql_anon_getfidemember(idfide: int) -> AnonMember:
         FROM fide
         WHERE ID_number = %(idnumber)s
     """
-    try:
-        cursor = cnx.cursor(dictionary=True)
-        cursor.execute(query, {"idnumber": idfide})
-        member = cursor.fetchone()
-    except Exception as e:
-        logger.exception("Mysql error")
-        raise RdInternalServerError(description="MySQLError")
-    finally:
-        cnx.close()
+    member = await run_mysql(mysql_fetch, query, {"idnumber": idfide})
     if not member:
+        set_cached("anon_getfidemember", elotable, idfide, None)
         raise RdNotFound(description="MemberNotFound")
     logger.info("member", member)
-    await asyncio.sleep(0)
     nparts = member["fullname"].split(", ")
     am = AnonMember(
         idclub=0,
@@ -274,35 +327,31 @@ async def mysql_anon_getfidemember(idfide: int) -> AnonMember:
         nationalityfide=member["nationalityfide"],
     )
     am.birthyear = member["birthday"].year
+    set_cached("anon_getfidemember", elotable, idfide, am)
     return am
 
 
 async def mysql_anon_belid_from_fideid(idfide) -> int:
-    cnx = get_mysql()
+    elotable = get_elotable()
+    found, idbel = get_cached("anon_belid_from_fideid", elotable, idfide)
+    if found:
+        return idbel or 0
     query = """
         SELECT Matricule as idbel
         FROM {elotable}
         WHERE Fide = %(idfide)s
     """
-    try:
-        cursor = cnx.cursor(dictionary=True)
-        qf = query.format(elotable=get_elotable())
-        cursor.execute(qf, {"idfide": idfide})
-        m = cursor.fetchone()
-    except Exception as e:
-        logger.exception("Mysql error")
-        raise RdInternalServerError(description="MySQLError")
-    finally:
-        cnx.close()
-    if m:
-        return m.get("idbel", 0)
-    else:
-        return 0
+    m = await run_mysql(
+        mysql_fetch, query.format(elotable=elotable), {"idfide": idfide}
+    )
+    idbel = m.get("idbel", 0) if m else 0
+    set_cached("anon_belid_from_fideid", elotable, idfide, idbel or None)
+    return idbel
 
 
-async def mysql_old_userpassword(oup: OldUserPasswordValidator) -> None:
+def write_old_userpassword(oup: OldUserPasswordValidator) -> None:
     """
-    write a new user, or overwrite an existing in the old p_user table
+    blocking, called in the mysql executor via run_mysql
     """
     cnx = get_mysql()
     try:
@@ -333,4 +382,12 @@ async def mysql_old_userpassword(oup: OldUserPasswordValidator) -> None:
         cursor.close()
     finally:
         cnx.close()
-    await asyncio.sleep(0)
+
+
+async def mysql_old_userpassword(oup: OldUserPasswordValidator) -> None:
+    """
+    write a new user, or overwrite an existing in the old p_user table
+    """
+    await run_mysql(write_old_userpassword, oup)
+    if oup.user.isdigit():
+        invalidate_member(int(oup.user))
@@ -0,0 +1,168 @@
+# copyright Ruben Decrop 2012 - 2024
+
+# the rating history of the members
+# the quarterly rating tables p_playerYYYYMM of the mysql database are
+# consolidated into one collection with a document per member and quarter
+# a refresh loads the quarters not yet in the collection and reloads the
+# current quarter, so the history of a member is a single indexed read
+# the fide table only holds the current fide rating, hence the fide ratings
+# are only known for the quarters that were current when loaded
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+import re
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from pymongo import UpdateOne
+from reddevil.core import get_mongodb
+
+from kbsb.core.db import run_mysql
+from kbsb.member.md_member import (
+    DbMemberSync,
+    DbRatingHistory,
+    MemberSyncRun,
+    RatingHistory,
+    RatingHistoryDB,
+    RatingHistoryItem,
+)
+from kbsb.member.member import anon_getclubmembers
+from kbsb.member.mysql_member import get_elotable, mysql_fetch
+from kbsb.member.sync import HISTORYTABLE
+
+HISTORYCHUNK = 5000  # rows per mysql query and per bulk write
+ELOTABLE = re.compile(r"^p_player(\d{6})$")
+
+HISTORYQUERY = """
+    SELECT
+        {elotable}.Matricule as idnumber,
+        {elotable}.Elo as natrating,
+        {elotable}.Fide as idfide
+        {fidecolumn}
+    FROM {elotable}
+    {fidejoin}
+    WHERE {elotable}.Matricule > %(last)s
+    ORDER BY {elotable}.Matricule
+    LIMIT %(limit)s
+"""
+
+
+async def read_periods() -> List[str]:
+    """
+    the periods YYYYMM of the rating tables in the mysql database
+    """
+    rows = await run_mysql(
+        mysql_fetch,
+        "SHOW TABLES LIKE %(pattern)s",
+        {"pattern": "p_player%"},
+        many=True,
+        dictionary=False,
+    )
+    matches = [ELOTABLE.match(row[0]) for row in rows]
+    return sorted(m.group(1) for m in matches if m)
+
+
+async def load_period(period: str, current: bool) -> MemberSyncRun:
+    """
+    load the rating table of a quarter into the history
+    the fide ratings are joined for the current quarter only
+    """
+    elotable = f"p_player{period}"
+    query = HISTORYQUERY.format(
+        elotable=elotable,
+        fidecolumn=", fide.Elo as fiderating" if current else "",
+        fidejoin=(
+            f"LEFT JOIN fide ON {elotable}.Fide = fide.ID_NUMBER" if current else ""
+        ),
+    )
+    coll = get_mongodb()[DbRatingHistory.COLLECTION]
+    run = MemberSyncRun(
+        period=period, started=datetime.now(timezone.utc), table=HISTORYTABLE
+    )
+    start = time.perf_counter()
+    last = 0
+    while True:
+        rows = await run_mysql(
+            mysql_fetch, query, {"last": last, "limit": HISTORYCHUNK}, many=True
+        )
+        ops = [
+            UpdateOne(
+                {"idnumber": row["idnumber"], "period": period},
+                {
+                    "$set": RatingHistoryDB(**row, period=period).model_dump(
+                        exclude={"id"}
+                    )
+                },
+                upsert=True,
+            )
+            for row in rows
+        ]
+        if ops:
+            await coll.bulk_write(ops, ordered=False)
+        run.read += len(rows)
+        run.upserted += len(ops)
+        if len(rows) < HISTORYCHUNK:
+            break
+        last = rows[-1]["idnumber"]
+    run.duration = time.perf_counter() - start
+    run.rowspersecond = run.read / run.duration if run.duration else 0.0
+    run.finished = datetime.now(timezone.utc)
+    await DbMemberSync.add(run.model_dump(exclude={"id", "lag"}))
+    logger.info(f"loaded {run.read} ratings of {period} in {run.duration:.1f}s")
+    return run
+
+
+async def mgmt_sync_ratinghistory() -> List[MemberSyncRun]:
+    """
+    load the new quarters and reload the current quarter into the history
+    """
+    coll = get_mongodb()[DbRatingHistory.COLLECTION]
+    await coll.create_index([("idnumber", 1), ("period", 1)], unique=True)
+    loaded = set(await coll.distinct("period"))
+    current = get_elotable()[len("p_player") :]
+    runs = []
+    for period in await read_periods():
+        if period == current or period not in loaded:
+            runs.append(await load_period(period, period == current))
+    return runs
+
+
+def history_items(docs: List[dict]) -> Dict[int, List[RatingHistoryItem]]:
+    items: Dict[int, List[RatingHistoryItem]] = {}
+    for doc in docs:
+        items.setdefault(doc["idnumber"], []).append(RatingHistoryItem(**doc))
+    return items
+
+
+async def anon_getratinghistory(idnumber: int) -> RatingHistory:
+    """
+    the national and fide ratings of a member over all quarters
+    """
+    coll = get_mongodb()[DbRatingHistory.COLLECTION]
+    docs = await coll.find(
+        {"idnumber": idnumber}, {"_id": 0}, sort=[("period", 1)]
+    ).to_list(None)
+    return RatingHistory(
+        idnumber=idnumber, ratings=history_items(docs).get(idnumber, [])
+    )
+
+
+async def anon_getclubratinghistory(idclub: int) -> List[RatingHistory]:
+    """
+    the rating histories of the active members of a club
+    """
+    members = await anon_getclubmembers(idclub, True)
+    idnumbers = [m.idnumber for m in members]
+    coll = get_mongodb()[DbRatingHistory.COLLECTION]
+    docs = await coll.find(
+        {"idnumber": {"$in": idnumbers}},
+        {"_id": 0},
+        sort=[("idnumber", 1), ("period", 1)],
+    ).to_list(None)
+    items = history_items(docs)
+    return [
+        RatingHistory(idnumber=idn, ratings=items.get(idn, [])) for idn in idnumbers
+    ]
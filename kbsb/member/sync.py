@@ -0,0 +1,215 @@
+# copyright Ruben Decrop 2012 - 2024
+
+# the replication of the legacy mysql member tables to mongodb
+# the signaletique joined with the rating table of the quarter becomes the
+# member collection, the fide table the fidemember collection
+# the tables are read in chunks ordered by their key, every row gets a
+# checksum and only the rows with a changed checksum are written
+# the rows that disappeared from mysql are deleted
+# the mysql tables have no reliable modification time, hence the checksums
+# every run is reported in the membersync collection
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+import hashlib
+import json
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, NamedTuple
+
+from pymongo import DeleteMany, UpdateOne
+from reddevil.core import get_mongodb
+
+from kbsb.core.db import date2datetime, run_mysql
+from kbsb.member.md_member import (
+    DbFideMember,
+    DbMember,
+    DbMemberSync,
+    FideMemberDB,
+    MemberDB,
+    MemberSyncRun,
+)
+from kbsb.member.mysql_member import get_elotable, mysql_fetch
+
+SYNCCHUNK = 5000  # rows per mysql query and per bulk write
+
+MEMBERQUERY = """
+    SELECT
+        signaletique.Dnaiss as birthdate,
+        Decede as deceased,
+        DateAffiliation as date_affiliation,
+        fide.Elo as fiderating,
+        signaletique.Prenom as first_name,
+        signaletique.Sexe as gender,
+        signaletique.Matricule as idbel,
+        signaletique.Club as idclub,
+        {elotable}.Fide as idfide,
+        signaletique.Nom as last_name,
+        signaletique.G as licence_g,
+        signaletique.Locked as locked,
+        signaletique.GSM as mobile,
+        signaletique.Nationalite as nationalitybel,
+        signaletique.NatFIDE as nationalityfide,
+        {elotable}.Elo as natrating,
+        {elotable}.Matricule IS NOT NULL as rated,
+        signaletique.AnneeAffilie as year_affiliation
+    FROM signaletique
+    LEFT JOIN {elotable} ON  signaletique.Matricule = {elotable}.Matricule
+    LEFT JOIN fide ON {elotable}.Fide =  fide.ID_NUMBER
+    WHERE signaletique.Matricule > %(last)s
+    ORDER BY signaletique.Matricule
+    LIMIT %(limit)s
+"""
+
+FIDEQUERY = """
+    SELECT
+        Birthday as birthday,
+        Elo as fiderating,
+        Name as fullname,
+        Sex as gender,
+        ID_NUMBER as idfide,
+        Country as nationalityfide
+    FROM fide
+    WHERE ID_NUMBER > %(last)s
+    ORDER BY ID_NUMBER
+    LIMIT %(limit)s
+"""
+
+
+def member_doc(row: Dict[str, Any], period: str) -> Dict[str, Any]:
+    doc = MemberDB(**row, period=period).model_dump(exclude={"id", "checksum"})
+    date2datetime(doc, "birthdate")
+    date2datetime(doc, "date_affiliation")
+    return doc
+
+
+def fidemember_doc(row: Dict[str, Any], period: str) -> Dict[str, Any]:
+    doc = FideMemberDB(**row).model_dump(exclude={"id", "checksum"})
+    date2datetime(doc, "birthday")
+    return doc
+
+
+class SyncTable(NamedTuple):
+    name: str
+    collection: str
+    key: str
+    query: str
+    document: Callable[[Dict[str, Any], str], Dict[str, Any]]
+
+
+SYNCTABLES = [
+    SyncTable("signaletique", DbMember.COLLECTION, "idbel", MEMBERQUERY, member_doc),
+    SyncTable("fide", DbFideMember.COLLECTION, "idfide", FIDEQUERY, fidemember_doc),
+]
+HISTORYTABLE = "ratinghistory"  # the runs of the rating history, see ratinghistory
+
+
+def checksum(doc: Dict[str, Any]) -> str:
+    return hashlib.md5(
+        json.dumps(doc, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+async def sync_table(table: SyncTable, period: str) -> MemberSyncRun:
+    """
+    replicate a mysql table to its collection, writing the changed rows only
+    """
+    coll = get_mongodb()[table.collection]
+    run = MemberSyncRun(
+        period=period, started=datetime.now(timezone.utc), table=table.name
+    )
+    start = time.perf_counter()
+    stored = {
+        d[table.key]: d.get("checksum")
+        async for d in coll.find({}, {table.key: 1, "checksum": 1, "_id": 0})
+    }
+    seen = set()
+    last = 0
+    while True:
+        rows = await run_mysql(
+            mysql_fetch,
+            table.query.format(elotable=period),
+            {"last": last, "limit": SYNCCHUNK},
+            many=True,
+        )
+        ops = []
+        for row in rows:
+            doc = table.document(row, period)
+            doc["checksum"] = checksum(doc)
+            key = doc[table.key]
+            seen.add(key)
+            if stored.get(key) != doc["checksum"]:
+                ops.append(UpdateOne({table.key: key}, {"$set": doc}, upsert=True))
+        if ops:
+            await coll.bulk_write(ops, ordered=False)
+        run.read += len(rows)
+        run.upserted += len(ops)
+        if len(rows) < SYNCCHUNK:
+            break
+        last = rows[-1][table.key]
+    removed = [key for key in stored if key not in seen]
+    if removed:
+        await coll.bulk_write(
+            [
+                DeleteMany({table.key: {"$in": removed[ix : ix + SYNCCHUNK]}})
+                for ix in range(0, len(removed), SYNCCHUNK)
+            ]
+        )
+    run.deleted = len(removed)
+    run.duration = time.perf_counter() - start
+    run.rowspersecond = run.read / run.duration if run.duration else 0.0
+    run.finished = datetime.now(timezone.utc)
+    await DbMemberSync.add(run.model_dump(exclude={"id", "lag"}))
+    logger.info(
+        f"synced {table.name}: {run.read} read, {run.upserted} upserted, "
+        f"{run.deleted} deleted in {run.duration:.1f}s"
+    )
+    return run
+
+
+async def create_member_indexes() -> None:
+    db = get_mongodb()
+    await db[DbMember.COLLECTION].create_index("idbel", unique=True)
+    await db[DbMember.COLLECTION].create_index([("idclub", 1), ("year_affiliation", 1)])
+    await db[DbMember.COLLECTION].create_index("idfide")
+    await db[DbFideMember.COLLECTION].create_index("idfide", unique=True)
+    await db[DbMemberSync.COLLECTION].create_index([("table", 1), ("started", -1)])
+
+
+async def mgmt_sync_members() -> List[MemberSyncRun]:
+    """
+    replicate the member tables of the current quarter to mongodb
+    """
+    await create_member_indexes()
+    period = get_elotable()
+    return [await sync_table(table, period) for table in SYNCTABLES]
+
+
+async def mgmt_get_membersync() -> List[MemberSyncRun]:
+    """
+    the last sync of every table and of the rating history,
+    with the time since it finished
+    """
+    runs = []
+    now = datetime.now(timezone.utc)
+    for name in [t.name for t in SYNCTABLES] + [HISTORYTABLE]:
+        docs = await DbMemberSync.find_multiple(
+            {
+                "table": name,
+                "_model": MemberSyncRun,
+                "_sort": [("started", -1)],
+                "_limit": 1,
+            }
+        )
+        if not docs:
+            continue
+        run = docs[0]
+        if run.finished:
+            finished = run.finished
+            if finished.tzinfo is None:
+                finished = finished.replace(tzinfo=timezone.utc)
+            run.lag = (now - finished).total_seconds()
+        runs.append(run)
+    return runs
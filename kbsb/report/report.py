@@ -12,7 +12,7 @@ from datetime import datetime, timezone
 from mimetypes import guess_type
 from random import randrange
 from base64 import b64encode, b64decode
-from typing import cast, Any, IO
+from typing import cast, Any, Dict, IO, Iterable, List
 from fastapi.responses import Response
 
 from reddevil.core import (
@@ -190,6 +190,57 @@ def writeFilecontent(path: str, fileobj: IO) -> None:
         blob = Blob(path, bucket)
         blob.upload_from_file(fileobj)
     if settings.FILESTORE["manager"] == "local":
-        basedir = Path(settings.FILESTORE["basedir"])
-        with open(basedir / path, "wb") as f:
+        fullpath = Path(settings.FILESTORE["basedir"]) / path
+        fullpath.parent.mkdir(parents=True, exist_ok=True)
+        with open(fullpath, "wb") as f:
             f.write(fileobj.getvalue())
+
+
+def writeFilestream(path: str, chunks: Iterable[bytes]) -> None:
+    """
+    write an iterable of bytes chunks to the filestore without
+    building the whole content in memory
+    """
+    log.info(f"writing file stream {path}")
+    settings = get_settings()
+    if settings.FILESTORE["manager"] == "google":
+        client = storage_client()
+        bucket = client.bucket(settings.FILESTORE["bucket"])
+        blob = Blob(path, bucket)
+        with blob.open("wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+    if settings.FILESTORE["manager"] == "local":
+        fullpath = Path(settings.FILESTORE["basedir"]) / path
+        fullpath.parent.mkdir(parents=True, exist_ok=True)
+        with open(fullpath, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+
+
+def listFilecontent(prefix: str) -> List[Dict[str, Any]]:
+    """
+    list the files in the filestore under a prefix
+    returns dicts with the path, size and update time of each file
+    """
+    settings = get_settings()
+    files = []
+    if settings.FILESTORE["manager"] == "google":
+        client = storage_client()
+        for blob in client.list_blobs(settings.FILESTORE["bucket"], prefix=prefix):
+            files.append(
+                {"path": blob.name, "size": blob.size, "updated": blob.updated}
+            )
+    if settings.FILESTORE["manager"] == "local":
+        basedir = Path(settings.FILESTORE["basedir"])
+        for f in sorted((basedir / prefix).glob("**/*")):
+            if f.is_file():
+                stat = f.stat()
+                files.append(
+                    {
+                        "path": str(f.relative_to(basedir)),
+                        "size": stat.st_size,
+                        "updated": datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+                    }
+                )
+    return files
@@ -113,6 +113,10 @@ TOKEN = {
 
 MEMBERDB = "oldmysql"
 
+# the mysql connection pool and the executor running the queries have the same size
+MYSQL_POOL_SIZE = int(os.environ.get("MYSQL_POOL_SIZE", 5))
+MYSQL_QUERY_TIMEOUT = float(os.environ.get("MYSQL_QUERY_TIMEOUT", 10))  # seconds
+
 ls = "No local settings found"
 
 try:
@@ -0,0 +1,70 @@
+# benchmark the ELO report writers
+# renders the players and teams of a committed FIDE report with the
+# replaceAt string splicing writer and with the record layouts
+
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, "tests/interclub")
+
+from test_eloformat import parse, read_report
+from kbsb.interclubs.eloformat import FIDE_001, FIDE_013, render_fide_elo
+from kbsb.interclubs.md_interclubs import ICROUNDS
+
+
+def replaceAt(source, index, replace):
+    return source[:index] + replace + source[index + len(replace) :]
+
+
+def legacy_lines(players, teams):
+    for pl in players:
+        ls = " " * 100
+        ls = replaceAt(ls, 0, "001")
+        ls = replaceAt(ls, 4, "{:4d}".format(pl["myix"]))
+        ls = replaceAt(ls, 9, "{:1s}".format(pl["gender"]))
+        ls = replaceAt(ls, 10, "{:>3s}".format(pl["title"]))
+        ls = replaceAt(ls, 14, "{:33s}".format(pl["fullname"]))
+        ls = replaceAt(ls, 48, "{:4d}".format(pl["fiderating"]))
+        ls = replaceAt(ls, 53, pl["natfide"])
+        ls = replaceAt(ls, 57, "{:11d}".format(pl["idfide"]))
+        ls = replaceAt(ls, 69, "{:10s}".format(pl["birthday"]))
+        ls = replaceAt(ls, 80, "{:4.1f}".format(pl["sc1"]))
+        ls = replaceAt(ls, 91, "{:4d}".format(pl["oppix"]))
+        ls = replaceAt(ls, 96, pl["color"])
+        ls = replaceAt(ls, 98, pl["sc2"])
+        if "`" in ls:
+            ls = ls.replace("`", "'")
+        yield (ls + "\x0D\x0A").encode()
+    for t in teams:
+        ls = " " * 100
+        ls = replaceAt(ls, 0, "013")
+        ls = replaceAt(ls, 5, t["team"])
+        for ix, pl in enumerate(t["players"]):
+            ls = replaceAt(ls, 36 + 6 * ix, "{:4d}".format(pl))
+        yield (ls + "\x0D\x0A").encode()
+
+
+def main():
+    print(f"{'report':>16} {'lines':>6} {'replaceAt (ms)':>15} {'layout (ms)':>12}")
+    for path in sorted(Path(".").glob("ICN_fide_R*.txt")):
+        _, _, lines = read_report(path, "utf-8")
+        players = [parse(FIDE_001, l) for l in lines if l.startswith("001")]
+        teams = [parse(FIDE_013, l) for l in lines if l.startswith("013")]
+        header = {"round": 1, "icdate": ICROUNDS[1], "npart": 0}
+        header.update(nrated=0, nteams=0)
+        number = 20
+        tlegacy = timeit.timeit(
+            lambda: b"".join(legacy_lines(players, teams)), number=number
+        )
+        tlayout = timeit.timeit(
+            lambda: b"".join(render_fide_elo(header, players, teams)), number=number
+        )
+        print(
+            f"{path.name:>16} {len(players) + len(teams):>6} "
+            f"{tlegacy / number * 1e3:>15.2f} {tlayout / number * 1e3:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# benchmark concurrent anon_getclubmembers calls against a slow mysql
+# compares the queries run on the event loop with the queries run in the
+# bounded mysql executor
+# the connection is a fake whose execute sleeps like a slow signaletique join
+
+import asyncio
+import time
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+from kbsb.core.db import MYSQL_POOL_SIZE
+from kbsb.member.md_member import AnonMember
+from kbsb.member.mysql_member import mysql_anon_getclubmembers, mysql_fetch
+
+QUERYTIME = 0.05  # seconds
+NREQUESTS = 40
+
+ROW = {
+    "birthdate": date(1965, 1, 1),
+    "fiderating": 2000,
+    "first_name": "First",
+    "gender": "M",
+    "idclub": 301,
+    "idfide": 201308,
+    "idnumber": 45608,
+    "last_name": "Last",
+    "nationalitybel": "BEL",
+    "nationalityfide": "BEL",
+    "natrating": 1900,
+}
+
+
+def fake_mysql():
+    cursor = MagicMock()
+    cursor.execute.side_effect = lambda *args: time.sleep(QUERYTIME)
+    cursor.fetchall.return_value = [ROW] * 30
+    cnx = MagicMock()
+    cnx.cursor.return_value = cursor
+    return cnx
+
+
+async def legacy_anon_getclubmembers(idclub: int, active: bool = True):
+    # the query run directly on the event loop
+    members = mysql_fetch("SELECT", {"idclub": idclub}, many=True)
+    await asyncio.sleep(0)
+    return [AnonMember(**member) for member in members]
+
+
+async def ticker(lags: list, stop: asyncio.Event):
+    # measures how long the event loop is stalled
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - start - 0.001)
+
+
+async def run(fn) -> tuple:
+    lags = []
+    stop = asyncio.Event()
+    tick = asyncio.create_task(ticker(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*[fn(300 + ix) for ix in range(NREQUESTS)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick
+    return NREQUESTS / elapsed, max(lags) * 1000
+
+
+async def main():
+    with patch("kbsb.member.mysql_member.get_mysql", side_effect=fake_mysql), patch(
+        "kbsb.member.mysql_member.get_elotable", return_value="p_player202401"
+    ):
+        print(
+            f"{NREQUESTS} concurrent requests, query time {QUERYTIME * 1000:.0f}ms, "
+            f"pool size {MYSQL_POOL_SIZE}"
+        )
+        print(f"{'':>12} {'requests/s':>11} {'max loop stall (ms)':>20}")
+        for name, fn in (
+            ("event loop", legacy_anon_getclubmembers),
+            ("executor", mysql_anon_getclubmembers),
+        ):
+            throughput, stall = await run(fn)
+            print(f"{name:>12} {throughput:>11.1f} {stall:>20.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
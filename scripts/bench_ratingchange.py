@@ -0,0 +1,87 @@
+# benchmark the rating change engine
+# a synthetic full season (11 rounds, 24 series of 12 teams, 6 boards),
+# about the 830 games per round of the committed FIDE reports,
+# with the players of data/eloprocessing.csv
+
+import random
+import time
+
+from kbsb.interclubs import ICEncounter, ICGame, ICRound, ICSeries, ICTeam
+from kbsb.interclubs.elo import ELOFILE
+from kbsb.interclubs.ratingchange import (
+    game_columns,
+    player_totals,
+    rating_changes,
+)
+from kbsb.interclubs.ratingsnapshot import load_rating_snapshot
+
+
+def make_season(ids, nseries=24, nteams=12, nboards=6, nrounds=11):
+    rng = random.Random(1)
+    allseries = []
+    for s in range(nseries):
+        teams = [
+            ICTeam(
+                division=1 + s % 5,
+                titular=[],
+                idclub=s * 100 + t,
+                index="A",
+                name=f"Team {s} {t}",
+                pairingnumber=t,
+                playersplayed=[],
+            )
+            for t in range(1, nteams + 1)
+        ]
+        rounds = []
+        for r in range(1, nrounds + 1):
+            encounters = []
+            for e in range(nteams // 2):
+                games = [
+                    ICGame(
+                        idnumber_home=rng.choice(ids),
+                        idnumber_visit=rng.choice(ids),
+                        result=rng.choice(["1-0", "½-½", "0-1", "1-0 FF"]),
+                    )
+                    for _ in range(nboards)
+                ]
+                encounters.append(
+                    ICEncounter(
+                        icclub_home=1,
+                        icclub_visit=2,
+                        pairingnr_home=2 * e + 1,
+                        pairingnr_visit=2 * e + 2,
+                        games=games,
+                    )
+                )
+            rounds.append(ICRound(round=r, rdate="", encounters=encounters))
+        allseries.append(ICSeries(division=1, index="A", teams=teams, rounds=rounds))
+    return allseries
+
+
+def main():
+    snapshot = load_rating_snapshot(ELOFILE)
+    ids = [int(i) for i in snapshot.idnumbers if snapshot[int(i)]["belrating"]]
+    allseries = make_season(ids)
+    rounds = list(range(1, 12))
+    start = time.perf_counter()
+    changes = rating_changes(rounds, allseries, perround=False)
+    total = time.perf_counter() - start
+    print(f"season: {len(changes)} players in {total * 1000:.0f} ms")
+    from kbsb.interclubs.elo import EloExport
+
+    games = []
+    for r in rounds:
+        export = EloExport(r)
+        export.elodata = snapshot
+        export.fidegames_round(allseries)
+        games.extend((r, g) for g in export.fidegames)
+    start = time.perf_counter()
+    totals = player_totals(game_columns(games, True), True)
+    kernel = time.perf_counter() - start
+    print(
+        f"kernel: {len(games)} FIDE games, {len(totals)} rows in {kernel * 1000:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# benchmark the rating snapshot
+# loads the ratings of data/eloprocessing.csv and looks up every player,
+# parsing the csv into dicts versus memory mapping the snapshot
+
+import random
+import shutil
+import tempfile
+import timeit
+from csv import DictReader
+from pathlib import Path
+
+from kbsb.interclubs.ratingsnapshot import RatingSnapshot, load_rating_snapshot
+
+ELOFILE = "data/eloprocessing.csv"
+
+
+def legacy(ids):
+    elodata = {}
+    with open(ELOFILE) as ff:
+        for fd in DictReader(ff):
+            elodata[int(fd["idnumber"])] = fd
+    return [elodata[i]["belrating"] for i in ids]
+
+
+def snapshot(elofile, ids):
+    ratings = load_rating_snapshot(elofile)
+    return [ratings[i]["belrating"] for i in ids]
+
+
+def snapshot_column(elofile, ids):
+    return load_rating_snapshot(elofile).column("belrating", ids)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        elofile = Path(tmp) / "eloprocessing.csv"
+        shutil.copy(ELOFILE, elofile)
+        load_rating_snapshot(elofile)
+        with open(ELOFILE) as ff:
+            allids = [int(fd["idnumber"]) for fd in DictReader(ff)]
+        ids = random.Random(1).sample(allids, 2000)
+        n = 20
+        cold = timeit.timeit(
+            lambda: RatingSnapshot.load(elofile.with_suffix(".npy")), number=n
+        )
+        print(f"{'variant':>24} {'ms':>8}")
+        print(f"{'mmap load':>24} {cold / n * 1000:8.2f}")
+        for label, fn in [
+            ("csv dicts", lambda: legacy(ids)),
+            ("snapshot rows", lambda: snapshot(elofile, ids)),
+            ("snapshot column", lambda: snapshot_column(elofile, ids)),
+        ]:
+            t = timeit.timeit(fn, number=n)
+            print(f"{label:>24} {t / n * 1000:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# benchmark the update document sent to MongoDB when saving a single result
+# compares rewriting the whole rounds array with a $set on the encounter path
+
+import timeit
+import bson
+from datetime import datetime, timezone
+from kbsb.interclubs import ICEncounter, ICGame, ICRound
+from kbsb.interclubs.series import encounter_updates
+
+
+def make_rounds(nrounds: int = 11, nencounters: int = 6, nboards: int = 8):
+    return [
+        ICRound(
+            round=rnd,
+            rdate="",
+            encounters=[
+                ICEncounter(
+                    icclub_home=100 + ix,
+                    icclub_visit=200 + ix,
+                    pairingnr_home=ix + 1,
+                    pairingnr_visit=12 - ix,
+                    games=[
+                        ICGame(idnumber_home=10000 + b, idnumber_visit=20000 + b)
+                        for b in range(nboards)
+                    ],
+                    signhome_ts=datetime.now(timezone.utc),
+                    signvisit_ts=datetime.now(timezone.utc),
+                )
+                for ix in range(nencounters)
+            ],
+        )
+        for rnd in range(1, nrounds + 1)
+    ]
+
+
+def main():
+    print(
+        f"{'boards':>6} {'full (bytes)':>13} {'path (bytes)':>13} {'full (µs)':>10} {'path (µs)':>10}"
+    )
+    for nboards in (4, 6, 8):
+        rounds = make_rounds(nboards=nboards)
+        enc = rounds[5].encounters[3]
+
+        def full():
+            return bson.encode({"$set": {"rounds": [r.model_dump() for r in rounds]}})
+
+        def path():
+            return bson.encode({"$set": encounter_updates(5, {3: enc})})
+
+        number = 500
+        tfull = timeit.timeit(full, number=number) / number * 1e6
+        tpath = timeit.timeit(path, number=number) / number * 1e6
+        print(
+            f"{nboards:>6} {len(full()):>13} {len(path()):>13} "
+            f"{tfull:>10.1f} {tpath:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# benchmark the scoring kernel
+# recomputes the points of a synthetic full season,
+# board by board per encounter versus a single vectorised call
+
+import random
+import timeit
+from kbsb.interclubs import GAMERESULT, ICEncounter, ICGame
+from kbsb.interclubs.scoring import calc_points_bulk
+
+
+def legacy_calc_points(enc: ICEncounter):
+    enc.boardpoint2_home = 0
+    enc.boardpoint2_visit = 0
+    enc.matchpoint_home = 0
+    enc.matchpoint_visit = 0
+    allfilled = True
+    forfeited = False
+    for g in enc.games:
+        result = (
+            g.overruled
+            if g.overruled and g.overruled != GAMERESULT.NOTOVERRULED
+            else g.result
+        )
+        if result in [GAMERESULT.HOMEWIN, GAMERESULT.FORFEIT_VISIT]:
+            enc.boardpoint2_home += 2
+        if result in [GAMERESULT.VISITWIN, GAMERESULT.FORFEIT_HOME]:
+            enc.boardpoint2_visit += 2
+        if result in [GAMERESULT.DRAW, GAMERESULT.SPECIAL_5_0]:
+            enc.boardpoint2_home += 1
+        if result in [GAMERESULT.DRAW, GAMERESULT.SPECIAL_0_5]:
+            enc.boardpoint2_visit += 1
+        if result == GAMERESULT.FORFEIT_TEAM:
+            forfeited = True
+        if result == GAMERESULT.NOTPLAYED:
+            allfilled = False
+    if allfilled:
+        enc.played = True
+        if not forfeited:
+            if enc.boardpoint2_home > enc.boardpoint2_visit:
+                enc.matchpoint_home = 2
+            if enc.boardpoint2_home == enc.boardpoint2_visit:
+                enc.matchpoint_home = 1
+                enc.matchpoint_visit = 1
+            if enc.boardpoint2_home < enc.boardpoint2_visit:
+                enc.matchpoint_visit = 2
+
+
+def make_season(nseries: int, rnd: random.Random):
+    results = ["1-0", "½-½", "0-1", "1-0 FF", "0-1 FF"]
+    nboards = {1: 8, 2: 8, 3: 6, 4: 4, 5: 4}
+    encounters = []
+    for s in range(nseries):
+        boards = nboards[min(5, 1 + s // 8)]
+        for _ in range(11 * 6):
+            encounters.append(
+                ICEncounter(
+                    icclub_home=1,
+                    icclub_visit=2,
+                    pairingnr_home=1,
+                    pairingnr_visit=2,
+                    games=[ICGame(result=rnd.choice(results)) for _ in range(boards)],
+                )
+            )
+    return encounters
+
+
+def main():
+    rnd = random.Random(1)
+    print(f"{'series':>6} {'encounters':>10} {'loop (ms)':>10} {'kernel (ms)':>12}")
+    for nseries in (8, 32, 64):
+        encounters = make_season(nseries, rnd)
+        number = 5
+        tloop = timeit.timeit(
+            lambda: [legacy_calc_points(e) for e in encounters], number=number
+        )
+        tkernel = timeit.timeit(lambda: calc_points_bulk(encounters), number=number)
+        print(
+            f"{nseries:>6} {len(encounters):>10} {tloop / number * 1e3:>10.1f} "
+            f"{tkernel / number * 1e3:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
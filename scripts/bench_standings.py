@@ -0,0 +1,71 @@
+# benchmark the standings engine
+# compares a full recalculation with the incremental update of a single encounter
+# for growing series sizes
+
+import timeit
+from kbsb.interclubs import ICEncounter, ICGame, ICRound, ICSeries, ICTeam
+from kbsb.interclubs.series import calc_points
+from kbsb.interclubs.standings import apply_encounter, compute_standings, new_standings
+
+
+def make_series(nteams: int) -> ICSeries:
+    teams = [
+        ICTeam(
+            division=1,
+            titular=[],
+            idclub=ix,
+            index="A",
+            name=f"Team {ix}",
+            pairingnumber=ix,
+            playersplayed=[],
+        )
+        for ix in range(1, nteams + 1)
+    ]
+    pnrs = list(range(1, nteams + 1))
+    rounds = []
+    for rnd in range(1, nteams):
+        encounters = []
+        for ix in range(nteams // 2):
+            home, visit = pnrs[ix], pnrs[nteams - 1 - ix]
+            enc = ICEncounter(
+                icclub_home=home,
+                icclub_visit=visit,
+                pairingnr_home=home,
+                pairingnr_visit=visit,
+                games=[ICGame(idnumber_home=1, idnumber_visit=2, result="1-0")] * 8,
+            )
+            calc_points(enc)
+            encounters.append(enc)
+        rounds.append(ICRound(round=rnd, rdate="", encounters=encounters))
+        pnrs = [pnrs[0], pnrs[-1]] + pnrs[1:-1]
+    return ICSeries(division=1, index="A", teams=teams, rounds=rounds)
+
+
+def main():
+    print(f"{'teams':>6} {'rounds':>6} {'full (µs)':>12} {'incremental (µs)':>18}")
+    for nteams in (6, 12, 24, 48, 96):
+        series = make_series(nteams)
+        standings = compute_standings(series, new_standings(series))
+        enc = series.rounds[-1].encounters[-1]
+        old = enc.model_copy(deep=True)
+        flipped = enc.model_copy(deep=True)
+        flipped.games = [ICGame(idnumber_home=1, idnumber_visit=2, result="0-1")] * 8
+        calc_points(flipped)
+        number = 200
+        tfull = timeit.timeit(
+            lambda: compute_standings(series, standings), number=number
+        )
+
+        def incremental():
+            apply_encounter(standings, nteams - 1, old, flipped)
+            apply_encounter(standings, nteams - 1, flipped, old)
+
+        tinc = timeit.timeit(incremental, number=number) / 2
+        print(
+            f"{nteams:>6} {nteams - 1:>6} {tfull / number * 1e6:>12.1f} "
+            f"{tinc / number * 1e6:>18.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+# count the MongoDB round trips of a playerlist update with many transfers
+# compares rewriting the players arrays of every involved club one by one
+# with the diff applied as array operations in a single transaction
+# the database is an in-memory fake counting every call
+
+import asyncio
+import bson
+from unittest.mock import patch
+
+from kbsb.interclubs import ICClubDB, ICPlayer, ICPlayerUpdate, ICPlayerUpdateItem
+from kbsb.interclubs.icclubs import clb_updateICplayers
+
+NPLAYERS = 60
+
+
+class Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        self.it = iter(self.docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.it)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length):
+        return list(self.docs)
+
+
+class Collection:
+    def __init__(self, db, docs=()):
+        self.db = db
+        self.docs = {d["idclub"]: d for d in docs}
+
+    def count(self, *docs):
+        self.db.trips += 1
+        self.db.bytes += sum(len(bson.encode(d)) for d in docs if d)
+
+    def find(self, filter, projection=None, **kwargs):
+        self.count(filter)
+        doc = self.docs.get(filter.get("idclub"))
+        return Cursor([dict(doc, _id=doc["idclub"])] if doc else [])
+
+    async def find_one(self, filter, projection=None):
+        self.count(filter)
+        doc = self.docs.get(filter.get("idclub"))
+        return dict(doc, _id=doc["idclub"]) if doc else None
+
+    async def find_one_and_update(self, filter, update, **kwargs):
+        self.count(filter, update)
+        doc = self.docs[filter["idclub"]]
+        doc.update(update["$set"])
+        return dict(doc, _id=doc["idclub"])
+
+    async def insert_one(self, doc):
+        self.count(doc)
+
+    async def insert_many(self, docs, session=None):
+        self.count(*docs)
+
+    async def bulk_write(self, ops, ordered=True, session=None):
+        self.count(*[op._doc for op in ops])
+
+
+class Session:
+    def __init__(self, db):
+        self.db = db
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def start_transaction(self):
+        return self
+
+    async def commit(self):
+        pass
+
+
+class Client:
+    def __init__(self, db):
+        self.db = db
+
+    async def start_session(self):
+        return Session(self.db)
+
+
+class Database:
+    def __init__(self, clubs):
+        self.trips = 0
+        self.bytes = 0
+        self.client = Client(self)
+        self.colls = {"interclub2324club": Collection(self, clubs)}
+
+    def __getitem__(self, name):
+        return self.colls.setdefault(name, Collection(self))
+
+
+def make_player(idnumber: int, nature: str = "assigned", idclubvisit: int = 0):
+    return ICPlayer(
+        assignedrating=1500,
+        first_name="First",
+        idnumber=idnumber,
+        idcluborig=101,
+        idclubvisit=idclubvisit,
+        last_name="Last",
+        nature=nature,
+    )
+
+
+def make_clubs(ntransfers: int):
+    own = ICClubDB(
+        name="Club 101",
+        id=None,
+        idclub=101,
+        teams=[],
+        players=[make_player(10000 + ix) for ix in range(NPLAYERS)],
+        enrolled=True,
+    )
+    others = [
+        ICClubDB(
+            name=f"Club {200 + ix}",
+            id=None,
+            idclub=200 + ix,
+            teams=[],
+            players=[make_player(20000 + 100 * ix + j) for j in range(NPLAYERS)],
+            enrolled=True,
+        )
+        for ix in range(ntransfers)
+    ]
+    return [c.model_dump() for c in [own, *others]]
+
+
+def make_update(ntransfers: int):
+    players = [make_player(10000 + ix) for ix in range(NPLAYERS)]
+    for ix in range(ntransfers):
+        players[ix].nature = "confirmedout"
+        players[ix].idclubvisit = 200 + ix
+    fields = set(ICPlayerUpdateItem.model_fields)
+    return ICPlayerUpdate(
+        players=[ICPlayerUpdateItem(**p.model_dump(include=fields)) for p in players]
+    )
+
+
+async def legacy_clb_updateICplayers(idclub: int, pi: ICPlayerUpdate) -> None:
+    # the playerlist update writing the whole players arrays
+    from kbsb.interclubs import DbICClub
+    from kbsb.interclubs.icclubs import clb_getICclub, transfer_player
+
+    icc = await clb_getICclub(idclub)
+    oldplsix = {p.idnumber: p for p in icc.players}
+    transfersout = [
+        p
+        for p in pi.players
+        if p.idnumber in oldplsix
+        and oldplsix[p.idnumber].nature != p.nature
+        and p.nature == "confirmedout"
+    ]
+    dictplayers = [p.model_dump() for p in pi.players]
+    await DbICClub.update({"idclub": idclub}, {"players": dictplayers})
+    for t in transfersout:
+        receivingclub = await clb_getICclub(t.idclubvisit)
+        rcplayers = receivingclub.players
+        rcplayers.append(transfer_player(t))
+        dictplayers = [p.model_dump() for p in rcplayers]
+        await DbICClub.update({"idclub": t.idclubvisit}, {"players": dictplayers})
+
+
+async def run(fn, ntransfers: int):
+    db = Database(make_clubs(ntransfers))
+    with patch("reddevil.core.dbbase.get_mongodb", return_value=db), patch(
+        "kbsb.interclubs.icclubs.get_mongodb", return_value=db
+    ):
+        db.trips = db.bytes = 0
+        await fn(101, make_update(ntransfers))
+    return db.trips, db.bytes
+
+
+async def main():
+    print(
+        f"{'transfers':>9} {'full (trips)':>13} {'diff (trips)':>13} "
+        f"{'full (bytes)':>13} {'diff (bytes)':>13}"
+    )
+    for ntransfers in (0, 1, 5, 10, 25):
+        full = await run(legacy_clb_updateICplayers, ntransfers)
+        diff = await run(clb_updateICplayers, ntransfers)
+        print(
+            f"{ntransfers:>9} {full[0]:>13} {diff[0]:>13} "
+            f"{full[1]:>13} {diff[1]:>13}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
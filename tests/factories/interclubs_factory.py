@@ -7,6 +7,7 @@ from kbsb.interclubs import (
     ICGame,
     ICGameDetails,
     ICPlanning,
+    ICPlanningItem,
     ICPlayerUpdate,
     ICPlayerValidationError,
     ICResult,
@@ -48,6 +49,11 @@ class IcPlanningFactory(ModelFactory[ICPlanning]):
     __model__ = ICPlanning
 
 
+@register_fixture
+class IcPlanningItemFactory(ModelFactory[ICPlanningItem]):
+    __model__ = ICPlanningItem
+
+
 @register_fixture
 class IcPlayerUpdateFactory(ModelFactory[ICPlayerUpdate]):
     __model__ = ICPlayerUpdate
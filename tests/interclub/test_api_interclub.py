@@ -3,6 +3,12 @@ from unittest.mock import AsyncMock, patch, MagicMock
 from fastapi.testclient import TestClient
 from fastapi.encoders import jsonable_encoder
 
+from kbsb.interclubs import (
+    ICBoardEligibility,
+    ICLineupEligibility,
+    ICPenaltyReportFile,
+    ICPenaltyRun,
+)
 from kbsb.main import app
 
 
@@ -156,11 +162,27 @@ def test_anon_getICseries(
 ):
     client = TestClient(app)
     anon_getICseries.return_value = ic_series_factory.batch(size=3)
-    resp = client.get("/api/v1/interclubs/anon/icseries?idclub=123&round=2")
+    resp = client.get("/api/v1/interclubs/anon/icseries?idclub=123")
     assert resp.status_code == 200
     anon_getICseries.assert_awaited()
 
 
+@patch("kbsb.interclubs.api_interclubs.anon_getICseries_snapshot")
+def test_anon_getICseries_snapshot(anon_getICseries_snapshot: AsyncMock):
+    client = TestClient(app)
+    anon_getICseries_snapshot.return_value = ("[]", '"abc"')
+    resp = client.get("/api/v1/interclubs/anon/icseries?idclub=123&round=2")
+    assert resp.status_code == 200
+    assert resp.headers["etag"] == '"abc"'
+    assert resp.json() == []
+    anon_getICseries_snapshot.assert_awaited_with(123, 2)
+    resp = client.get(
+        "/api/v1/interclubs/anon/icseries?idclub=123&round=2",
+        headers={"If-None-Match": '"abc"'},
+    )
+    assert resp.status_code == 304
+
+
 @patch("kbsb.interclubs.api_interclubs.validate_membertoken")
 @patch("kbsb.interclubs.api_interclubs.clb_getICseries")
 def test_clb_getICseries(
@@ -196,6 +218,7 @@ def test_clb_saveICplanning(
     vmt: AsyncMock,
     ic_planning_factory,
 ):
+    clb_saveICplanning.return_value = []
     client = TestClient(app)
     icp = ic_planning_factory.build()
     resp = client.put("/api/v1/interclubs/clb/icplanning", json=jsonable_encoder(icp))
@@ -203,6 +226,39 @@ def test_clb_saveICplanning(
     clb_saveICplanning.assert_awaited()
 
 
+@patch("kbsb.interclubs.api_interclubs.validate_membertoken")
+@patch("kbsb.interclubs.api_interclubs.clb_validateICplanning")
+def test_clb_validateICplanning(
+    clb_validateICplanning: AsyncMock,
+    vmt: AsyncMock,
+    ic_planning_factory,
+):
+    clb_validateICplanning.return_value = [
+        ICLineupEligibility(
+            boards=[
+                ICBoardEligibility(
+                    boardnumber=1,
+                    eligible=False,
+                    idnumber=45608,
+                    reasons=["player not in playerlist"],
+                )
+            ],
+            division=4,
+            idclub=103,
+            index="A",
+            pairingnumber=3,
+            round=1,
+        )
+    ]
+    client = TestClient(app)
+    icp = ic_planning_factory.build()
+    resp = client.post(
+        "/api/v1/interclubs/clb/icplanning/validate", json=jsonable_encoder(icp)
+    )
+    assert resp.status_code == 200
+    assert resp.json()[0]["boards"][0]["eligible"] is False
+
+
 @patch("kbsb.interclubs.api_interclubs.validate_token")
 @patch("kbsb.interclubs.api_interclubs.mgmt_saveICresults")
 def test_mgmt_saveICresults(
@@ -253,6 +309,15 @@ def test_anon_getICencounterdetails(
     anon_getICencounterdetails.assert_awaited()
 
 
+@patch("kbsb.interclubs.api_interclubs.anon_getICrounddetails")
+def test_anon_getICrounddetails(anon_getICrounddetails: AsyncMock):
+    client = TestClient(app)
+    anon_getICrounddetails.return_value = []
+    resp = client.get("/api/v1/interclubs/anon/icrounddetails?round=2&division=1")
+    assert resp.status_code == 200
+    anon_getICrounddetails.assert_awaited_with(2, 1, "")
+
+
 @patch("kbsb.interclubs.api_interclubs.anon_getICstandings")
 def test_anon_getICstandings(
     anon_getICstandings: AsyncMock,
@@ -307,7 +372,45 @@ def test_mgmt_generate_penalties(
     mgmt_generate_penalties: AsyncMock,
     vt: AsyncMock,
 ):
+    mgmt_generate_penalties.return_value = ICPenaltyRun(
+        round=2, issues=0, timings={"forfeits": 0.001}
+    )
     client = TestClient(app)
     resp = client.post("/api/v1/interclubs/mgmt/command/penalties/2")
     assert resp.status_code == 201
+    assert resp.json()["timings"] == {"forfeits": 0.001}
     mgmt_generate_penalties.assert_awaited()
+
+
+@patch("kbsb.interclubs.api_interclubs.validate_token")
+@patch("kbsb.interclubs.api_interclubs.mgmt_getICviolations")
+def test_mgmt_getICviolations(
+    mgmt_getICviolations: AsyncMock,
+    vt: AsyncMock,
+):
+    mgmt_getICviolations.return_value = []
+    client = TestClient(app)
+    resp = client.get("/api/v1/interclubs/mgmt/icviolations?round=2&idclub=103")
+    assert resp.status_code == 200
+    assert resp.json() == []
+    mgmt_getICviolations.assert_awaited_with(2, 103, 0, "")
+
+
+@patch("kbsb.interclubs.api_interclubs.validate_token")
+@patch("kbsb.interclubs.api_interclubs.mgmt_list_penalty_reports")
+def test_mgmt_list_penalty_reports(
+    mgmt_list_penalty_reports: AsyncMock,
+    vt: AsyncMock,
+):
+    mgmt_list_penalty_reports.return_value = [
+        ICPenaltyReportFile(
+            format="csv",
+            path="interclubs/penalties/penalties_R2.csv",
+            round=2,
+            size=120,
+        )
+    ]
+    client = TestClient(app)
+    resp = client.get("/api/v1/interclubs/mgmt/penalties")
+    assert resp.status_code == 200
+    assert resp.json()[0]["round"] == 2
@@ -0,0 +1,83 @@
+import pytest
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from kbsb.interclubs import ICGame, ICPlanningItem, iccache
+from kbsb.interclubs.cache import invalidate_club
+from kbsb.interclubs.eligibility import (
+    NOT_IN_PLAYERLIST,
+    RATING_ORDER,
+    TITULAR_DIVISION,
+    TITULAR_SERIES,
+    TITULAR_TEAM,
+    EligibilityIndex,
+    clb_validateICplanning,
+)
+
+from tests.interclub.test_penalties import make_club
+from tests.interclub.test_standings import make_series
+
+
+def make_index():
+    series = make_series()
+    club = make_club(
+        101,
+        series,
+        [(11, 1800, "Club 1"), (12, 1700, None), (13, 1900, None)],
+    )
+    return EligibilityIndex.from_clubs([club])
+
+
+def test_check_lineup():
+    index = make_index()
+    boards = index.check_lineup(101, 4, "A", 1, [11, 13, 0, 12])
+    assert [b.eligible for b in boards] == [True, False, True, True]
+    assert boards[1].reasons == [RATING_ORDER]
+    assert boards[2].idnumber == 0
+    boards = index.check_lineup(101, 4, "A", 1, [99, 12])
+    assert boards[0].reasons == [NOT_IN_PLAYERLIST]
+    # the titular of team 1 (division 4, series A) in other teams
+    assert index.titular_reason(11, 5, "A", 1) == TITULAR_DIVISION
+    assert index.titular_reason(11, 4, "B", 1) == TITULAR_SERIES
+    assert index.titular_reason(11, 4, "A", 2) == TITULAR_TEAM
+    assert index.titular_reason(11, 3, "A", 7) is None
+    assert index.titular_reason(12, 5, "A", 1) is None
+
+
+def test_check_lineup_speed():
+    index = make_index()
+    lineup = [11, 12, 13, 0, 99, 11, 12, 13]
+    n = 1000
+    start = time.perf_counter()
+    for _ in range(n):
+        index.check_lineup(101, 4, "A", 1, lineup)
+    assert (time.perf_counter() - start) / n < 0.001
+
+
+@patch("kbsb.interclubs.eligibility.DbICClub")
+@pytest.mark.asyncio
+async def test_clb_validateICplanning(dbClub: MagicMock):
+    iccache.clear()
+    series = make_series()
+    club = make_club(101, series, [(11, 1800, None), (12, 1700, None)])
+    dbClub.find_single = AsyncMock(return_value=club)
+    plan = ICPlanningItem(
+        division=4,
+        games=[ICGame(idnumber_visit=12), ICGame(idnumber_visit=11)],
+        idclub=101,
+        idclub_opponent=102,
+        index="A",
+        name="Club 1",
+        name_opponent="Club 2",
+        nrgames=2,
+        pairingnumber=1,
+        playinghome=False,
+        round=1,
+    )
+    checks = await clb_validateICplanning([plan, plan])
+    assert [b.reasons for b in checks[0].boards] == [[], [RATING_ORDER]]
+    # the club index is read once and dropped with the playerlist
+    dbClub.find_single.assert_awaited_once()
+    invalidate_club(101)
+    await clb_validateICplanning([plan])
+    assert dbClub.find_single.await_count == 2
@@ -0,0 +1,210 @@
+import asyncio
+import zipfile
+from io import BytesIO
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from reddevil.core import RdBadRequest
+
+from kbsb.interclubs import ICEncounter, ICGame, ICRound, ICSeries, ICTeam
+from kbsb.interclubs.elo import (
+    EloExport,
+    calc_belg_elo,
+    calc_fide_elo,
+    mgmt_download_belg_elo,
+    mgmt_download_elo_batch,
+    mgmt_download_fide_elo,
+    mgmt_elo_batch,
+    round_pipeline,
+    stream_elo_games,
+)
+
+ELOCSV = """idnumber,last_name,first_name,idfide,natfide,birthday,fullname,title,fiderating,gender,gender2,idclub,belrating
+101,Home,Anna,2001,BEL,1990-01-01,,,1800,F,F,1,1750
+102,Home,Bert,2002,BEL,1991-01-01,,,1700,M,M,1,1650
+201,Visit,Carl,2003,BEL,1992-01-01,,,1900,M,M,2,1850
+202,Visit,Dora,2004,BEL,1993-01-01,,,1600,F,F,2,1550
+"""
+
+
+def make_series() -> ICSeries:
+    teams = [
+        ICTeam(
+            division=1,
+            titular=[],
+            idclub=idclub,
+            index="A",
+            name=f"Club {idclub}",
+            pairingnumber=idclub,
+            playersplayed=[],
+        )
+        for idclub in (1, 2)
+    ]
+    rounds = [
+        ICRound(
+            round=rnd,
+            rdate="",
+            encounters=[
+                ICEncounter(
+                    icclub_home=1,
+                    icclub_visit=2,
+                    pairingnr_home=1,
+                    pairingnr_visit=2,
+                    games=[
+                        ICGame(idnumber_home=101, idnumber_visit=201, result=r1),
+                        ICGame(idnumber_home=102, idnumber_visit=202, result=r2),
+                    ],
+                )
+            ],
+        )
+        for rnd, r1, r2 in [(1, "1-0", "½-½"), (2, "0-1", "1-0")]
+    ]
+    return ICSeries(division=1, index="A", teams=teams, rounds=rounds)
+
+
+@patch("kbsb.interclubs.elo.writeFilestream")
+@patch("kbsb.interclubs.elo.read_round_series")
+@pytest.mark.asyncio
+async def test_elo_exports_are_independent(
+    read_round_series: AsyncMock, writeFilestream: MagicMock, tmp_path, monkeypatch
+):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "eloprocessing.csv").write_text(ELOCSV)
+    read_round_series.return_value = [make_series()]
+    files = {}
+    writeFilestream.side_effect = lambda path, chunks: files.update(
+        {path: b"".join(chunks)}
+    )
+    await calc_fide_elo(1)
+    first = files["interclubs/elo/ICN_fide_R1.txt"]
+    # a second export in the same process does not accumulate games
+    await asyncio.gather(calc_fide_elo(1), calc_fide_elo(2), calc_belg_elo(1))
+    assert files["interclubs/elo/ICN_fide_R1.txt"] == first
+    assert b"062 4" in first
+    assert b"Visit, Carl" in files["interclubs/elo/ICN_fide_R2.txt"]
+    assert b"+1 =2 -1" in files["interclubs/elo/ICN_R1_part1.txt"]
+    report = EloExport(1).fide_report([make_series()])
+    assert b"".join(report) == first
+
+
+@patch("kbsb.interclubs.elo.read_round_series")
+@pytest.mark.asyncio
+async def test_download_elo_rendered_before_response(
+    read_round_series: AsyncMock, tmp_path, monkeypatch
+):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "eloprocessing.csv").write_text(ELOCSV)
+    read_round_series.return_value = [make_series()]
+    resp = await mgmt_download_belg_elo(1, "part1")
+    content = b"".join([chunk async for chunk in resp.body_iterator])
+    assert int(resp.headers["content-length"]) == len(content)
+    assert b"+1 =2 -1" in content
+    # player 202 is missing in the ratings, the export fails without a response
+    other = tmp_path / "other"
+    (other / "data").mkdir(parents=True)
+    (other / "data" / "eloprocessing.csv").write_text(
+        "\n".join(ELOCSV.splitlines()[:-1]) + "\n"
+    )
+    monkeypatch.chdir(other)
+    with pytest.raises(Exception):
+        await mgmt_download_fide_elo(1)
+
+
+class AsyncCursor:
+    def __init__(self, docs):
+        self.docs = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+@patch("kbsb.interclubs.elo.get_mongodb")
+@pytest.mark.asyncio
+async def test_stream_elo_games(get_mongodb: MagicMock, tmp_path):
+    elofile = tmp_path / "eloprocessing.csv"
+    elofile.write_text(ELOCSV)
+    series = make_series()
+    series.rounds = [r for r in series.rounds if r.round == 2]
+    coll = MagicMock()
+    coll.aggregate = MagicMock(return_value=AsyncCursor([series.model_dump()]))
+    get_mongodb.return_value = {"interclub2324series": coll}
+    games = [g async for _, g in stream_elo_games(2, fide=True, elofile=elofile)]
+    coll.aggregate.assert_called_once_with(round_pipeline(2))
+    assert [(g.idbel_white, g.result) for g in games] == [(101, "0-1"), (202, "0-1")]
+    assert games[1].idfide_white == 2004
+
+
+@patch("kbsb.interclubs.elo.writeFilestream")
+@patch("kbsb.interclubs.elo.read_round_series")
+@patch("kbsb.interclubs.elo.read_season_series")
+@pytest.mark.asyncio
+async def test_elo_batch(
+    read_season_series: AsyncMock,
+    read_round_series: AsyncMock,
+    writeFilestream: MagicMock,
+    tmp_path,
+    monkeypatch,
+):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "eloprocessing.csv").write_text(ELOCSV)
+    read_season_series.return_value = [make_series()]
+    read_round_series.return_value = [make_series()]
+    files = {}
+    writeFilestream.side_effect = lambda path, chunks: files.update(
+        {path: b"".join(chunks)}
+    )
+    report = await mgmt_elo_batch(1, 2)
+    read_season_series.assert_awaited_once_with([1, 2])
+    assert report.path == "interclubs/elo/ICN_R1-R2.zip"
+    assert report.files == [
+        "ICN_R1_part1.txt",
+        "ICN_R1_part2.txt",
+        "ICN_fide_R1.txt",
+        "ICN_R2_part1.txt",
+        "ICN_R2_part2.txt",
+        "ICN_fide_R2.txt",
+    ]
+    assert {"series", "ratings", "belgian_games", "fide_games", "render"} <= set(
+        report.timings
+    )
+    # the archived files are identical to the single round exports
+    archive = zipfile.ZipFile(BytesIO(files[report.path]))
+    await calc_fide_elo(2)
+    assert archive.read("ICN_fide_R2.txt") == files["interclubs/elo/ICN_fide_R2.txt"]
+    await calc_belg_elo(1)
+    assert archive.read("ICN_R1_part1.txt") == files["interclubs/elo/ICN_R1_part1.txt"]
+    with pytest.raises(RdBadRequest):
+        await mgmt_elo_batch(3, 2)
+
+
+@patch("kbsb.interclubs.elo.read_season_series")
+@pytest.mark.asyncio
+async def test_download_elo_batch_complete_before_response(
+    read_season_series: AsyncMock, tmp_path, monkeypatch
+):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "eloprocessing.csv").write_text(ELOCSV)
+    read_season_series.return_value = [make_series()]
+    resp = await mgmt_download_elo_batch(1, 2)
+    content = b"".join([chunk async for chunk in resp.body_iterator])
+    assert int(resp.headers["content-length"]) == len(content)
+    assert len(zipfile.ZipFile(BytesIO(content)).namelist()) == 6
+    # player 202 is missing in the ratings, no archive is sent
+    other = tmp_path / "other"
+    (other / "data").mkdir(parents=True)
+    (other / "data" / "eloprocessing.csv").write_text(
+        "\n".join(ELOCSV.splitlines()[:-1]) + "\n"
+    )
+    monkeypatch.chdir(other)
+    with pytest.raises(Exception):
+        await mgmt_download_elo_batch(1, 2)
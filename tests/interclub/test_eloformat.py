@@ -0,0 +1,157 @@
+import re
+from pathlib import Path
+
+import pytest
+
+from kbsb.interclubs import ICROUNDS
+from kbsb.interclubs.eloformat import (
+    BELGIAN_001,
+    FIDE_001,
+    FIDE_013,
+    render_belgian_elo,
+    render_fide_elo,
+)
+
+ROOT = Path(__file__).parents[2]
+
+
+def parse(layout, line: str) -> dict:
+    # read the fields back, every field spans up to the next field
+    offsets = sorted(f[0] for f in layout.fields) + [len(line)]
+    record = {}
+    for offset, fmt, key, stride in layout.fields:
+        if key is None:
+            continue
+        spec = fmt.__self__
+        if stride:
+            # past the record width the items are appended without spacing
+            width = len(layout.blank)
+            size = len(spec.format(0))
+            chunks = [
+                line[o : min(o + stride, width)] for o in range(offset, width, stride)
+            ]
+            chunks += [line[o : o + size] for o in range(width, len(line), size)]
+            record[key] = [int(c) for c in chunks if c.strip()]
+            continue
+        end = min(o for o in offsets if o > offset)
+        value = line[offset:end]
+        if spec.endswith("d}"):
+            record[key] = int(value)
+        elif spec.endswith("f}"):
+            record[key] = float(value)
+        else:
+            record[key] = value.rstrip()
+    return record
+
+
+def read_report(path: Path, encoding: str):
+    content = path.read_bytes()
+    linefeed = b"\r\n" if b"\r\n" in content else b"\n"
+    lines = content.decode(encoding).split(linefeed.decode())[:-1]
+    return content, linefeed, lines
+
+
+@pytest.mark.parametrize("path", sorted(ROOT.glob("ICN_R*_part*.txt")), ids=str)
+def test_belgian_elo_bytes(path: Path):
+    content, linefeed, lines = read_report(path, "latin1")
+    round = int(re.search(r"ICN_R(\d+)_", path.name).group(1))
+    p, won, drawn, lost = re.match(
+        r"00F P=(\d+) .* \+(\d+) =(\d+) -(\d+)", lines[5]
+    ).groups()
+    header = {
+        "round": round,
+        "icdate": ICROUNDS[round],
+        "npart": int(p),
+        "won": int(won),
+        "drawn": int(drawn),
+        "lost": int(lost),
+    }
+    glines = [parse(BELGIAN_001, l) for l in lines if l.startswith("001")]
+    rendered = b"".join(render_belgian_elo(header, glines, linefeed))
+    assert rendered == content
+
+
+@pytest.mark.parametrize("path", sorted(ROOT.glob("ICN_fide_R*.txt")), ids=str)
+def test_fide_elo_bytes(path: Path):
+    content, linefeed, lines = read_report(path, "utf-8")
+    round = int(re.search(r"ICN_fide_R(\d+)", path.name).group(1))
+    header = {
+        "round": round,
+        "icdate": ICROUNDS[round],
+        "npart": int(lines[5][4:]),
+        "nrated": int(lines[6][4:]),
+        "nteams": int(lines[7][4:]),
+    }
+    players = [parse(FIDE_001, l) for l in lines if l.startswith("001")]
+    teams = [parse(FIDE_013, l) for l in lines if l.startswith("013")]
+    rendered = b"".join(render_fide_elo(header, players, teams, linefeed))
+    # the committed files predate the replacement of backticks in names
+    assert rendered == content.replace(b"`", b"'")
+
+
+def replaceAt(source, index, replace):
+    # the character based writer of the original report code
+    return source[:index] + replace + source[index + len(replace) :]
+
+
+def test_fide_team_non_ascii():
+    team = {"team": "Liège 1", "players": [1, 2]}
+    ls = replaceAt(" " * 100, 0, "013")
+    ls = replaceAt(ls, 5, team["team"])
+    for ix, pl in enumerate(team["players"]):
+        ls = replaceAt(ls, 36 + 6 * ix, "{:4d}".format(pl))
+    assert FIDE_013.render(team, []) == ls.encode("utf-8")
+
+
+def test_fide_player_non_ascii_overflow():
+    pl = {
+        "myix": 12,
+        "gender": "m",
+        "title": "",
+        "fullname": "Jean-François Éléonore de Saint-Génois",
+        "fiderating": 1800,
+        "natfide": "BEL",
+        "idfide": 123456,
+        "birthday": "1970/01/01",
+        "sc1": 1.0,
+        "oppix": 13,
+        "color": "w",
+        "sc2": "1",
+    }
+    ls = replaceAt(" " * 100, 0, "001")
+    ls = replaceAt(ls, 4, "{:4d}".format(pl["myix"]))
+    ls = replaceAt(ls, 9, "{:1s}".format(pl["gender"]))
+    ls = replaceAt(ls, 10, "{:>3s}".format(pl["title"]))
+    ls = replaceAt(ls, 14, "{:33s}".format(pl["fullname"]))
+    ls = replaceAt(ls, 48, "{:4d}".format(pl["fiderating"]))
+    ls = replaceAt(ls, 53, pl["natfide"])
+    ls = replaceAt(ls, 57, "{:11d}".format(pl["idfide"]))
+    ls = replaceAt(ls, 69, "{:10s}".format(pl["birthday"]))
+    ls = replaceAt(ls, 80, "{:4.1f}".format(pl["sc1"]))
+    ls = replaceAt(ls, 91, "{:4d}".format(pl["oppix"]))
+    ls = replaceAt(ls, 96, pl["color"])
+    ls = replaceAt(ls, 98, pl["sc2"])
+    assert FIDE_001.render(pl, []) == ls.encode("utf-8")
+
+
+def test_belgian_player_non_ascii():
+    gl = {
+        "n": 3,
+        "name": "Dupré, Hélène",
+        "elo": 1650,
+        "idn": 45608,
+        "score": 0.5,
+        "opponent": 4,
+        "color": "B",
+        "rs": "=",
+    }
+    ls = replaceAt(" " * 100, 0, "001")
+    ls = replaceAt(ls, 4, "{:4d}".format(gl["n"]))
+    ls = replaceAt(ls, 14, "{:32s}".format(gl["name"]))
+    ls = replaceAt(ls, 48, "{:4d}".format(gl["elo"]))
+    ls = replaceAt(ls, 63, "{:5d}".format(gl["idn"]))
+    ls = replaceAt(ls, 81, "{:3.1f}".format(gl["score"]))
+    ls = replaceAt(ls, 91, "{:4d}".format(gl["opponent"]))
+    ls = replaceAt(ls, 96, "{:1s}".format(gl["color"]))
+    ls = replaceAt(ls, 98, "{:1s}".format(gl["rs"]))
+    assert BELGIAN_001.render(gl, []) == ls.encode("latin1")
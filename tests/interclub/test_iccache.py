@@ -0,0 +1,93 @@
+import pytest
+from unittest.mock import AsyncMock, patch, MagicMock
+
+from kbsb.core.cache import ResponseCache, cached
+from kbsb.interclubs import iccache
+from kbsb.interclubs.cache import invalidate_club, invalidate_clubs
+from kbsb.interclubs.icclubs import anon_getICclub, anon_getICclubs
+
+
+def test_responsecache_lru():
+    cache = ResponseCache(maxsize=2, ttl=60)
+    cache.set(("f", 1), "a")
+    cache.set(("f", 2), "b")
+    assert cache.get(("f", 1)) == (True, "a")
+    cache.set(("f", 3), "c")
+    assert cache.get(("f", 2)) == (False, None)
+    assert cache.get(("f", 1)) == (True, "a")
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_responsecache_ttl():
+    cache = ResponseCache(maxsize=2, ttl=-1)
+    cache.set(("f", 1), "a")
+    assert cache.get(("f", 1)) == (False, None)
+    assert cache.stats()["size"] == 0
+
+
+def test_responsecache_explicit_ttl():
+    cache = ResponseCache(maxsize=2, ttl=60)
+    cache.set(("f", 1), "a", ttl=0)
+    assert cache.get(("f", 1)) == (False, None)
+
+
+def test_responsecache_copies():
+    cache = ResponseCache()
+    value = [{"games": [1, 2]}]
+    cache.set(("f", 1), value)
+    value[0]["games"] = []
+    found, cached = cache.get(("f", 1))
+    cached[0]["games"] = []
+    assert cache.get(("f", 1)) == (True, [{"games": [1, 2]}])
+
+
+def test_responsecache_invalidate():
+    cache = ResponseCache()
+    cache.set(("f", 1, 2), "a")
+    cache.set(("f", 1, 3), "b")
+    cache.set(("g", 1, 2), "c")
+    assert cache.invalidate("f", 1, match=lambda k: k[2] == 3) == 1
+    assert cache.invalidate("f") == 1
+    assert cache.get(("g", 1, 2)) == (True, "c")
+
+
+@pytest.mark.asyncio
+async def test_cached_options_not_cached():
+    cache = ResponseCache()
+    calls = AsyncMock(return_value=1)
+
+    @cached(cache, "idclub")
+    async def getclub(idclub: int, options: dict = {}):
+        return await calls(idclub)
+
+    await getclub(1)
+    await getclub(1)
+    await getclub(1, {"x": 1})
+    assert calls.await_count == 2
+
+
+@patch("kbsb.interclubs.icclubs.DbICClub")
+@pytest.mark.asyncio
+async def test_anon_getICclub_cached(dbClub: MagicMock, ic_club_db_factory):
+    iccache.clear()
+    dbClub.find_single = AsyncMock(return_value=ic_club_db_factory.build(idclub=123))
+    await anon_getICclub(123)
+    await anon_getICclub(123)
+    dbClub.find_single.assert_awaited_once()
+    invalidate_club(123)
+    await anon_getICclub(123)
+    assert dbClub.find_single.await_count == 2
+
+
+@patch("kbsb.interclubs.icclubs.DbICClub")
+@pytest.mark.asyncio
+async def test_anon_getICclubs_cached(dbClub: MagicMock):
+    iccache.clear()
+    dbClub.find_multiple = AsyncMock(return_value=[])
+    await anon_getICclubs()
+    await anon_getICclubs()
+    dbClub.find_multiple.assert_awaited_once()
+    invalidate_clubs()
+    await anon_getICclubs()
+    assert dbClub.find_multiple.await_count == 2
@@ -0,0 +1,139 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from pymongo.errors import OperationFailure
+
+from kbsb.interclubs import ICClubDB, ICPlayer, ICPlayerUpdate, ICPlayerUpdateItem
+from kbsb.interclubs.icclubs import clb_updateICplayers, playerlist_ops
+
+
+def make_player(idnumber: int, nature: str = "assigned", **kwargs) -> ICPlayer:
+    return ICPlayer(
+        assignedrating=1500,
+        first_name="",
+        idnumber=idnumber,
+        idcluborig=kwargs.pop("idcluborig", 101),
+        idclubvisit=kwargs.pop("idclubvisit", 0),
+        last_name="",
+        nature=nature,
+        **kwargs,
+    )
+
+
+def update_item(p: ICPlayer, **kwargs) -> ICPlayerUpdateItem:
+    fields = p.model_dump(include=set(ICPlayerUpdateItem.model_fields))
+    fields.update(kwargs)
+    return ICPlayerUpdateItem(**fields)
+
+
+def test_playerlist_ops():
+    old = [
+        make_player(1),
+        make_player(2),
+        make_player(3, "confirmedout", idclubvisit=102),
+        make_player(4),
+    ]
+    new = [
+        update_item(old[0]),  # unchanged
+        update_item(old[1], titular="Club 1"),  # changed
+        update_item(old[2], nature="assigned"),  # transfer deleted
+        update_item(make_player(5, "confirmedout", idclubvisit=103)),  # out
+    ]
+    ops, history, idclubs = playerlist_ops(101, old, new)
+    docs = [(op._filter, op._doc) for op in ops]
+    assert docs[0][0] == {"idclub": 101}
+    assert docs[0][1]["$pull"] == {"players": {"idnumber": {"$in": [4]}}}
+    changed = [f.get("players.idnumber") for f, d in docs if "players.$" in d["$set"]]
+    assert changed == [2, 3]
+    assert docs[3][1]["$push"]["players"]["$each"][0]["idnumber"] == 5
+    assert docs[3][1]["$push"]["players"]["$position"] == 3
+    assert docs[4][0] == {"idclub": 103, "players.idnumber": {"$ne": 5}}
+    assert docs[4][1]["$push"]["players"]["nature"] == "requestedin"
+    assert docs[5][0] == {"idclub": 102}
+    assert docs[5][1]["$pull"] == {"players": {"idnumber": 3}}
+    assert all("_modificationtime" in d["$set"] for _, d in docs)
+    assert len(history) == len(ops)
+    assert history[1]["oldvalues"][0]["titular"] is None
+    assert idclubs == {101, 102, 103}
+    assert playerlist_ops(101, old, [update_item(p) for p in old])[0] == []
+
+
+def test_playerlist_ops_order():
+    old = [make_player(2), make_player(4), make_player(6)]
+    new = [update_item(make_player(idn)) for idn in [1, 2, 3, 4, 5, 7, 6]]
+    ops, _, _ = playerlist_ops(101, old, new)
+    pushes = [op._doc["$push"]["players"] for op in ops]
+    assert [(p["$position"], [d["idnumber"] for d in p["$each"]]) for p in pushes] == [
+        (0, [1]),
+        (2, [3]),
+        (4, [5, 7]),
+    ]
+    # replaying the pushes gives the submitted order
+    stored = [2, 4, 6]
+    for p in pushes:
+        ix = p["$position"]
+        stored[ix:ix] = [d["idnumber"] for d in p["$each"]]
+    assert stored == [1, 2, 3, 4, 5, 7, 6]
+    # reordered existing players replace the list in the submitted order
+    new = [update_item(old[2]), update_item(make_player(8)), update_item(old[0])]
+    ops, history, _ = playerlist_ops(101, old, new)
+    assert len(ops) == 1
+    assert ops[0]._filter == {"idclub": 101}
+    assert [d["idnumber"] for d in ops[0]._doc["$set"]["players"]] == [6, 8, 2]
+    assert len(history[0]["oldvalues"]) == 3
+
+
+def mock_mongodb(get_mongodb: MagicMock, transactions: bool = True):
+    coll = MagicMock(bulk_write=AsyncMock())
+    collhist = MagicMock(insert_many=AsyncMock())
+    if not transactions:
+        coll.bulk_write.side_effect = [OperationFailure("no replica set", 20), None]
+    session = MagicMock()
+    session.__aenter__ = AsyncMock(return_value=session)
+    session.__aexit__ = AsyncMock(return_value=False)
+    transaction = MagicMock()
+    transaction.__aenter__ = AsyncMock()
+    transaction.__aexit__ = AsyncMock(return_value=False)
+    session.start_transaction = MagicMock(return_value=transaction)
+    db = MagicMock()
+    db.__getitem__.side_effect = lambda name: (
+        collhist if name.endswith("__history") else coll
+    )
+    db.client.start_session = AsyncMock(return_value=session)
+    get_mongodb.return_value = db
+    return coll, collhist, session
+
+
+@pytest.mark.parametrize("transactions", [True, False])
+@patch("kbsb.interclubs.icclubs.invalidate_club")
+@patch("kbsb.interclubs.icclubs.clb_getICclub")
+@patch("kbsb.interclubs.icclubs.get_mongodb")
+@pytest.mark.asyncio
+async def test_clb_updateICplayers(
+    get_mongodb: MagicMock,
+    clb_getICclub: AsyncMock,
+    invalidate_club: MagicMock,
+    transactions: bool,
+):
+    coll, collhist, session = mock_mongodb(get_mongodb, transactions)
+    old = [make_player(1), make_player(2)]
+    clb_getICclub.return_value = ICClubDB(
+        name="Club 1", id=None, idclub=101, teams=[], players=old, enrolled=True
+    )
+    new = [update_item(old[0])] + [
+        update_item(make_player(idn, "confirmedout", idclubvisit=200 + idn))
+        for idn in range(10, 20)
+    ]
+    await clb_updateICplayers(101, ICPlayerUpdate(players=new))
+    # a single bulk write for the own club and all receiving clubs
+    ops = coll.bulk_write.call_args[0][0]
+    assert len(ops) == 12
+    if transactions:
+        coll.bulk_write.assert_awaited_once()
+        assert coll.bulk_write.call_args[1]["session"] is session
+        assert collhist.insert_many.call_args[1]["session"] is session
+    else:
+        assert coll.bulk_write.await_count == 2
+        assert "session" not in coll.bulk_write.call_args[1]
+    assert len(collhist.insert_many.call_args[0][0]) == 12
+    assert invalidate_club.call_count == 11
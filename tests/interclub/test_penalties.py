@@ -0,0 +1,195 @@
+import openpyxl
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from reddevil.core import RdBadRequest
+
+from kbsb.interclubs import ICClubDB, ICGame, ICPlayer
+from kbsb.interclubs.penalties import (
+    RULES,
+    PenaltyContext,
+    PenaltyRule,
+    mgmt_download_penalties,
+    mgmt_generate_penalties,
+    mgmt_list_penalty_reports,
+    penalty_rule,
+    run_rules,
+)
+from kbsb.interclubs.playedplayers import PlayedIndex
+
+from tests.interclub.test_standings import make_series
+
+
+def make_club(idclub: int, series, players, idclubs=()) -> ICClubDB:
+    return ICClubDB(
+        name=f"Club {idclub}",
+        id=None,
+        idclub=idclub,
+        teams=[t for t in series.teams if t.idclub in (idclub, *idclubs)],
+        players=[
+            ICPlayer(
+                assignedrating=rating,
+                first_name="",
+                idnumber=idnumber,
+                idcluborig=idclub,
+                idclubvisit=0,
+                last_name="",
+                nature="assigned",
+                titular=titular,
+            )
+            for idnumber, rating, titular in players
+        ],
+        enrolled=True,
+    )
+
+
+def play(enc, boards):
+    enc.games = [
+        ICGame(idnumber_home=h, idnumber_visit=v, result=r) for h, v, r in boards
+    ]
+
+
+def make_context(round: int = 2, double: bool = False):
+    series = make_series()
+    if double:
+        # club 1 and club 4 are 2 teams of the same club
+        series.teams[3].idclub = 101
+    # round 1: 101 - 104, round 2: 101 - 103
+    enc1 = series.rounds[0].encounters[0]
+    play(enc1, [(11, 41, "1-0"), (12, 42, "0-1")])
+    enc2 = series.rounds[1].encounters[0]
+    play(enc2, [(11, 31, "1-0 FF"), (13, 32, "½-½")])
+    clubs = [
+        make_club(101, series, [(11, 1800, None), (12, 1700, None), (13, 1900, None)]),
+        # player 31 is titular in the other team of the club in the series
+        make_club(103, series, [(31, 1600, "Club 4"), (32, 1500, None)], (104,)),
+        make_club(104, series, [(41, 1600, None), (42, 1500, None)]),
+    ]
+    return PenaltyContext(round, [series], clubs), series
+
+
+def test_run_rules_reports_issues():
+    ctx, series = make_context()
+    timings = run_rules(ctx)
+    assert set(timings) == set(RULES)
+    reasons = [(i["reason"], i["guilty"]) for i in ctx.issues]
+    assert ("forfait away", "Club 3") in reasons
+    assert ("rating order not correct", "Club 1") in reasons
+    assert ("Titular played in wrong team in the series", "Club 3") in reasons
+    assert ("signature home missing", "Club 1") in reasons
+
+
+def test_reserves_single_series():
+    ctx, series = make_context(double=True)
+    assert ctx.doubleteams[(4, "A")] == {1: [4], 4: [1]}
+    run_rules(ctx, ["reserves single series"])
+    assert ctx.issues == []
+    # player 41 played for pairing number 4 in round 1 and for 1 in round 3
+    ctx, series = make_context(3, double=True)
+    enc3 = [
+        e
+        for e in series.rounds[2].encounters
+        if 1 in (e.pairingnr_home, e.pairingnr_visit)
+    ][0]
+    side = "home" if enc3.pairingnr_home == 1 else "visit"
+    play(enc3, [(41, 21, "1-0")] if side == "home" else [(21, 41, "0-1")])
+    ctx = PenaltyContext(3, [series], ctx.allclubs)
+    run_rules(ctx, ["reserves single series"])
+    assert [i["reason"] for i in ctx.issues] == [
+        "player 41 already played in other team of series"
+    ]
+
+
+def test_reserves_single_series_reads_index():
+    ctx, series = make_context(3, double=True)
+    enc3 = [
+        e
+        for e in series.rounds[2].encounters
+        if 1 in (e.pairingnr_home, e.pairingnr_visit)
+    ][0]
+    side = "home" if enc3.pairingnr_home == 1 else "visit"
+    play(enc3, [(44, 21, "1-0")] if side == "home" else [(21, 44, "0-1")])
+    # player 44 is only known by the maintained index
+    played = PlayedIndex.from_docs(
+        [{"division": 4, "index": "A", "pairingnumber": 4, "round": 2, "players": [44]}]
+    )
+    ctx = PenaltyContext(3, [series], ctx.allclubs, played)
+    run_rules(ctx, ["reserves single series"])
+    assert [i["reason"] for i in ctx.issues] == [
+        "player 44 already played in other team of series"
+    ]
+
+
+def test_registered_rule_adds_no_pass():
+    calls = []
+
+    @penalty_rule("test counter")
+    class CounterRule(PenaltyRule):
+        def encounter(self, ctx, s, enc):
+            calls.append(enc)
+
+    try:
+        ctx, series = make_context()
+        timings = run_rules(ctx)
+    finally:
+        del RULES["test counter"]
+    assert "test counter" in timings
+    assert len(calls) == len(series.rounds[1].encounters)
+
+
+def local_filestore(tmp_path):
+    settings = MagicMock(FILESTORE={"manager": "local", "basedir": str(tmp_path)})
+    return patch("kbsb.report.report.get_settings", return_value=settings)
+
+
+@patch("kbsb.interclubs.penalties.read_played_players")
+@patch("kbsb.interclubs.penalties.DbICClub")
+@patch("kbsb.interclubs.penalties.DbICSeries")
+@pytest.mark.asyncio
+async def test_mgmt_generate_penalties(
+    dbSeries: MagicMock, dbClub: MagicMock, read_played_players: AsyncMock, tmp_path
+):
+    ctx, series = make_context()
+    dbSeries.find_multiple = AsyncMock(return_value=[series])
+    dbClub.find_multiple = AsyncMock(return_value=ctx.allclubs)
+    read_played_players.return_value = PlayedIndex.from_series([series])
+    with local_filestore(tmp_path):
+        run = await mgmt_generate_penalties(2)
+        reports = await mgmt_list_penalty_reports()
+    assert run.issues > 0
+    assert set(run.timings) == set(RULES)
+    assert run.paths == [
+        "interclubs/penalties/penalties_R2.csv",
+        "interclubs/penalties/penalties_R2.xlsx",
+    ]
+    lines = (tmp_path / run.paths[0]).read_text().splitlines()
+    assert len(lines) == run.issues + 1
+    wb = openpyxl.load_workbook(tmp_path / run.paths[1])
+    assert wb.active.max_row == run.issues + 1
+    assert [(r.round, r.format) for r in reports] == [(2, "csv"), (2, "xlsx")]
+
+
+@patch("kbsb.interclubs.penalties.read_played_players")
+@patch("kbsb.interclubs.penalties.DbICClub")
+@patch("kbsb.interclubs.penalties.DbICSeries")
+@pytest.mark.asyncio
+async def test_mgmt_download_penalties(
+    dbSeries: MagicMock, dbClub: MagicMock, read_played_players: AsyncMock, tmp_path
+):
+    ctx, series = make_context()
+    dbSeries.find_multiple = AsyncMock(return_value=[series])
+    dbClub.find_multiple = AsyncMock(return_value=ctx.allclubs)
+    read_played_players.return_value = PlayedIndex.from_series([series])
+    with local_filestore(tmp_path):
+        resp = await mgmt_download_penalties(2)
+        content = b"".join([chunk async for chunk in resp.body_iterator])
+        assert content.startswith(b"reason,division")
+        dbSeries.find_multiple.assert_awaited_once()
+        # the stored report is served without recomputing
+        resp = await mgmt_download_penalties(2, "xlsx")
+        assert resp.media_type.endswith("spreadsheetml.sheet")
+        dbSeries.find_multiple.assert_awaited_once()
+        await mgmt_download_penalties(2, refresh=True)
+        assert dbSeries.find_multiple.await_count == 2
+        with pytest.raises(RdBadRequest):
+            await mgmt_download_penalties(2, "pdf")
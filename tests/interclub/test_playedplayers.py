@@ -0,0 +1,80 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from kbsb.interclubs.playedplayers import (
+    PlayedIndex,
+    doubleteams,
+    played_updates,
+    playersplayed_updates,
+    update_played_players,
+)
+
+from tests.interclub.test_penalties import play
+from tests.interclub.test_standings import make_series
+
+
+def played_series():
+    series = make_series()
+    # club 1 and club 4 are 2 teams of the same club
+    series.teams[3].idclub = 101
+    # round 1: 1 - 4, round 2: 1 - 3
+    play(series.rounds[0].encounters[0], [(11, 41, "1-0"), (12, 42, "0-1")])
+    play(series.rounds[1].encounters[0], [(11, 31, "1-0"), (13, 0, "1-0 FF")])
+    return series
+
+
+def test_doubleteams():
+    series = played_series()
+    assert doubleteams(series) == {1: [4], 4: [1]}
+    series.teams[2].idclub = 101
+    assert doubleteams(series)[1] == [3, 4]
+    assert doubleteams(make_series()) == {}
+
+
+def test_played_index():
+    index = PlayedIndex.from_series([played_series()])
+    assert index.before((4, "A", 1), 1) == set()
+    assert index.before((4, "A", 1), 2) == {11, 12}
+    assert index.before((4, "A", 1), 3) == {11, 12, 13}
+    assert index.before((4, "A", 3), 3) == {31}
+    assert index.team((4, "A", 4)) == {41, 42}
+
+
+def test_played_index_covers():
+    series = played_series()
+    assert PlayedIndex.from_series([series]).covers([series], 3)
+    # only the docs of round 2 were written since the deploy
+    ops = played_updates(series, [(2, series.rounds[1].encounters[0])])
+    index = PlayedIndex.from_docs([op._doc["$set"] for op in ops])
+    assert index.covers([series], 1)
+    assert not index.covers([series], 3)
+
+
+def test_played_updates():
+    series = played_series()
+    ops = played_updates(series, [(2, series.rounds[1].encounters[0])])
+    assert [op._filter for op in ops] == [
+        {"division": 4, "index": "A", "pairingnumber": 1, "round": 2},
+        {"division": 4, "index": "A", "pairingnumber": 3, "round": 2},
+    ]
+    docs = [op._doc["$set"] for op in ops]
+    assert [(d["idclub"], d["players"]) for d in docs] == [(101, [11, 13]), (103, [31])]
+    index = PlayedIndex.from_docs(docs)
+    assert index.before((4, "A", 1), 3) == {11, 13}
+    assert playersplayed_updates(series, [1, 4]) == {
+        "teams.0.playersplayed": [11, 12, 13],
+        "teams.3.playersplayed": [41, 42],
+    }
+
+
+@patch("kbsb.interclubs.playedplayers.get_mongodb")
+@pytest.mark.asyncio
+async def test_update_played_players(get_mongodb: MagicMock):
+    series = played_series()
+    coll = MagicMock(bulk_write=AsyncMock())
+    get_mongodb.return_value = {"interclub2324playedplayers": coll}
+    await update_played_players(series, [(1, series.rounds[0].encounters[0])])
+    assert len(coll.bulk_write.call_args[0][0]) == 2
+    coll.bulk_write.reset_mock()
+    await update_played_players(series, [])
+    coll.bulk_write.assert_not_awaited()
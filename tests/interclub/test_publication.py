@@ -0,0 +1,60 @@
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from kbsb.interclubs import iccache
+from kbsb.interclubs.publication import anon_getICseries_snapshot, snapshot_updates
+
+from tests.interclub.test_series import AsyncCursor
+
+
+def test_snapshot_updates(
+    ic_series_factory, ic_round_factory, ic_encounter_factory, ic_game_factory
+):
+    encounter = ic_encounter_factory.build(
+        icclub_home=101, icclub_visit=102, games=[ic_game_factory.build()]
+    )
+    round1 = ic_round_factory.build(round=1, encounters=[encounter])
+    round2 = ic_round_factory.build(round=2, encounters=[encounter])
+    series = ic_series_factory.build(rounds=[round1, round2])
+    ops = snapshot_updates(series, {2})
+    assert len(ops) == 1
+    filter = ops[0]._filter
+    update = ops[0]._doc["$set"]
+    assert filter == {"round": 2, "division": series.division, "index": series.index}
+    public = json.loads(update["public"])
+    embargoed = json.loads(update["embargoed"])
+    assert len(public["rounds"]) == 1
+    assert len(public["rounds"][0]["encounters"][0]["games"]) == 1
+    assert embargoed["rounds"][0]["encounters"][0]["games"] == []
+
+
+@patch("kbsb.interclubs.publication.get_mongodb")
+@pytest.mark.asyncio
+async def test_anon_getICseries_snapshot_unpublished(
+    get_mongodb: MagicMock, ic_series_factory, ic_round_factory
+):
+    iccache.clear()
+    series = ic_series_factory.build(rounds=[ic_round_factory.build(round=1)])
+    snapshots = MagicMock(bulk_write=AsyncMock())
+    # nothing published, the second read finds the built round
+    snapshots.find = MagicMock(
+        side_effect=[
+            MagicMock(to_list=AsyncMock(return_value=[])),
+            MagicMock(to_list=AsyncMock(return_value=[{"public": "{}"}])),
+        ]
+    )
+    snapshots.find_one = AsyncMock(return_value=None)
+    seriescoll = MagicMock()
+    seriescoll.find = MagicMock(return_value=AsyncCursor([series.model_dump()]))
+    get_mongodb.return_value = {
+        "interclub2324seriessnapshot": snapshots,
+        "interclub2324series": seriescoll,
+    }
+    content, etag = await anon_getICseries_snapshot(0, 1)
+    assert content == "[{}]"
+    seriescoll.find.assert_called_once()
+    assert seriescoll.find.call_args[0][1]["rounds"] == {"$elemMatch": {"round": 1}}
+    snapshots.bulk_write.assert_awaited_once()
+    # the miss was not cached
+    assert iccache.stats()["size"] == 1
@@ -0,0 +1,132 @@
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from kbsb.interclubs import EloGame
+from kbsb.interclubs.cache import iccache
+from kbsb.interclubs.ratingchange import (
+    anon_getICratingchange,
+    expected_score,
+    fide_kfactor,
+    game_columns,
+    mgmt_getICratingchanges,
+    player_totals,
+)
+
+from tests.interclub.test_elo import ELOCSV, make_series
+
+
+def make_game(white, black, rw, rb, result, birthday="1980-01-01") -> EloGame:
+    return EloGame(
+        idbel_white=white,
+        idbel_black=black,
+        belrating_white=rw,
+        belrating_black=rb,
+        fiderating_white=rw,
+        fiderating_black=rb,
+        birthday_white=birthday,
+        birthday_black="1980-01-01",
+        result=result,
+    )
+
+
+def test_expected_score():
+    exp = expected_score(np.array([1600, 2000, 1500]), np.array([1600, 1600, 2500]))
+    assert exp[0] == pytest.approx(0.5)
+    assert exp[1] == pytest.approx(1 / (1 + 10 ** (-1)))
+    capped = expected_score(np.array([1500]), np.array([2500]), 400)
+    assert capped[0] == pytest.approx(1 / (1 + 10))
+
+
+def test_fide_kfactor():
+    k = fide_kfactor(np.array([1800, 1800, 2350, 2450]), np.array([15, 30, 15, 15]))
+    assert list(k) == [40, 20, 20, 10]
+
+
+def test_player_totals_matches_reference():
+    rng = np.random.default_rng(1)
+    games = []
+    for ix in range(200):
+        w, b = rng.choice(np.arange(1, 30), 2, replace=False)
+        rw, rb = rng.integers(1000, 2500, 2)
+        if ix % 17 == 0:
+            rb = 0
+        result = rng.choice(["1-0", "½-½", "0-1", "1-0 FF"])
+        games.append((1 + ix % 3, make_game(int(w), int(b), int(rw), int(rb), result)))
+    totals = player_totals(game_columns(games, False), False, perround=False)
+    reference = {}
+    for _, g in games:
+        if g.result == "1-0 FF" or not g.belrating_white or not g.belrating_black:
+            continue
+        score = {"1-0": 1.0, "½-½": 0.5, "0-1": 0.0}[g.result]
+        for idbel, r, ro, s in [
+            (g.idbel_white, g.belrating_white, g.belrating_black, score),
+            (g.idbel_black, g.belrating_black, g.belrating_white, 1 - score),
+        ]:
+            exp = 1 / (1 + 10 ** ((ro - r) / 400))
+            t = reference.setdefault(idbel, [0, 0.0, 0.0])
+            t[0] += 1
+            t[1] += s
+            t[2] += 20 * (s - exp)
+    assert sorted(k[0] for k in totals) == sorted(reference)
+    for (idbel, rnd), (_, ngames, score, _, delta) in totals.items():
+        assert rnd == 0
+        assert ngames == reference[idbel][0]
+        assert score == pytest.approx(reference[idbel][1])
+        assert delta == pytest.approx(reference[idbel][2])
+
+
+def test_fide_junior_delta():
+    games = [(1, make_game(1, 2, 1800, 1800, "1-0", birthday="2010-05-05"))]
+    totals = player_totals(game_columns(games, True), True)
+    assert totals[(1, 1)][4] == pytest.approx(20.0)
+    assert totals[(2, 1)][4] == pytest.approx(-10.0)
+
+
+@patch("kbsb.interclubs.ratingchange.read_season_series")
+@pytest.mark.asyncio
+async def test_mgmt_getICratingchanges(
+    read_season_series: AsyncMock, tmp_path, monkeypatch
+):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "eloprocessing.csv").write_text(ELOCSV)
+    read_season_series.return_value = [make_series()]
+    changes = await mgmt_getICratingchanges(1, 2)
+    rows = {c.idbel: c for c in changes}
+    assert set(rows) == {101, 102, 201, 202}
+    assert rows[101].belgames == 2
+    assert rows[101].belscore == 1.0
+    assert rows[101].beldelta == -rows[201].beldelta
+    assert rows[101].fiderating == 1800
+
+
+@patch("kbsb.interclubs.ratingchange.published_rounds")
+@patch("kbsb.interclubs.ratingchange.read_season_series")
+@patch("kbsb.interclubs.ratingchange.read_player_series")
+@pytest.mark.asyncio
+async def test_anon_getICratingchange(
+    read_player_series: AsyncMock,
+    read_season_series: AsyncMock,
+    published_rounds,
+    tmp_path,
+    monkeypatch,
+):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "eloprocessing.csv").write_text(ELOCSV)
+    iccache.clear()
+    published_rounds.return_value = [1, 2]
+    read_player_series.side_effect = lambda rounds, idbel: [make_series()]
+    read_season_series.return_value = [make_series()]
+    changes = await anon_getICratingchange(101)
+    season = await mgmt_getICratingchanges(1, 2)
+    assert {c.idbel for c in changes} == {101}
+    assert sum(c.beldelta for c in changes) == pytest.approx(
+        sum(c.beldelta for c in season if c.idbel == 101), abs=0.02
+    )
+    # the result is cached until the results are saved
+    assert await anon_getICratingchange(101) == changes
+    assert read_player_series.call_count == 1
+    # an unknown player has no rating changes
+    assert await anon_getICratingchange(999) == []
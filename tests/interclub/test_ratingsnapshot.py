@@ -0,0 +1,107 @@
+import os
+from csv import DictReader
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+
+from kbsb.interclubs.ratingsnapshot import (
+    RatingSnapshot,
+    build_rating_snapshot,
+    load_rating_snapshot,
+    read_rating_csv,
+    snapshot_path,
+    tmp_snapshot_path,
+    write_rating_snapshot,
+)
+
+ROOT = Path(__file__).parents[2]
+
+ELOCSV = """idnumber,last_name,first_name,idfide,natfide,birthday,fullname,title,fiderating,gender,gender2,idclub,belrating
+202,Visit,Dora,2004,BEL,1993-01-01,,,1600,F,F,2,1550
+101,Home,Anna,0,BEL,1990-01-01,"Home, Anna",FM,,F,F,1,
+"""
+
+
+def test_snapshot_matches_csv():
+    elofile = ROOT / "data" / "eloprocessing.csv"
+    snapshot = RatingSnapshot(read_rating_csv(elofile))
+    with open(elofile) as f:
+        rows = list(DictReader(f))
+    assert len(snapshot) == len(rows)
+    assert np.all(np.diff(snapshot.idnumbers) > 0)
+    for r in rows:
+        row = snapshot[int(r["idnumber"])]
+        for k, v in r.items():
+            assert row[k] == (int(v or 0) if isinstance(row[k], int) else v)
+
+
+def test_snapshot_lookups():
+    snapshot = RatingSnapshot(
+        build_rating_snapshot(
+            [
+                {"idnumber": 30, "belrating": 1500, "last_name": "C"},
+                {"idnumber": 10, "belrating": 1700, "last_name": None},
+                {"idnumber": 20, "belrating": "", "last_name": "B"},
+            ]
+        )
+    )
+    assert list(snapshot.idnumbers) == [10, 20, 30]
+    assert snapshot[10]["last_name"] == ""
+    assert snapshot[20]["belrating"] == 0
+    assert 30 in snapshot
+    assert 40 not in snapshot
+    assert snapshot.get(5) is None
+    assert list(snapshot.positions([30, 5, 10, 99])) == [2, -1, 0, -1]
+    assert list(snapshot.column("belrating", [30, 99, 10])) == [1500, 0, 1700]
+    rows = snapshot.rows([20, 99])
+    assert rows[0]["last_name"] == "B" and rows[1] is None
+    assert len(RatingSnapshot(build_rating_snapshot([])).positions([1])) == 1
+
+
+def test_load_rating_snapshot(tmp_path):
+    elofile = tmp_path / "eloprocessing.csv"
+    elofile.write_text(ELOCSV)
+    snapshot = load_rating_snapshot(elofile)
+    assert snapshot_path(elofile).exists()
+    assert isinstance(snapshot.ratings.base, np.memmap)
+    assert snapshot[101]["title"] == "FM"
+    assert snapshot[101]["fiderating"] == 0
+    assert load_rating_snapshot(elofile) is snapshot
+    # a newer csv rebuilds the snapshot
+    elofile.write_text(ELOCSV.replace("1550", "1560"))
+    mtime = os.path.getmtime(snapshot_path(elofile)) + 10
+    os.utime(elofile, (mtime, mtime))
+    reloaded = load_rating_snapshot(elofile)
+    assert reloaded is not snapshot
+    assert reloaded[202]["belrating"] == 1560
+    # the snapshot is used without its csv
+    elofile.unlink()
+    assert load_rating_snapshot(elofile) is reloaded
+
+
+def test_load_rating_snapshot_readonly(tmp_path):
+    datadir = tmp_path / "data"
+    datadir.mkdir()
+    tmpdir = tmp_path / "tmp"
+    tmpdir.mkdir()
+    elofile = datadir / "eloprocessing.csv"
+    elofile.write_text(ELOCSV)
+
+    def readonly(ratings, path):
+        if Path(path).parent == datadir:
+            raise OSError(30, "Read-only file system")
+        return write_rating_snapshot(ratings, path)
+
+    with patch(
+        "kbsb.interclubs.ratingsnapshot.write_rating_snapshot", side_effect=readonly
+    ), patch("tempfile.gettempdir", return_value=str(tmpdir)):
+        snapshot = load_rating_snapshot(elofile)
+        assert not snapshot_path(elofile).exists()
+        assert tmp_snapshot_path(elofile).parent == tmpdir
+        assert tmp_snapshot_path(elofile).exists()
+        assert snapshot[101]["title"] == "FM"
+        # the snapshot in the temp dir is reused without reading the csv
+        with patch("kbsb.interclubs.ratingsnapshot.read_rating_csv") as read_csv:
+            assert load_rating_snapshot(elofile) is snapshot
+        read_csv.assert_not_called()
@@ -0,0 +1,56 @@
+import random
+
+from kbsb.interclubs import GAMERESULT, ICEncounter, ICGame
+from kbsb.interclubs.scoring import calc_points_bulk
+
+
+def reference_points(enc: ICEncounter):
+    # the board by board calculation the kernel replaces
+    bp2_home = bp2_visit = mp_home = mp_visit = 0
+    allfilled, forfeited = True, False
+    for g in enc.games:
+        result = g.overruled if g.overruled and g.overruled != "NOR" else g.result
+        if result in ["1-0", "1-0 FF"]:
+            bp2_home += 2
+        if result in ["0-1", "0-1 FF"]:
+            bp2_visit += 2
+        if result in ["½-½", "½-0"]:
+            bp2_home += 1
+        if result in ["½-½", "0-½"]:
+            bp2_visit += 1
+        forfeited = forfeited or result == "Team FF"
+        allfilled = allfilled and result != ""
+    if allfilled and not forfeited:
+        mp_home = 2 if bp2_home > bp2_visit else 1 if bp2_home == bp2_visit else 0
+        mp_visit = 2 - mp_home
+    return bp2_home, bp2_visit, mp_home, mp_visit, allfilled
+
+
+def test_calc_points_bulk_matches_reference():
+    rnd = random.Random(42)
+    results = list(GAMERESULT)
+    encounters = [
+        ICEncounter(
+            icclub_home=1,
+            icclub_visit=2,
+            pairingnr_home=1,
+            pairingnr_visit=2,
+            games=[
+                ICGame(
+                    result=rnd.choice(results[:1] + results[2:]),
+                    overruled=rnd.choice([None, "NOR", "NOR", "NOR"] + results),
+                )
+                for _ in range(rnd.choice([0, 4, 6, 8]))
+            ],
+        )
+        for _ in range(500)
+    ]
+    calc_points_bulk(encounters)
+    for enc in encounters:
+        assert (
+            enc.boardpoint2_home,
+            enc.boardpoint2_visit,
+            enc.matchpoint_home,
+            enc.matchpoint_visit,
+            enc.played,
+        ) == reference_points(enc)
@@ -1,13 +1,25 @@
 import pytest
+from datetime import datetime, timedelta
 from unittest.mock import AsyncMock, patch, MagicMock
 from fastapi.testclient import TestClient
 from fastapi.encoders import jsonable_encoder
 
 from kbsb.main import app
-from kbsb.interclubs import ICGame
-from kbsb.interclubs.series import mgmt_saveICresults, clb_saveICresults, calc_points
+from kbsb.interclubs import ICGame, iccache
+from kbsb.interclubs.series import (
+    anon_getICencounterdetails,
+    anon_getICseries,
+    calc_points,
+    clb_saveICplanning,
+    clb_saveICresults,
+    mgmt_saveICresults,
+)
 
 
+@patch("kbsb.interclubs.series.mark_standings")
+@patch("kbsb.interclubs.series.update_played_players")
+@patch("kbsb.interclubs.series.save_violations")
+@patch("kbsb.interclubs.series.publish_series")
 @patch("kbsb.interclubs.series.calc_points")
 @patch("kbsb.interclubs.series.DbICStandings")
 @patch("kbsb.interclubs.series.DbICSeries")
@@ -16,6 +28,10 @@ async def test_mgmt_saveICresults(
     dbSeries: MagicMock,
     dbStandings: MagicMock,
     calc_points: MagicMock,
+    publish_series: AsyncMock,
+    save_violations: AsyncMock,
+    update_played_players: AsyncMock,
+    mark_standings: AsyncMock,
     ic_result_item_factory,
     ic_series_factory,
     ic_game_factory,
@@ -43,12 +59,16 @@ async def test_mgmt_saveICresults(
     dbStandings.update = AsyncMock()
     await mgmt_saveICresults([resultitem1])
     dbSeries.update.assert_awaited()
-    round = dbSeries.update.call_args[0][1]["rounds"][0]
-    game = round["encounters"][0]["games"][0]
+    encounter = dbSeries.update.call_args[0][1]["rounds.0.encounters.0"]
+    game = encounter["games"][0]
     assert game["result"] == "1-0"
     assert game["overruled"] is None
 
 
+@patch("kbsb.interclubs.series.mark_standings")
+@patch("kbsb.interclubs.series.update_played_players")
+@patch("kbsb.interclubs.series.save_violations")
+@patch("kbsb.interclubs.series.publish_series")
 @patch("kbsb.interclubs.series.calc_points")
 @patch("kbsb.interclubs.series.DbICStandings")
 @patch("kbsb.interclubs.series.DbICSeries")
@@ -57,6 +77,10 @@ async def test_mgmt_saveICresults_overrule(
     dbSeries: MagicMock,
     dbStandings: MagicMock,
     calc_points: MagicMock,
+    publish_series: AsyncMock,
+    save_violations: AsyncMock,
+    update_played_players: AsyncMock,
+    mark_standings: AsyncMock,
     ic_result_item_factory,
     ic_series_factory,
     ic_game_factory,
@@ -84,12 +108,16 @@ async def test_mgmt_saveICresults_overrule(
     dbStandings.update = AsyncMock()
     await mgmt_saveICresults([resultitem1])
     dbSeries.update.assert_awaited()
-    round = dbSeries.update.call_args[0][1]["rounds"][0]
-    game = round["encounters"][0]["games"][0]
+    encounter = dbSeries.update.call_args[0][1]["rounds.0.encounters.0"]
+    game = encounter["games"][0]
     assert game["result"] == "1-0"
     assert game["overruled"] == "0-1"
 
 
+@patch("kbsb.interclubs.series.mark_standings")
+@patch("kbsb.interclubs.series.update_played_players")
+@patch("kbsb.interclubs.series.save_violations")
+@patch("kbsb.interclubs.series.publish_series")
 @patch("kbsb.interclubs.series.calc_points")
 @patch("kbsb.interclubs.series.DbICStandings")
 @patch("kbsb.interclubs.series.DbICSeries")
@@ -98,6 +126,10 @@ async def test_clb_saveICresults(
     dbSeries: MagicMock,
     dbStandings: MagicMock,
     calc_points: MagicMock,
+    publish_series: AsyncMock,
+    save_violations: AsyncMock,
+    update_played_players: AsyncMock,
+    mark_standings: AsyncMock,
     ic_result_item_factory,
     ic_series_factory,
     ic_game_factory,
@@ -125,12 +157,16 @@ async def test_clb_saveICresults(
     dbStandings.update = AsyncMock()
     await clb_saveICresults([resultitem1])
     dbSeries.update.assert_awaited()
-    round = dbSeries.update.call_args[0][1]["rounds"][0]
-    game = round["encounters"][0]["games"][0]
+    encounter = dbSeries.update.call_args[0][1]["rounds.0.encounters.0"]
+    game = encounter["games"][0]
     assert game["result"] == "1-0"
     assert game["overruled"] is None
 
 
+@patch("kbsb.interclubs.series.mark_standings")
+@patch("kbsb.interclubs.series.update_played_players")
+@patch("kbsb.interclubs.series.save_violations")
+@patch("kbsb.interclubs.series.publish_series")
 @patch("kbsb.interclubs.series.calc_points")
 @patch("kbsb.interclubs.series.DbICStandings")
 @patch("kbsb.interclubs.series.DbICSeries")
@@ -139,6 +175,10 @@ async def test_clb_saveICresults_overrule(
     dbSeries: MagicMock,
     dbStandings: MagicMock,
     calc_points: MagicMock,
+    publish_series: AsyncMock,
+    save_violations: AsyncMock,
+    update_played_players: AsyncMock,
+    mark_standings: AsyncMock,
     ic_result_item_factory,
     ic_series_factory,
     ic_game_factory,
@@ -166,12 +206,63 @@ async def test_clb_saveICresults_overrule(
     dbStandings.update = AsyncMock()
     await clb_saveICresults([resultitem1])
     dbSeries.update.assert_awaited()
-    round = dbSeries.update.call_args[0][1]["rounds"][0]
-    game = round["encounters"][0]["games"][0]
+    encounter = dbSeries.update.call_args[0][1]["rounds.0.encounters.0"]
+    game = encounter["games"][0]
     assert game["result"] == "1-0"
     assert game["overruled"] is None
 
 
+@patch("kbsb.interclubs.series.mark_standings")
+@patch("kbsb.interclubs.series.update_played_players")
+@patch("kbsb.interclubs.series.save_violations")
+@patch("kbsb.interclubs.series.publish_series")
+@patch("kbsb.interclubs.series.calc_points")
+@patch("kbsb.interclubs.series.DbICStandings")
+@patch("kbsb.interclubs.series.DbICSeries")
+@pytest.mark.asyncio
+async def test_clb_saveICresults_keeps_overrule(
+    dbSeries: MagicMock,
+    dbStandings: MagicMock,
+    calc_points: MagicMock,
+    publish_series: AsyncMock,
+    save_violations: AsyncMock,
+    update_played_players: AsyncMock,
+    mark_standings: AsyncMock,
+    ic_result_item_factory,
+    ic_series_factory,
+    ic_game_factory,
+    ic_encounter_factory,
+    ic_round_factory,
+    ic_standings_db_factory,
+):
+    game1 = ic_game_factory.build(result="1-0", overruled="0-1")
+    encounter1 = ic_encounter_factory.build(games=[game1])
+    round1 = ic_round_factory.build(encounters=[encounter1])
+    series1 = ic_series_factory.build(rounds=[round1])
+    dbSeries.find_single = AsyncMock(return_value=series1)
+    updategame1 = game1.model_copy()
+    updategame1.result = "½-½"
+    updategame1.overruled = None
+    updategame2 = ic_game_factory.build(result="1-0", overruled="0-1")
+    resultitem1 = ic_result_item_factory.build(
+        games=[updategame1, updategame2],
+        round=round1.round,
+        icclub_home=encounter1.icclub_home,
+        icclub_visit=encounter1.icclub_visit,
+        pairingnr_home=encounter1.pairingnr_home,
+        pairingnr_visit=encounter1.pairingnr_visit,
+    )
+    dbSeries.update = AsyncMock()
+    dbStandings.find_single = AsyncMock(return_value=ic_standings_db_factory.build())
+    dbStandings.update = AsyncMock()
+    await clb_saveICresults([resultitem1])
+    encounter = dbSeries.update.call_args[0][1]["rounds.0.encounters.0"]
+    games = encounter["games"]
+    assert games[0]["result"] == "½-½"
+    assert games[0]["overruled"] == "0-1"
+    assert games[1]["overruled"] == "NOR"
+
+
 def test_calc_points(ic_encounter_factory, ic_game_factory):
     game1 = ic_game_factory.build(result="1-0", overruled=None)
     game2 = ic_game_factory.build(result="½-½", overruled=None)
@@ -206,3 +297,236 @@ def test_calc_points_overrule(ic_encounter_factory, ic_game_factory):
     assert encounter1.boardpoint2_visit == 2
     assert encounter1.matchpoint_home == 1
     assert encounter1.matchpoint_visit == 1
+
+
+@patch("kbsb.interclubs.series.clb_validateICplanning")
+@patch("kbsb.interclubs.series.publish_series")
+@patch("kbsb.interclubs.series.DbICSeries")
+@pytest.mark.asyncio
+async def test_clb_saveICplanning(
+    dbSeries: MagicMock,
+    publish_series: AsyncMock,
+    clb_validateICplanning: AsyncMock,
+    ic_planning_item_factory,
+    ic_series_factory,
+    ic_game_factory,
+    ic_encounter_factory,
+    ic_round_factory,
+):
+    encounter0 = ic_encounter_factory.build(icclub_home=101, icclub_visit=102)
+    encounter1 = ic_encounter_factory.build(icclub_home=103, icclub_visit=104, games=[])
+    round1 = ic_round_factory.build(encounters=[encounter0, encounter1])
+    round2 = ic_round_factory.build(round=round1.round + 1)
+    series1 = ic_series_factory.build(rounds=[round1, round2])
+    dbSeries.find_single = AsyncMock(return_value=series1)
+    dbSeries.update = AsyncMock()
+    plan = ic_planning_item_factory.build(
+        round=round1.round,
+        idclub=103,
+        playinghome=True,
+        games=[ic_game_factory.build(idnumber_home=45608)],
+    )
+    await clb_saveICplanning([plan])
+    update = dbSeries.update.call_args[0][1]
+    assert list(update.keys()) == ["rounds.0.encounters.1"]
+    assert update["rounds.0.encounters.1"]["games"][0]["idnumber_home"] == 45608
+    publish_series.assert_awaited_once_with(series1, {round1.round})
+    clb_validateICplanning.assert_awaited_once_with([plan])
+
+
+@patch("kbsb.interclubs.series.mark_standings")
+@patch("kbsb.interclubs.series.update_played_players")
+@patch("kbsb.interclubs.series.save_violations")
+@patch("kbsb.interclubs.series.publish_series")
+@patch("kbsb.interclubs.series.DbICStandings")
+@patch("kbsb.interclubs.series.DbICSeries")
+@pytest.mark.asyncio
+async def test_clb_saveICresults_grouped(
+    dbSeries: MagicMock,
+    dbStandings: MagicMock,
+    publish_series: AsyncMock,
+    save_violations: AsyncMock,
+    update_played_players: AsyncMock,
+    mark_standings: AsyncMock,
+    ic_result_item_factory,
+    ic_series_factory,
+    ic_game_factory,
+    ic_encounter_factory,
+    ic_round_factory,
+    ic_standings_db_factory,
+):
+    encounter0 = ic_encounter_factory.build(icclub_home=101, icclub_visit=102)
+    encounter1 = ic_encounter_factory.build(icclub_home=103, icclub_visit=104)
+    round1 = ic_round_factory.build(encounters=[encounter0, encounter1])
+    series1 = ic_series_factory.build(rounds=[round1])
+    dbSeries.find_single = AsyncMock(return_value=series1)
+    dbSeries.update = AsyncMock()
+    dbStandings.find_single = AsyncMock(return_value=ic_standings_db_factory.build())
+    dbStandings.add = AsyncMock()
+    dbStandings.update = AsyncMock()
+    results = [
+        ic_result_item_factory.build(
+            division=series1.division,
+            index=series1.index,
+            round=round1.round,
+            icclub_home=enc.icclub_home,
+            icclub_visit=enc.icclub_visit,
+            games=[ic_game_factory.build(result="1-0")],
+        )
+        for enc in (encounter0, encounter1)
+    ]
+    await clb_saveICresults(results)
+    dbSeries.find_single.assert_awaited_once()
+    dbSeries.update.assert_awaited_once()
+    update = dbSeries.update.call_args[0][1]
+    assert sorted(update.keys()) == ["rounds.0.encounters.0", "rounds.0.encounters.1"]
+    changes = save_violations.call_args[0][1]
+    assert [enc.icclub_home for _, enc in changes] == [101, 103]
+    assert update_played_players.call_args[0][1] == changes
+    pnrs = {
+        pnr
+        for enc in (encounter0, encounter1)
+        for pnr in (enc.pairingnr_home, enc.pairingnr_visit)
+    }
+    for ix, t in enumerate(series1.teams):
+        assert (f"teams.{ix}.playersplayed" in update) == (t.pairingnumber in pnrs)
+
+
+@patch("kbsb.interclubs.series.enqueue_standings")
+@patch("kbsb.interclubs.series.mark_standings")
+@patch("kbsb.interclubs.series.update_played_players")
+@patch("kbsb.interclubs.series.save_violations")
+@patch("kbsb.interclubs.series.publish_series")
+@patch("kbsb.interclubs.series.DbICSeries")
+@pytest.mark.asyncio
+async def test_clb_saveICresults_marks_before_side_effects(
+    dbSeries: MagicMock,
+    publish_series: AsyncMock,
+    save_violations: AsyncMock,
+    update_played_players: AsyncMock,
+    mark_standings: AsyncMock,
+    enqueue_standings: MagicMock,
+    ic_result_item_factory,
+    ic_series_factory,
+    ic_game_factory,
+    ic_encounter_factory,
+    ic_round_factory,
+):
+    encounter0 = ic_encounter_factory.build(icclub_home=101, icclub_visit=102)
+    round1 = ic_round_factory.build(encounters=[encounter0])
+    series1 = ic_series_factory.build(rounds=[round1])
+    dbSeries.find_single = AsyncMock(return_value=series1)
+    dbSeries.update = AsyncMock()
+    update_played_players.side_effect = RuntimeError("index down")
+    result = ic_result_item_factory.build(
+        division=series1.division,
+        index=series1.index,
+        round=round1.round,
+        icclub_home=101,
+        icclub_visit=102,
+        games=[ic_game_factory.build(result="1-0")],
+    )
+    with pytest.raises(RuntimeError):
+        await clb_saveICresults([result])
+    dbSeries.update.assert_awaited_once()
+    mark_standings.assert_awaited_once_with(series1.division, series1.index)
+    enqueue_standings.assert_called_once()
+
+
+class AsyncCursor:
+    def __init__(self, docs):
+        self.docs = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+@patch("kbsb.interclubs.series.get_mongodb")
+@pytest.mark.asyncio
+async def test_anon_getICencounterdetails(
+    get_mongodb: MagicMock,
+    ic_encounter_factory,
+    ic_game_factory,
+):
+    iccache.clear()
+    encounters = [
+        ic_encounter_factory.build(
+            icclub_home=100 + ix,
+            icclub_visit=200 + ix,
+            pairingnr_home=ix,
+            pairingnr_visit=ix + 6,
+            games=[ic_game_factory.build(idnumber_home=ix, idnumber_visit=10 + ix)],
+        ).model_dump()
+        for ix in range(1, 7)
+    ]
+    seriesdoc = {
+        "division": 1,
+        "index": "",
+        "rounds": [{"round": 1, "rdate": "", "encounters": encounters}],
+    }
+    clubdocs = [
+        {
+            "idclub": idclub,
+            "players": [
+                {
+                    "idnumber": idnumber,
+                    "first_name": "Jan",
+                    "last_name": f"Player{idnumber}",
+                    "assignedrating": 1500 + idnumber,
+                    # players transferred out keep their played games
+                    "nature": "confirmedout" if idnumber == 3 else "assigned",
+                }
+            ],
+        }
+        for ix in range(1, 7)
+        for idclub, idnumber in [(100 + ix, ix), (200 + ix, 10 + ix)]
+    ]
+    series = MagicMock()
+    series.find = MagicMock(return_value=AsyncCursor([seriesdoc]))
+    clubs = MagicMock()
+    clubs.find = MagicMock(return_value=AsyncCursor(clubdocs))
+    get_mongodb.return_value = {
+        "interclub2324series": series,
+        "interclub2324club": clubs,
+    }
+    details = await anon_getICencounterdetails(1, "", 1, 103, 203, 3, 9)
+    assert len(details) == 1
+    assert details[0].fullname_home == "Player3, Jan"
+    assert details[0].rating_visit == 1513
+    await anon_getICencounterdetails(1, "", 1, 104, 204, 4, 10)
+    series.find.assert_called_once()
+    clubs.find.assert_called_once()
+    assert len(clubs.find.call_args[0][0]["idclub"]["$in"]) == 12
+
+
+@patch("kbsb.interclubs.series.embargo_time")
+@patch("kbsb.interclubs.series.get_mongodb")
+@pytest.mark.asyncio
+async def test_anon_getICseries_embargo_not_cached(
+    get_mongodb: MagicMock,
+    embargo_time: MagicMock,
+    ic_series_factory,
+    ic_round_factory,
+    ic_encounter_factory,
+    ic_game_factory,
+):
+    iccache.clear()
+    encounter = ic_encounter_factory.build(games=[ic_game_factory.build()])
+    series = ic_series_factory.build(
+        rounds=[ic_round_factory.build(round=1, encounters=[encounter])]
+    )
+    coll = MagicMock()
+    coll.find = MagicMock(side_effect=lambda *a: AsyncCursor([series.model_dump()]))
+    get_mongodb.return_value = {"interclub2324series": coll}
+    embargo_time.return_value = datetime.now() + timedelta(hours=1)
+    embargoed = await anon_getICseries(0, 1)
+    assert embargoed[0].rounds[0].encounters[0].games == []
+    embargo_time.return_value = datetime.now() - timedelta(hours=1)
+    public = await anon_getICseries(0, 1)
+    assert len(public[0].rounds[0].encounters[0].games) == 1
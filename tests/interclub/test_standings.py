@@ -0,0 +1,197 @@
+import pytest
+from unittest.mock import AsyncMock, patch, MagicMock
+
+from kbsb.interclubs import ICEncounter, ICGame, ICRound, ICSeries, ICTeam
+from kbsb.interclubs.series import calc_points
+from kbsb.interclubs.standings import (
+    apply_encounter,
+    compute_standings,
+    enqueue_standings,
+    get_standingsworker_stats,
+    new_standings,
+    pending,
+    process_pending,
+    update_standings,
+)
+
+
+def make_series(nteams: int = 4) -> ICSeries:
+    teams = [
+        ICTeam(
+            division=4,
+            titular=[],
+            idclub=100 + ix,
+            index="A",
+            name=f"Club {ix}",
+            pairingnumber=ix,
+            playersplayed=[],
+        )
+        for ix in range(1, nteams + 1)
+    ]
+    # circle method round robin
+    pnrs = list(range(1, nteams + 1))
+    rounds = []
+    for rnd in range(1, nteams):
+        encounters = []
+        for ix in range(nteams // 2):
+            home, visit = pnrs[ix], pnrs[nteams - 1 - ix]
+            encounters.append(
+                ICEncounter(
+                    icclub_home=100 + home,
+                    icclub_visit=100 + visit,
+                    pairingnr_home=home,
+                    pairingnr_visit=visit,
+                )
+            )
+        rounds.append(ICRound(round=rnd, rdate="", encounters=encounters))
+        pnrs = [pnrs[0], pnrs[-1]] + pnrs[1:-1]
+    return ICSeries(division=4, index="A", teams=teams, rounds=rounds)
+
+
+def play(enc: ICEncounter, results: list) -> None:
+    enc.games = [ICGame(idnumber_home=1, idnumber_visit=2, result=r) for r in results]
+    calc_points(enc)
+
+
+def test_apply_encounter_matches_full_recompute():
+    series = make_series()
+    incremental = new_standings(series)
+    for r in series.rounds:
+        for enc in r.encounters:
+            old = enc.model_copy(deep=True)
+            play(enc, ["1-0", "½-½", "0-1", "1-0"])
+            apply_encounter(incremental, r.round, old, enc)
+    full = compute_standings(series, new_standings(series))
+    rows = {t.pairingnumber: t for t in incremental.teams}
+    for t in full.teams:
+        assert rows[t.pairingnumber].matchpoints == t.matchpoints
+        assert rows[t.pairingnumber].boardpoints == t.boardpoints
+
+
+def test_apply_encounter_correction():
+    series = make_series()
+    standings = new_standings(series)
+    enc = series.rounds[0].encounters[0]
+    old = enc.model_copy(deep=True)
+    play(enc, ["1-0", "1-0", "1-0", "1-0"])
+    apply_encounter(standings, 1, old, enc)
+    old = enc.model_copy(deep=True)
+    play(enc, ["0-1", "½-½", "½-½", "½-½"])
+    teamixs = apply_encounter(standings, 1, old, enc)
+    assert len(teamixs) == 2
+    rows = {t.pairingnumber: t for t in standings.teams}
+    home = rows[enc.pairingnr_home]
+    visit = rows[enc.pairingnr_visit]
+    assert home.matchpoints == 0
+    assert home.boardpoints == 1.5
+    assert visit.matchpoints == 2
+    assert visit.boardpoints == 2.5
+    assert len(home.games) == 1
+
+
+def test_apply_encounter_unchanged():
+    series = make_series()
+    standings = new_standings(series)
+    enc = series.rounds[0].encounters[0]
+    play(enc, ["1-0", "1-0", "1-0", "1-0"])
+    apply_encounter(standings, 1, None, enc)
+    assert apply_encounter(standings, 1, enc.model_copy(deep=True), enc) == []
+
+
+@patch("kbsb.interclubs.standings.get_mongodb")
+@patch("kbsb.interclubs.standings.DbICStandings")
+@pytest.mark.asyncio
+async def test_update_standings_writes_two_rows(
+    dbStandings: MagicMock, get_mongodb: MagicMock
+):
+    series = make_series()
+    standings = new_standings(series)
+    # the stored order differs from the pairing order
+    standings.teams.reverse()
+    dbStandings.find_single = AsyncMock(return_value=standings)
+    coll = MagicMock()
+    coll.update_one = AsyncMock()
+    get_mongodb.return_value = {dbStandings.COLLECTION: coll}
+    enc = series.rounds[0].encounters[0]
+    old = enc.model_copy(deep=True)
+    play(enc, ["1-0", "1-0", "½-½", "0-1"])
+    await update_standings(series, [(1, old, enc)])
+    coll.update_one.assert_awaited_once()
+    args, kwargs = coll.update_one.call_args
+    rows = args[1]["$set"]
+    assert sorted(rows.keys()) == ["teams.$[t1]", "teams.$[t4]"]
+    assert rows["teams.$[t1]"]["pairingnumber"] == 1
+    assert rows["teams.$[t4]"]["pairingnumber"] == 4
+    assert sorted(kwargs["array_filters"], key=str) == [
+        {"t1.pairingnumber": 1},
+        {"t4.pairingnumber": 4},
+    ]
+
+
+@patch("kbsb.interclubs.standings.clear_standings_marks")
+@patch("kbsb.interclubs.standings.read_standings_marks")
+@patch("kbsb.interclubs.standings.update_standings")
+@pytest.mark.asyncio
+async def test_standings_worker_merges_changes(
+    update_standings: AsyncMock,
+    read_standings_marks: AsyncMock,
+    clear_standings_marks: AsyncMock,
+):
+    pending.clear()
+    read_standings_marks.return_value = ["m1", "m2"]
+    series = make_series()
+    enc = series.rounds[0].encounters[0]
+    first = enc.model_copy(deep=True)
+    play(enc, ["1-0", "1-0", "1-0", "1-0"])
+    enqueue_standings(
+        4, "A", [(1, first, enc.model_copy(deep=True))], series=series, mark="m1"
+    )
+    second = enc.model_copy(deep=True)
+    play(enc, ["0-1", "0-1", "0-1", "0-1"])
+    enqueue_standings(4, "A", [(1, second, enc)], series=series, mark="m2")
+    assert get_standingsworker_stats().queuedepth == 1
+    await process_pending()
+    update_standings.assert_not_awaited()
+    await process_pending(force=True)
+    update_standings.assert_awaited_once()
+    changes = update_standings.call_args[0][1]
+    assert len(changes) == 1
+    assert changes[0][1] is first
+    assert changes[0][2].matchpoint_visit == 2
+    assert not pending
+    assert get_standingsworker_stats().processed >= 1
+    assert clear_standings_marks.call_args[0][2] == {"m1", "m2"}
+
+
+@patch("kbsb.interclubs.standings.clear_standings_marks")
+@patch("kbsb.interclubs.standings.read_standings_marks")
+@patch("kbsb.interclubs.standings.calc_standings")
+@patch("kbsb.interclubs.standings.update_standings")
+@patch("kbsb.interclubs.standings.DbICSeries")
+@pytest.mark.asyncio
+async def test_standings_worker_dirty(
+    dbSeries: MagicMock,
+    update_standings: AsyncMock,
+    calc_standings: AsyncMock,
+    read_standings_marks: AsyncMock,
+    clear_standings_marks: AsyncMock,
+):
+    pending.clear()
+    series = make_series()
+    dbSeries.find_single = AsyncMock(return_value=series)
+    enc = series.rounds[0].encounters[0]
+    old = enc.model_copy(deep=True)
+    play(enc, ["1-0", "1-0", "1-0", "1-0"])
+    # a mark of a change lost elsewhere forces a full recalculation
+    read_standings_marks.return_value = ["lost", "m1"]
+    enqueue_standings(4, "A", [(1, old, enc)], series=series, mark="m1")
+    await process_pending(force=True)
+    update_standings.assert_not_awaited()
+    calc_standings.assert_awaited_once_with(series)
+    assert clear_standings_marks.call_args[0][2] == {"lost", "m1"}
+    # a failing worker leaves the marks, the standings stay dirty
+    clear_standings_marks.reset_mock()
+    calc_standings.side_effect = Exception("boom")
+    enqueue_standings(4, "A", full=True)
+    await process_pending(force=True)
+    clear_standings_marks.assert_not_awaited()
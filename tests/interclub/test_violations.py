@@ -0,0 +1,144 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from pymongo import DeleteMany, InsertOne
+
+from kbsb.interclubs.violations import (
+    affected_encounters,
+    failedchanges,
+    mgmt_getICviolations,
+    save_violations,
+    update_violations,
+)
+from kbsb.interclubs.playedplayers import PlayedIndex
+
+from tests.interclub.test_penalties import make_context, play
+from tests.interclub.test_series import AsyncCursor
+
+
+@patch("kbsb.interclubs.violations.read_played_players")
+@patch("kbsb.interclubs.violations.get_mongodb")
+@patch("kbsb.interclubs.violations.DbICClub")
+@pytest.mark.asyncio
+async def test_update_violations(
+    dbClub: MagicMock, get_mongodb: MagicMock, read_played_players: AsyncMock
+):
+    ctx, series = make_context()
+    dbClub.find_multiple = AsyncMock(return_value=ctx.allclubs)
+    read_played_players.return_value = PlayedIndex.from_series([series])
+    coll = MagicMock(bulk_write=AsyncMock())
+    get_mongodb.return_value = {"interclub2324violation": coll}
+    enc2 = series.rounds[1].encounters[0]
+    written = await update_violations(series, [(2, enc2)])
+    read_played_players.assert_awaited_once_with(4, "A")
+    # only the clubs of the encounter are read
+    filter = dbClub.find_multiple.call_args[0][0]
+    assert sorted(filter["idclub"]["$in"]) == [101, 103]
+    ops = coll.bulk_write.call_args[0][0]
+    assert ops[0] == DeleteMany(
+        {
+            "round": 2,
+            "division": 4,
+            "index": "A",
+            "pairingnr_home": 1,
+            "pairingnr_visit": 3,
+        }
+    )
+    docs = [op._doc for op in ops[1:]]
+    assert all(isinstance(op, InsertOne) for op in ops[1:])
+    assert written == len(docs)
+    assert {(d["pairingnr_home"], d["pairingnr_visit"]) for d in docs} == {(1, 3)}
+    reasons = {(d["rule"], d["reason"], d["idclub"]) for d in docs}
+    assert ("forfeits", "forfait away", 103) in reasons
+    assert ("player order", "rating order not correct", 101) in reasons
+    assert (
+        "titulars",
+        "Titular played in wrong team in the series",
+        103,
+    ) in reasons
+
+
+@patch("kbsb.interclubs.violations.update_violations")
+@pytest.mark.asyncio
+async def test_save_violations_retries_failed(update_violations: AsyncMock):
+    ctx, series = make_context()
+    enc1 = series.rounds[0].encounters[0]
+    enc2 = series.rounds[1].encounters[0]
+    update_violations.side_effect = RuntimeError("bulk write failed")
+    await save_violations(series, [(1, enc1)])
+    assert (series.division, series.index) in failedchanges
+    update_violations.side_effect = None
+    await save_violations(series, [(2, enc2)])
+    assert update_violations.call_args[0][1] == [(1, enc1), (2, enc2)]
+    assert (series.division, series.index) not in failedchanges
+
+
+@patch("kbsb.interclubs.violations.read_played_players")
+@patch("kbsb.interclubs.violations.get_mongodb")
+@patch("kbsb.interclubs.violations.DbICClub")
+@pytest.mark.asyncio
+async def test_update_violations_index_not_built(
+    dbClub: MagicMock, get_mongodb: MagicMock, read_played_players: AsyncMock
+):
+    ctx, series = make_context(3, double=True)
+    dbClub.find_multiple = AsyncMock(return_value=ctx.allclubs)
+    coll = MagicMock(bulk_write=AsyncMock())
+    get_mongodb.return_value = {"interclub2324violation": coll}
+    read_played_players.return_value = PlayedIndex()
+    # player 41 played for pairing number 4 in round 1
+    enc3 = [
+        e
+        for e in series.rounds[2].encounters
+        if 1 in (e.pairingnr_home, e.pairingnr_visit)
+    ][0]
+    side = "home" if enc3.pairingnr_home == 1 else "visit"
+    play(enc3, [(41, 21, "1-0")] if side == "home" else [(21, 41, "0-1")])
+    await update_violations(series, [(3, enc3)])
+    docs = [
+        op._doc for op in coll.bulk_write.call_args[0][0] if isinstance(op, InsertOne)
+    ]
+    assert "player 41 already played in other team of series" in {
+        d["reason"] for d in docs
+    }
+
+
+def test_affected_encounters():
+    ctx, series = make_context()
+    enc1 = series.rounds[0].encounters[0]
+    assert affected_encounters(series, [(1, enc1)]) == {(1, 1, 4)}
+    ctx, series = make_context(double=True)
+    keys = affected_encounters(series, [(1, enc1)])
+    later = {
+        (rd.round, e.pairingnr_home, e.pairingnr_visit)
+        for rd in series.rounds[1:]
+        for e in rd.encounters
+        if {e.pairingnr_home, e.pairingnr_visit} & {1, 4}
+    }
+    assert keys == {(1, 1, 4)} | later
+
+
+@patch("kbsb.interclubs.violations.get_mongodb")
+@pytest.mark.asyncio
+async def test_mgmt_getICviolations(get_mongodb: MagicMock):
+    doc = {
+        "boardnumber": 1,
+        "division": 4,
+        "guilty": "Club 3",
+        "idclub": 103,
+        "index": "A",
+        "opponent": "Club 1",
+        "pairingnr": 3,
+        "pairingnr_home": 1,
+        "pairingnr_visit": 3,
+        "reason": "forfait away",
+        "round": 2,
+        "rule": "forfeits",
+    }
+    coll = MagicMock()
+    coll.find = MagicMock(return_value=AsyncCursor([doc]))
+    get_mongodb.return_value = {"interclub2324violation": coll}
+    violations = await mgmt_getICviolations(round=2, idclub=103)
+    assert coll.find.call_args[0][0] == {"round": 2, "idclub": 103}
+    assert violations[0].reason == "forfait away"
+    await mgmt_getICviolations(division=4, index="A")
+    assert coll.find.call_args[0][0] == {"division": 4, "index": "A"}
@@ -26,3 +26,25 @@ def test_anon_getfidemember(anon_getmember: AsyncMock, anon_member_factory):
     assert resp.status_code == 200
     assert "birthyear" in reply
     anon_getmember.assert_awaited()
+
+
+@patch("kbsb.member.api_member.anon_getmembers")
+def test_anon_getmembers(anon_getmembers: AsyncMock, anon_member_factory):
+    client = TestClient(app)
+    anon_getmembers.return_value = anon_member_factory.batch(2)
+    resp = client.get("/api/v1/member/anon/members?idnumber=123&idnumber=456")
+    assert resp.status_code == 200
+    assert len(resp.json()) == 2
+    anon_getmembers.assert_awaited_with([123, 456])
+
+
+@patch("kbsb.member.api_member.anon_getratinghistory")
+def test_anon_getratinghistory(anon_getratinghistory: AsyncMock):
+    from kbsb.member import RatingHistory
+
+    client = TestClient(app)
+    anon_getratinghistory.return_value = RatingHistory(idnumber=123)
+    resp = client.get("/api/v1/member/anon/ratinghistory/123")
+    assert resp.status_code == 200
+    assert resp.json() == {"idnumber": 123, "ratings": []}
+    anon_getratinghistory.assert_awaited_with(123)
@@ -0,0 +1,111 @@
+import pytest
+from unittest.mock import MagicMock, patch
+
+from reddevil.core import RdNotFound
+
+from kbsb.member import OldUserPasswordValidator, membercache
+from kbsb.member.mysql_member import (
+    mysql_anon_belid_from_fideid,
+    mysql_anon_getclubmembers,
+    mysql_anon_getmember,
+    mysql_anon_getmembers,
+    mysql_old_userpassword,
+)
+
+from tests.member.test_mysql_executor import member_row
+
+
+def mock_connection(get_mysql: MagicMock, rows: dict) -> list:
+    """
+    a connection returning the rows of the queried idnumbers
+    returns the list of executed queries
+    """
+    queries = []
+
+    def connection():
+        cursor = MagicMock()
+
+        def execute(query, params=None):
+            queries.append(params)
+
+        def fetch():
+            params = queries[-1]
+            ids = params if isinstance(params, tuple) else list(params.values())
+            return [rows[i] for i in ids if i in rows]
+
+        cursor.execute.side_effect = execute
+        cursor.fetchone.side_effect = lambda: (fetch() or [None])[0]
+        cursor.fetchall.side_effect = fetch
+        return MagicMock(cursor=MagicMock(return_value=cursor))
+
+    get_mysql.side_effect = connection
+    return queries
+
+
+@patch("kbsb.member.mysql_member.get_elotable")
+@patch("kbsb.member.mysql_member.get_mysql")
+@pytest.mark.asyncio
+async def test_anon_getmember_cached(get_mysql, get_elotable):
+    membercache.clear()
+    get_elotable.return_value = "p_player202401"
+    queries = mock_connection(get_mysql, {45608: member_row(45608)})
+    m1 = await mysql_anon_getmember(45608)
+    m2 = await mysql_anon_getmember(45608)
+    assert m1.birthyear == m2.birthyear == 1965
+    assert len(queries) == 1
+    # unknown ids are cached too
+    for _ in range(2):
+        with pytest.raises(RdNotFound):
+            await mysql_anon_getmember(1)
+    assert len(queries) == 2
+    # a new rating quarter is read again
+    get_elotable.return_value = "p_player202404"
+    await mysql_anon_getmember(45608)
+    assert len(queries) == 3
+    stats = membercache.stats()
+    assert stats["hits"] >= 2 and stats["size"] == 3
+
+
+@patch("kbsb.member.mysql_member.get_elotable")
+@patch("kbsb.member.mysql_member.get_mysql")
+@pytest.mark.asyncio
+async def test_anon_getmembers_cached(get_mysql, get_elotable):
+    membercache.clear()
+    get_elotable.return_value = "p_player202401"
+    rows = {idn: member_row(idn) for idn in (1, 2, 3)}
+    queries = mock_connection(get_mysql, rows)
+    await mysql_anon_getmember(1)
+    members = await mysql_anon_getmembers([1, 2, 3, 4])
+    assert [m.idnumber for m in members] == [1, 2, 3]
+    # only the missing idnumbers are queried
+    assert queries[-1] == (2, 3, 4)
+    await mysql_anon_getmembers([3, 4])
+    assert len(queries) == 2
+
+
+@patch("kbsb.member.mysql_member.get_elotable")
+@patch("kbsb.member.mysql_member.get_mysql")
+@pytest.mark.asyncio
+async def test_warmup_and_invalidation(get_mysql, get_elotable):
+    membercache.clear()
+    get_elotable.return_value = "p_player202401"
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [member_row(45608)]
+    get_mysql.return_value.cursor.return_value = cursor
+    await mysql_anon_getclubmembers(301)
+    # the club members are served from the cache
+    am = await mysql_anon_getmember(45608)
+    assert am.birthyear == 1965
+    assert cursor.execute.call_count == 1
+    cursor.fetchone.return_value = {"idbel": 45608}
+    assert await mysql_anon_belid_from_fideid(201308) == 45608
+    assert cursor.execute.call_count == 2
+    await mysql_old_userpassword(
+        OldUserPasswordValidator(user="45608", password="", club=301, email="")
+    )
+    cursor.fetchone.return_value = member_row(45608)
+    await mysql_anon_getmember(45608)
+    cursor.fetchone.return_value = {"idbel": 45608}
+    await mysql_anon_belid_from_fideid(201308)
+    # 2 queries of the password update, 2 lookups after the invalidation
+    assert cursor.execute.call_count == 6
@@ -0,0 +1,109 @@
+import pytest
+from datetime import date, datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from pymongo import DeleteMany
+
+from kbsb.member.mongo_member import mongodb_anon_getmember, mongodb_anon_getmembers
+from kbsb.member.md_member import MemberSyncRun
+from kbsb.member.sync import HISTORYTABLE, SYNCTABLES, mgmt_get_membersync, sync_table
+
+from tests.interclub.test_series import AsyncCursor
+
+
+def signaletique_row(idbel: int, natrating: int = 1900) -> dict:
+    return {
+        "birthdate": date(1965, 1, 1),
+        "date_affiliation": date(2023, 9, 1),
+        "deceased": 0,
+        "fiderating": 2000,
+        "first_name": "Ruben",
+        "gender": "M",
+        "idbel": idbel,
+        "idclub": 301,
+        "idfide": 201308,
+        "last_name": "Decrop",
+        "licence_g": 0,
+        "locked": 0,
+        "mobile": "",
+        "nationalitybel": "BEL",
+        "nationalityfide": "BEL",
+        "natrating": natrating,
+        "rated": 1,
+        "year_affiliation": 2024,
+    }
+
+
+def mock_sync(get_mongodb: MagicMock, run_mysql: AsyncMock, rows, stored):
+    coll = MagicMock(bulk_write=AsyncMock())
+    coll.find = MagicMock(side_effect=lambda *args: AsyncCursor(stored))
+    get_mongodb.return_value = {"member": coll}
+    run_mysql.side_effect = lambda fn, query, params, many: [
+        r for r in rows if r["idbel"] > params["last"]
+    ][: params["limit"]]
+    return coll
+
+
+@patch("kbsb.member.sync.SYNCCHUNK", 2)
+@patch("kbsb.member.sync.DbMemberSync")
+@patch("kbsb.member.sync.run_mysql")
+@patch("kbsb.member.sync.get_mongodb")
+@pytest.mark.asyncio
+async def test_sync_table(
+    get_mongodb: MagicMock, run_mysql: AsyncMock, dbMemberSync: MagicMock
+):
+    dbMemberSync.add = AsyncMock()
+    rows = [signaletique_row(idbel) for idbel in (1, 2, 3)]
+    coll = mock_sync(get_mongodb, run_mysql, rows, [])
+    run = await sync_table(SYNCTABLES[0], "p_player202401")
+    # the table is read in chunks ordered by the key
+    assert [c[0][2]["last"] for c in run_mysql.call_args_list] == [0, 2]
+    assert (run.read, run.upserted, run.deleted) == (3, 3, 0)
+    docs = [op._doc["$set"] for c in coll.bulk_write.call_args_list for op in c[0][0]]
+    assert docs[0]["period"] == "p_player202401"
+    assert isinstance(docs[0]["birthdate"], datetime)
+    dbMemberSync.add.assert_awaited()
+    # a second run writes the changed rows only and deletes the removed ones
+    stored = [{"idbel": d["idbel"], "checksum": d["checksum"]} for d in docs]
+    stored.append({"idbel": 999, "checksum": "x"})
+    rows[1] = signaletique_row(2, natrating=1950)
+    run_mysql.reset_mock()
+    coll = mock_sync(get_mongodb, run_mysql, rows, stored)
+    run = await sync_table(SYNCTABLES[0], "p_player202401")
+    assert (run.read, run.upserted, run.deleted) == (3, 1, 1)
+    ops = coll.bulk_write.call_args_list
+    assert ops[0][0][0][0]._filter == {"idbel": 2}
+    assert ops[1][0][0] == [DeleteMany({"idbel": {"$in": [999]}})]
+    assert run.rowspersecond > 0
+
+
+@patch("kbsb.member.sync.DbMemberSync")
+@pytest.mark.asyncio
+async def test_mgmt_get_membersync(dbMemberSync: MagicMock):
+    finished = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    async def lastrun(options):
+        return [
+            MemberSyncRun(table=options["table"], started=finished, finished=finished)
+        ]
+
+    dbMemberSync.find_multiple = AsyncMock(side_effect=lastrun)
+    runs = await mgmt_get_membersync()
+    assert [r.table for r in runs] == ["signaletique", "fide", HISTORYTABLE]
+    assert all(r.lag > 0 for r in runs)
+
+
+@patch("kbsb.member.mongo_member.get_mongodb")
+@pytest.mark.asyncio
+async def test_mongodb_anon_getmember(get_mongodb: MagicMock):
+    doc = signaletique_row(45608)
+    doc["birthdate"] = datetime(1965, 1, 1)
+    coll = MagicMock(find_one=AsyncMock(return_value=doc))
+    coll.find = MagicMock(return_value=AsyncCursor([doc]))
+    get_mongodb.return_value = {"member": coll}
+    am = await mongodb_anon_getmember(45608)
+    assert coll.find_one.call_args[0][0] == {"idbel": 45608, "rated": True}
+    assert (am.idnumber, am.birthyear, am.natrating) == (45608, 1965, 1900)
+    members = await mongodb_anon_getmembers([45608, 1])
+    assert [m.idnumber for m in members] == [45608]
+    assert coll.find.call_args[0][0]["idbel"] == {"$in": [45608, 1]}
@@ -0,0 +1,105 @@
+import asyncio
+import pytest
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+from reddevil.core import RdInternalServerError
+
+from kbsb.core.db import run_mysql
+from kbsb.member import membercache
+from kbsb.member.mysql_member import mysql_anon_getclubmembers, mysql_anon_getmembers
+from kbsb.member.md_member import AnonMember
+
+
+def member_row(idnumber: int) -> dict:
+    return {
+        "birthdate": date(1965, 1, 1),
+        "fiderating": 2000,
+        "first_name": "Ruben",
+        "gender": "M",
+        "idclub": 301,
+        "idfide": 201308,
+        "idnumber": idnumber,
+        "last_name": "Decrop",
+        "nationalitybel": "BEL",
+        "nationalityfide": "BEL",
+        "natrating": 1900,
+    }
+
+
+@patch("kbsb.member.mysql_member.get_elotable")
+@patch("kbsb.member.mysql_member.get_mysql")
+@pytest.mark.asyncio
+async def test_mysql_anon_getclubmembers(get_mysql, get_elotable):
+    get_elotable.return_value = "p_player202401"
+    threads = []
+    cursor = MagicMock()
+    cursor.execute.side_effect = lambda *args: threads.append(
+        threading.current_thread().name
+    )
+    cursor.fetchall.return_value = [member_row(45608), member_row(45609)]
+    get_mysql.return_value.cursor.return_value = cursor
+    members = await mysql_anon_getclubmembers(301)
+    assert [m.idnumber for m in members] == [45608, 45609]
+    assert isinstance(members[0], AnonMember)
+    # the query ran in the mysql executor, not on the event loop
+    assert threads[0].startswith("mysql")
+    get_mysql.return_value.close.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_run_mysql_bounded():
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def query():
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.pop()
+
+    with patch(
+        "kbsb.core.db.get_mysql_executor",
+        return_value=ThreadPoolExecutor(max_workers=2),
+    ):
+        await asyncio.gather(*[run_mysql(query) for _ in range(6)])
+    assert max(peak) == 2
+
+
+@pytest.mark.asyncio
+async def test_run_mysql_timeout():
+    with pytest.raises(RdInternalServerError):
+        await run_mysql(time.sleep, 0.2, timeout=0.01)
+
+
+@patch("kbsb.member.mysql_member.MEMBERCHUNK", 2)
+@patch("kbsb.member.mysql_member.get_elotable")
+@patch("kbsb.member.mysql_member.get_mysql")
+@pytest.mark.asyncio
+async def test_mysql_anon_getmembers(get_mysql, get_elotable):
+    membercache.clear()
+    get_elotable.return_value = "p_player202401"
+    queries = []
+
+    def connection():
+        cursor = MagicMock()
+        cursor.execute.side_effect = lambda query, params: queries.append(
+            (query, params)
+        )
+        cursor.fetchall.side_effect = lambda: [
+            member_row(idn) for idn in cursor.execute.call_args[0][1] if idn != 3
+        ]
+        return MagicMock(cursor=MagicMock(return_value=cursor))
+
+    get_mysql.side_effect = connection
+    members = await mysql_anon_getmembers([5, 1, 3, 5, 2])
+    # one IN query per chunk of distinct idnumbers
+    assert sorted(params for _, params in queries) == [(3, 2), (5, 1)]
+    assert all("Matricule IN (%s, %s)" in query for query, _ in queries)
+    assert [m.idnumber for m in members] == [5, 1, 2]
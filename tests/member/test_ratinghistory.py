@@ -0,0 +1,89 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from kbsb.member.md_member import AnonMember
+from kbsb.member.ratinghistory import (
+    anon_getclubratinghistory,
+    anon_getratinghistory,
+    mgmt_sync_ratinghistory,
+)
+
+
+def fake_mysql(fn, query, params, many=False, dictionary=True):
+    if query.startswith("SHOW TABLES"):
+        return [("p_player202307",), ("p_player202310",), ("p_player202401",)]
+    if params["last"]:
+        return []
+    return [{"idnumber": 45608, "natrating": 1900, "idfide": 201308}]
+
+
+@patch("kbsb.member.ratinghistory.DbMemberSync")
+@patch("kbsb.member.ratinghistory.get_elotable")
+@patch("kbsb.member.ratinghistory.run_mysql")
+@patch("kbsb.member.ratinghistory.get_mongodb")
+@pytest.mark.asyncio
+async def test_mgmt_sync_ratinghistory(
+    get_mongodb: MagicMock,
+    run_mysql: AsyncMock,
+    get_elotable: MagicMock,
+    dbMemberSync: MagicMock,
+):
+    dbMemberSync.add = AsyncMock()
+    get_elotable.return_value = "p_player202401"
+    run_mysql.side_effect = fake_mysql
+    coll = MagicMock(
+        bulk_write=AsyncMock(),
+        create_index=AsyncMock(),
+        distinct=AsyncMock(return_value=["202307", "202401"]),
+    )
+    get_mongodb.return_value = {"ratinghistory": coll}
+    runs = await mgmt_sync_ratinghistory()
+    # the new quarter is loaded and the current one reloaded
+    assert [r.period for r in runs] == ["202310", "202401"]
+    queries = [c[0][1] for c in run_mysql.call_args_list[1:]]
+    assert "JOIN fide" not in queries[0] and "JOIN fide" in queries[1]
+    op = coll.bulk_write.call_args_list[0][0][0][0]
+    assert op._filter == {"idnumber": 45608, "period": "202310"}
+    assert op._doc["$set"]["natrating"] == 1900
+    # the runs are reported with the member syncs
+    assert [r.table for r in runs] == ["ratinghistory", "ratinghistory"]
+
+
+def mock_history(get_mongodb: MagicMock, docs: list) -> MagicMock:
+    coll = MagicMock()
+    coll.find.return_value.to_list = AsyncMock(return_value=docs)
+    get_mongodb.return_value = {"ratinghistory": coll}
+    return coll
+
+
+@patch("kbsb.member.ratinghistory.get_mongodb")
+@pytest.mark.asyncio
+async def test_anon_getratinghistory(get_mongodb: MagicMock):
+    docs = [
+        {"idnumber": 45608, "period": "202310", "natrating": 1890},
+        {"idnumber": 45608, "period": "202401", "natrating": 1900, "fiderating": 2000},
+    ]
+    coll = mock_history(get_mongodb, docs)
+    history = await anon_getratinghistory(45608)
+    assert coll.find.call_args[0][0] == {"idnumber": 45608}
+    assert [r.period for r in history.ratings] == ["202310", "202401"]
+    assert history.ratings[1].fiderating == 2000
+
+
+@patch("kbsb.member.ratinghistory.anon_getclubmembers")
+@patch("kbsb.member.ratinghistory.get_mongodb")
+@pytest.mark.asyncio
+async def test_anon_getclubratinghistory(
+    get_mongodb: MagicMock, anon_getclubmembers: AsyncMock, anon_member_factory
+):
+    anon_getclubmembers.return_value = [
+        anon_member_factory.build(idnumber=idn) for idn in (1, 2)
+    ]
+    coll = mock_history(
+        get_mongodb, [{"idnumber": 2, "period": "202401", "natrating": 1500}]
+    )
+    histories = await anon_getclubratinghistory(301)
+    # one read for the whole club
+    coll.find.assert_called_once()
+    assert coll.find.call_args[0][0] == {"idnumber": {"$in": [1, 2]}}
+    assert [len(h.ratings) for h in histories] == [0, 1]